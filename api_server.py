@@ -0,0 +1,506 @@
+# api_server.py
+"""
+Persistent Python inference server.
+
+Loads the scaler, PCA, final model and label encoder once, warms up librosa
+(numba JIT) and then serves predictions over local HTTP, so the Node backend
+no longer spawns a fresh Python process per request.
+
+Endpoints (all JSON):
+    GET  /health
+    POST /predict         {"audio_path": "backend/uploads/<file>", "pitch_method": "pyin"|"yin"}
+                          or the raw audio bytes (any non-JSON Content-Type, ?pitch_method=yin),
+                          decoded in memory without touching the disk
+    POST /predict-stream  {"audio_path": "...", "window": 3.0, "hop": 1.5} (whole-file timeline)
+    POST /test-sample     {"sampleName": "...", "features": [20 floats]}
+    POST /score           bulk scoring of precomputed feature rows (bulk_score.py): a CSV
+                          (text/csv), .npy (application/x-npy) or JSON body, ?output=csv|ndjson;
+                          predictions and probabilities are streamed back chunk by chunk
+
+The prediction endpoints accept "mode": "exact" (default) or "fast" (?mode=fast
+for raw bytes); fast uses the approximate kernel model from the model bundle
+(see fast_model.py) and needs the numpy predictor. /predict and /jobs also
+accept "vad": true (?vad=1) to trim silence first (voice_activity.py); --vad
+makes that the default. "segments": K (?segments=K) on /predict samples K 3-second
+clips across the whole recording and predicts from their median features
+(segment_sampling.py). Unknown pitch methods or modes, and segments, window or
+hop values that are not positive numbers, are rejected up front with 400 and a
+short {"success": false, "error": ...} message; tracebacks only go to the log.
+    GET  /model-metrics   (?all=true for every model)
+    GET  /metrics         request counters and stage latency histograms
+
+Asynchronous jobs (job_queue.py, bounded worker processes with timeouts):
+    POST /jobs            same body as /predict; 202 {"job_id", "status", "coalesced"}
+                          (coalesced: an identical job is still queued or running),
+                          429 with Retry-After when the queue is full, 503 when no
+                          worker process is left
+    GET  /jobs            queue depth and worker stats
+    GET  /jobs/<id>       job status and result (?wait=30 long-polls until it changes)
+    GET  /jobs/<id>/events  server-sent events, one per status change until finished
+
+Real-time streaming (realtime_stream.py):
+    GET  /stream          WebSocket (?sr=16000&format=s16le|f32le&window=3&interval=0.5&mode=exact);
+                          binary messages are mono PCM chunks, the server pushes a
+                          {"type": "prediction", ...} JSON message every `interval` seconds
+                          of audio; send {"type": "end"} for a final result
+
+Prediction results carry a "timings" block (milliseconds per stage) unless
+started with --no-timings or VOICE_TIMINGS=0.
+
+Usage:
+    python api_server.py [--host 127.0.0.1] [--port 5001] [--pitch-method yin] [--predictor numpy] [--no-timings]
+                         [--job-workers 2] [--max-queue 32] [--job-timeout 60] [--max-streams 64]
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+import warnings
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# Suppress NumPy/Numba compatibility warnings
+warnings.filterwarnings('ignore', category=UserWarning)
+warnings.filterwarnings('ignore', category=FutureWarning)
+
+import instrumentation
+from instrumentation import request_timer
+from startup import warm_up
+from feature_extraction import PITCH_METHODS, FEATURE_ORDER
+from inference import load_models, predict_audio_file, predict_sample, check_mode, PREDICTORS, DEFAULT_PREDICTOR
+from job_queue import JobQueue, QueueFull, WorkersUnavailable, FINISHED, DEFAULT_WORKERS, DEFAULT_MAX_QUEUE, DEFAULT_TIMEOUT
+from stream_inference import predict_long_file
+from segment_sampling import predict_segments
+from bulk_score import score_stream, detect_format, OUTPUT_CONTENT_TYPES
+import realtime_stream
+from websocket_io import is_upgrade_request, server_handshake, INTERNAL_ERROR
+
+DEFAULT_HOST = os.environ.get("VOICE_API_HOST", "127.0.0.1")
+DEFAULT_PORT = int(os.environ.get("VOICE_API_PORT", "5001"))
+
+MODELS = None
+JOBS = None
+PITCH_METHOD = "pyin"
+VAD = False
+# Longest single long-poll / event stream wait
+MAX_WAIT = 60.0
+# Concurrent /stream WebSocket sessions
+STREAM_SLOTS = threading.BoundedSemaphore(64)
+_metrics_lock = threading.Lock()
+
+
+def get_metrics(include_all):
+    """Model metrics from the fingerprinted artifact; the lock avoids concurrent recomputes."""
+    import get_model_metrics
+    with _metrics_lock:
+        return get_model_metrics.get_metrics(include_all)
+
+
+def _flag(value):
+    """Boolean from JSON (true/false) or a query string value ("1", "true", ...)."""
+    if isinstance(value, str):
+        return value.lower() in ("1", "true", "yes", "on")
+    return bool(value)
+
+
+class BadRequest(ValueError):
+    """Invalid request parameters; answered with 400."""
+
+
+def _prediction_params(params):
+    """Validated pitch_method / mode / vad keyword arguments from a JSON body or query string."""
+    pitch_method = params.get("pitch_method", PITCH_METHOD)
+    if pitch_method not in PITCH_METHODS:
+        raise BadRequest(f"Unknown pitch_method '{pitch_method}', expected one of {PITCH_METHODS}")
+    mode = params.get("mode", "exact")
+    try:
+        check_mode(MODELS, mode)
+    except ValueError as e:
+        raise BadRequest(str(e))
+    return {"pitch_method": pitch_method, "mode": mode, "vad": _flag(params.get("vad", VAD))}
+
+
+def _sample_features(payload):
+    """The /test-sample feature list: FEATURE_ORDER-many finite numbers, else BadRequest."""
+    features = payload.get("features")
+    if not isinstance(features, list):
+        raise BadRequest("Invalid features data")
+    if len(features) != len(FEATURE_ORDER):
+        raise BadRequest(f"Expected {len(FEATURE_ORDER)} features, got {len(features)}")
+    if not all(isinstance(v, (int, float)) and not isinstance(v, bool) and abs(v) < float("inf")
+               for v in features):
+        raise BadRequest("Features must be finite numbers")
+    return features
+
+
+def _positive(params, name, cast, default=None):
+    """params[name] as a positive int or float (default when absent); BadRequest otherwise."""
+    value = params.get(name)
+    if value is None:
+        return default
+    try:
+        if isinstance(value, bool) or (cast is int and not str(value).isdigit()):
+            raise ValueError
+        number = cast(value)
+    except (TypeError, ValueError):
+        number = None
+    if number is None or not 0 < number < float("inf"):
+        kind = "integer" if cast is int else "number"
+        raise BadRequest(f"'{name}' must be a positive {kind}")
+    return number
+
+
+class _BodyReader(io.RawIOBase):
+    """The request body as a file object that stops at Content-Length."""
+
+    def __init__(self, rfile, length):
+        self.rfile = rfile
+        self.remaining = length
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.rfile.read(min(len(buffer), self.remaining))
+        buffer[:len(data)] = data
+        self.remaining -= len(data)
+        return len(data)
+
+    def drain(self):
+        while self.remaining and self.read(1 << 16):
+            pass
+
+
+class InferenceHandler(BaseHTTPRequestHandler):
+    server_version = "VoiceInference/1.0"
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return self.rfile.read(length) if length else b""
+
+    def _read_json(self):
+        body = self._read_body()
+        if not body:
+            return {}
+        payload = json.loads(body)
+        if not isinstance(payload, dict):
+            raise ValueError("Expected a JSON object")
+        return payload
+
+    def _send_error(self, e, status=500):
+        """Error response with a short message; server errors are logged with their traceback."""
+        if status >= 500:
+            traceback.print_exc()
+        self._send_json({"success": False, "error": str(e)}, status)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        try:
+            if url.path == "/health":
+                self._send_json({"status": "OK", "models_loaded": MODELS is not None,
+                                 "job_workers": JOBS.stats()["workers_alive"] if JOBS else 0})
+            elif url.path == "/model-metrics":
+                include_all = parse_qs(url.query).get("all", ["false"])[0] == "true"
+                self._send_json(get_metrics(include_all))
+            elif url.path == "/metrics":
+                self._send_json(instrumentation.REGISTRY.snapshot())
+            elif url.path == "/stream" and is_upgrade_request(self.headers):
+                self._stream(url)
+            elif url.path == "/jobs":
+                self._send_json(JOBS.stats())
+            elif url.path.startswith("/jobs/"):
+                self._get_job(url)
+            else:
+                self._send_json({"success": False, "error": f"Unknown endpoint: {url.path}"}, 404)
+        except Exception as e:
+            self._send_error(e)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        content_type = self.headers.get("Content-Type", "application/json")
+        if url.path == "/predict" and not content_type.startswith("application/json"):
+            self._predict_bytes(url)
+            return
+        if url.path == "/jobs":
+            self._submit_job(url, content_type)
+            return
+        if url.path == "/score":
+            self._score(url, content_type)
+            return
+        try:
+            payload = self._read_json()
+        except ValueError as e:
+            self._send_error(e, 400)
+            return
+
+        if url.path in ("/predict", "/predict-stream"):
+            if "audio_path" not in payload:
+                self._send_json({"success": False, "error": "Missing 'audio_path'"}, 400)
+                return
+            if not isinstance(payload["audio_path"], str) or not os.path.exists(payload["audio_path"]):
+                self._send_json({"success": False, "error": f"Audio file not found: {payload['audio_path']}"}, 400)
+                return
+
+        try:
+            if url.path == "/predict":
+                self._send_prediction(url.path, payload["audio_path"], payload)
+            elif url.path == "/predict-stream":
+                params = _prediction_params(payload)
+                self._send_timed(
+                    url.path, predict_long_file, MODELS, payload["audio_path"],
+                    window=_positive(payload, "window", float, 3.0),
+                    hop=_positive(payload, "hop", float, 1.5),
+                    pitch_method=params["pitch_method"],
+                    mode=params["mode"]
+                )
+            elif url.path == "/test-sample":
+                features = _sample_features(payload)
+                self._send_timed(url.path, predict_sample, MODELS, features, payload.get("sampleName"),
+                                 mode=_prediction_params(payload)["mode"])
+            else:
+                self._send_json({"success": False, "error": f"Unknown endpoint: {url.path}"}, 404)
+        except BadRequest as e:
+            self._send_error(e, 400)
+        except Exception as e:
+            self._send_error(e)
+
+    def _predict_bytes(self, url):
+        """POST /predict with the audio itself as the request body."""
+        try:
+            audio = self._read_body()
+            if not audio:
+                self._send_json({"success": False, "error": "Empty audio body"}, 400)
+                return
+            self._send_prediction(url.path, audio, {k: v[0] for k, v in parse_qs(url.query).items()})
+        except BadRequest as e:
+            self._send_error(e, 400)
+        except Exception as e:
+            self._send_error(e)
+
+    def _send_prediction(self, path, audio, params):
+        """/predict for a path or bytes: one clip, or predict_segments when params ask for segments."""
+        kwargs = _prediction_params(params)
+        segments = _positive(params, "segments", int)
+        if segments is not None:
+            self._send_timed(path, predict_segments, MODELS, audio, segments=segments, **kwargs)
+        else:
+            self._send_timed(path, predict_audio_file, MODELS, audio, **kwargs)
+
+    def _score(self, url, content_type):
+        """POST /score: CSV bodies are parsed straight off the socket, results streamed as they are scored."""
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        if self.headers.get("Content-Length") is None:
+            self._send_json({"success": False, "error": "Content-Length required"}, 411)
+            return
+        body = _BodyReader(self.rfile, int(self.headers["Content-Length"]))
+        output = query.get("output", "csv")
+        with request_timer(url.path):
+            try:
+                fmt = query.get("format") or detect_format(content_type=content_type)
+                source = io.BufferedReader(body, 1 << 16) if fmt == "csv" else body.readall()
+                stream = score_stream(MODELS, source, fmt, output, query.get("mode", "exact"))
+                header = next(stream)
+            except ValueError as e:  # bad rows / columns / format, or an unavailable mode
+                body.drain()
+                self._send_json({"success": False, "error": str(e)}, 400)
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", OUTPUT_CONTENT_TYPES[output])
+            self.end_headers()
+            self.close_connection = True  # no Content-Length: the body ends when the connection closes
+            self.wfile.write(header.encode())
+            try:
+                for block in stream:
+                    self.wfile.write(block.encode())
+            except ValueError as e:
+                # Too late for a status code; end the stream with an error record instead
+                error = f"# error: {e}\n" if output == "csv" else json.dumps({"error": str(e)}) + "\n"
+                self.wfile.write(error.encode())
+
+    def _submit_job(self, url, content_type):
+        """POST /jobs: raw audio bytes or {"audio_path": ...}, like /predict."""
+        try:
+            if content_type.startswith("application/json"):
+                try:
+                    payload = self._read_json()
+                except ValueError as e:
+                    self._send_error(e, 400)
+                    return
+                if "audio_path" not in payload:
+                    self._send_json({"success": False, "error": "Missing 'audio_path'"}, 400)
+                    return
+                audio = payload["audio_path"]
+                if not isinstance(audio, str) or not os.path.exists(audio):
+                    self._send_json({"success": False, "error": f"Audio file not found: {audio}"}, 400)
+                    return
+            else:
+                payload = {k: v[0] for k, v in parse_qs(url.query).items()}
+                audio = self._read_body()
+                if not audio:
+                    self._send_json({"success": False, "error": "Empty audio body"}, 400)
+                    return
+            kwargs = _prediction_params(payload)
+            try:
+                job, coalesced = JOBS.submit(audio, **kwargs)
+            except QueueFull as e:
+                body = json.dumps({"success": False, "error": str(e)}).encode("utf-8")
+                self.send_response(429)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Retry-After", "1")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+            except WorkersUnavailable as e:
+                self._send_json({"success": False, "error": str(e)}, 503)
+                return
+            self._send_json({"success": True, "job_id": job.id, "status": job.status,
+                             "coalesced": coalesced}, 202)
+        except BadRequest as e:
+            self._send_error(e, 400)
+        except Exception as e:
+            self._send_error(e)
+
+    def _get_job(self, url):
+        """GET /jobs/<id>[?wait=seconds] and GET /jobs/<id>/events."""
+        parts = url.path.strip("/").split("/")
+        job = JOBS.get(parts[1]) if len(parts) > 1 else None
+        if job is None or len(parts) > 3 or (len(parts) == 3 and parts[2] != "events"):
+            self._send_json({"success": False, "error": f"Unknown job: {url.path}"}, 404)
+            return
+        if len(parts) == 3:
+            self._stream_job_events(job)
+            return
+        try:
+            wait = float(parse_qs(url.query).get("wait", ["0"])[0])
+        except ValueError:
+            wait = None
+        if wait is None or not 0 <= wait < float("inf"):
+            self._send_json({"success": False, "error": "'wait' must be a non-negative number of seconds"}, 400)
+            return
+        wait = min(wait, MAX_WAIT)
+        snapshot = job.snapshot()
+        if wait > 0 and snapshot["status"] not in FINISHED:
+            snapshot = JOBS.wait_for_change(job, snapshot["version"], wait)
+        self._send_json(snapshot)
+
+    def _stream_job_events(self, job):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        snapshot = job.snapshot()
+        try:
+            while True:
+                self.wfile.write(f"event: {snapshot['status']}\ndata: {json.dumps(snapshot)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                if snapshot["status"] in FINISHED:
+                    break
+                snapshot = JOBS.wait_for_change(job, snapshot["version"], MAX_WAIT)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        self.close_connection = True
+
+    def _stream(self, url):
+        """Upgrade to a WebSocket and run a realtime_stream session on it."""
+        if not STREAM_SLOTS.acquire(blocking=False):
+            self._send_json({"success": False, "error": "Too many concurrent streams"}, 503)
+            return
+        try:
+            params = {k: v[0] for k, v in parse_qs(url.query).items()}
+            try:
+                session = realtime_stream.session_from_params(MODELS, params)
+            except ValueError as e:
+                self._send_json({"success": False, "error": str(e)}, 400)
+                return
+            instrumentation.REGISTRY.increment("streams")
+            ws = server_handshake(self)
+            try:
+                realtime_stream.serve(ws, session)
+            except Exception:
+                # The socket speaks WebSocket now: close it instead of answering with an HTTP 500
+                traceback.print_exc()
+                ws.close(INTERNAL_ERROR, "internal error")
+        finally:
+            STREAM_SLOTS.release()
+
+    def _send_timed(self, route, fn, *args, **kwargs):
+        """Run fn under a request timer and attach its "timings" block to the result."""
+        with request_timer(route) as timer:
+            result = fn(*args, **kwargs)
+        if timer is not None:
+            result["timings"] = timer.as_dict()
+        self._send_json(result)
+
+    def log_message(self, format, *args):
+        print(f"[api_server] {self.address_string()} - {format % args}", file=sys.stderr)
+
+
+def main():
+    global MODELS, JOBS, PITCH_METHOD, STREAM_SLOTS, VAD
+
+    parser = argparse.ArgumentParser(description="Persistent voice gender inference server")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--pitch-method", choices=PITCH_METHODS, default="pyin",
+                        help="Default F0 backend: pyin (accurate) or yin (fast)")
+    parser.add_argument("--predictor", choices=PREDICTORS, default=DEFAULT_PREDICTOR,
+                        help="sklearn pickles or the fused pure-NumPy predictor")
+    parser.add_argument("--no-warmup", action="store_true", help="Skip the librosa warm-up extraction")
+    parser.add_argument("--vad", action="store_true",
+                        help="Trim silence before extraction unless a request sets vad=false")
+    parser.add_argument("--no-timings", action="store_true",
+                        help="Disable per-request stage timings and the /metrics histograms")
+    parser.add_argument("--job-workers", type=int, default=DEFAULT_WORKERS,
+                        help="Worker processes for /jobs")
+    parser.add_argument("--max-queue", type=int, default=DEFAULT_MAX_QUEUE,
+                        help="Queued /jobs beyond this are rejected with 429")
+    parser.add_argument("--job-timeout", type=float, default=DEFAULT_TIMEOUT,
+                        help="Seconds before a running job's worker is killed")
+    parser.add_argument("--max-streams", type=int, default=64,
+                        help="Concurrent /stream WebSocket sessions")
+    args = parser.parse_args()
+    PITCH_METHOD = args.pitch_method
+    VAD = args.vad
+    STREAM_SLOTS = threading.BoundedSemaphore(args.max_streams)
+    if args.no_timings:
+        instrumentation.set_enabled(False)
+
+    start = time.perf_counter()
+    print("Loading models...", file=sys.stderr)
+    MODELS = load_models(predictor=args.predictor)
+    if not args.no_warmup:
+        print("Warming up feature extraction...", file=sys.stderr)
+        warm_up(pitch_methods=[PITCH_METHOD])
+    JOBS = JobQueue(workers=args.job_workers, max_queue=args.max_queue, timeout=args.job_timeout,
+                    predictor=args.predictor, timings=not args.no_timings,
+                    warm_up_methods=None if args.no_warmup else [PITCH_METHOD]).start()
+    print(f"Ready in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+
+    server = ThreadingHTTPServer((args.host, args.port), InferenceHandler)
+    print(f"🐍 Inference server listening on http://{args.host}:{args.port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        JOBS.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+# audio_io.py
+"""
+In-memory audio decoding.
+
+load_audio() accepts a file path, raw bytes or a binary file-like object and
+returns a mono float32 signal at the requested rate without writing any
+intermediate file:
+
+- formats soundfile understands (WAV, FLAC, OGG, MP3 with libsndfile >= 1.1)
+  are decoded directly, seeking to offset and reading only duration seconds;
+- everything else (WebM/Opus browser recordings, M4A, ...) is piped through
+  ffmpeg, which decodes, downmixes and resamples to 32-bit float PCM on
+  stdout, again limited to offset + duration.
+
+audio_duration() reads the length from the container header without decoding
+(segment_sampling.py uses it to place its seeks).
+
+Resampling of soundfile-decoded audio uses librosa.resample with a
+configurable res_type (VOICE_RESAMPLER or the resampler argument; default
+"soxr_hq" as in librosa.load, "soxr_mq"/"soxr_lq" trade accuracy for speed).
+"""
+
+import io
+import os
+import subprocess
+
+import numpy as np
+import soundfile as sf
+from startup import lazy_import
+from instrumentation import timed
+
+librosa = lazy_import("librosa")
+
+RESAMPLERS = ("soxr_vhq", "soxr_hq", "soxr_mq", "soxr_lq", "polyphase", "kaiser_fast", "fft")
+DEFAULT_RESAMPLER = os.environ.get("VOICE_RESAMPLER", "soxr_hq")
+
+
+def _as_source(source):
+    """Path stays a path; bytes/bytearray/memoryview become a seekable BytesIO."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(bytes(source))
+    return source
+
+
+def _read_soundfile(source, offset, duration):
+    """Decode with soundfile, reading only the requested span. Returns (y, native_sr)."""
+    with sf.SoundFile(source) as f:
+        native_sr = f.samplerate
+        if offset:
+            f.seek(int(offset * native_sr))
+        frames = -1 if duration is None else int(duration * native_sr)
+        y = f.read(frames=frames, dtype="float32", always_2d=False)
+    if y.ndim > 1:
+        y = y.mean(axis=1)
+    return y, native_sr
+
+
+def _read_ffmpeg(source, sr, offset, duration):
+    """Decode anything ffmpeg understands to mono float32 PCM at sr over a pipe."""
+    cmd = ["ffmpeg", "-v", "error"]
+    if offset:
+        cmd += ["-ss", str(offset)]
+    if duration is not None:
+        cmd += ["-t", str(duration)]
+
+    data = None
+    if isinstance(source, (str, os.PathLike)):
+        cmd += ["-i", os.fspath(source)]
+    else:
+        source.seek(0)
+        data = source.read()
+        cmd += ["-i", "pipe:0"]
+    cmd += ["-f", "f32le", "-ac", "1", "-acodec", "pcm_f32le"]
+    if sr is not None:
+        cmd += ["-ar", str(sr)]
+    cmd += ["pipe:1"]
+
+    stdin = {"input": data} if data is not None else {"stdin": subprocess.DEVNULL}
+    try:
+        result = subprocess.run(cmd, capture_output=True, **stdin)
+    except FileNotFoundError:
+        raise Exception("FFmpeg is required to decode this audio format. Please install FFmpeg and add it to your PATH.")
+    if result.returncode != 0:
+        raise Exception(f"FFmpeg failed to decode audio: {result.stderr.decode(errors='replace').strip()}")
+    return np.frombuffer(result.stdout, dtype="<f4").copy()
+
+
+def audio_duration(source):
+    """
+    Length of source in seconds from the file header (soundfile, else ffprobe).
+
+    Returns None when the container does not record it, as in MediaRecorder
+    WebM uploads; callers then have to decode the whole stream.
+    """
+    source = _as_source(source)
+    try:
+        info = sf.info(source)
+        return info.frames / info.samplerate
+    except RuntimeError:
+        pass
+
+    cmd = ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0"]
+    if isinstance(source, (str, os.PathLike)):
+        stdin = {"stdin": subprocess.DEVNULL}
+        cmd += ["-i", os.fspath(source)]
+    else:
+        source.seek(0)
+        stdin = {"input": source.read()}
+        cmd += ["-i", "pipe:0"]
+    try:
+        result = subprocess.run(cmd, capture_output=True, **stdin)
+    except FileNotFoundError:
+        return None
+    try:
+        return float(result.stdout.decode().strip())
+    except ValueError:  # "N/A" or a probe error
+        return None
+
+
+def load_audio(source, sr=22050, offset=0.0, duration=None, resampler=None):
+    """
+    Decode source (path, bytes or binary file object) to mono float32 at sr.
+
+    sr=None keeps the native rate for soundfile-readable input. Returns
+    (y, sr) like librosa.load.
+    """
+    source = _as_source(source)
+    resampler = resampler or DEFAULT_RESAMPLER
+    if isinstance(source, (str, os.PathLike)) and not os.path.exists(source):
+        raise FileNotFoundError(f"Audio file not found: {source}")
+    try:
+        with timed("load"):
+            y, native_sr = _read_soundfile(source, offset, duration)
+    except RuntimeError:  # sf.LibsndfileError: format not supported by libsndfile
+        if sr is None:
+            raise ValueError("sr is required for formats that are decoded with ffmpeg")
+        with timed("conversion"):
+            return _read_ffmpeg(source, sr, offset, duration), sr
+
+    if sr is not None and native_sr != sr:
+        with timed("resample"):
+            y = librosa.resample(y, orig_sr=native_sr, target_sr=sr, res_type=resampler)
+        return y, sr
+    return y, native_sr
@@ -2,27 +2,25 @@ const express = require("express");
 const multer = require("multer");
 const cors = require("cors");
 const { spawn } = require("child_process");
+const http = require("http");
 const fs = require("fs").promises;
 const path = require("path");
 const { v4: uuidv4 } = require("uuid");
 
 const app = express();
 const PORT = 3001;
+const PYTHON_API_PORT = process.env.VOICE_API_PORT || 5001;
+const PYTHON_API_URL = `http://127.0.0.1:${PYTHON_API_PORT}`;
 
 // Middleware
 app.use(cors());
-app.use(express.json());
+// /api/score bodies are streamed to the Python server unparsed
+const jsonParser = express.json();
+app.use((req, res, next) => (req.path === "/api/score" ? next() : jsonParser(req, res, next)));
 
-// Configure multer for file uploads
-const storage = multer.diskStorage({
-  destination: (req, file, cb) => {
-    cb(null, "uploads/");
-  },
-  filename: (req, file, cb) => {
-    const uniqueName = `${uuidv4()}${path.extname(file.originalname)}`;
-    cb(null, uniqueName);
-  },
-});
+// Keep uploads in memory: the Python service decodes the bytes directly and
+// only the script fallback needs a file in uploads/
+const storage = multer.memoryStorage();
 
 const upload = multer({
   storage: storage,
@@ -110,6 +108,101 @@ const runPythonScript = (scriptPath, args = []) => {
   });
 };
 
+// Persistent Python inference server (api_server.py): models are loaded once
+// and librosa stays warm, so requests no longer pay Python cold-start cost.
+let pythonService = null;
+
+const startPythonService = () => {
+  const workingDir = path.join(__dirname, "..");
+  pythonService = spawn("python", ["api_server.py", "--port", String(PYTHON_API_PORT)], {
+    cwd: workingDir,
+    stdio: ["ignore", "inherit", "inherit"],
+  });
+
+  pythonService.on("exit", (code) => {
+    console.error(`🐍 Python inference server exited with code ${code}`);
+    pythonService = null;
+  });
+
+  pythonService.on("error", (err) => {
+    console.error(`Failed to start Python inference server: ${err.message}`);
+    pythonService = null;
+  });
+
+  const stopService = () => {
+    if (pythonService) {
+      pythonService.kill();
+    }
+  };
+  process.on("exit", stopService);
+  process.on("SIGINT", () => process.exit(0));
+  process.on("SIGTERM", () => process.exit(0));
+};
+
+// Call the persistent Python server; returns null when it is not reachable
+// so callers can fall back to spawning a one-off Python script. The parsed
+// JSON carries the HTTP status as a non-enumerable httpStatus property.
+const callPythonService = async (route, body = null) => {
+  let response;
+  try {
+    response = await fetch(`${PYTHON_API_URL}${route}`, {
+      method: body ? "POST" : "GET",
+      headers: body ? { "Content-Type": "application/json" } : {},
+      body: body ? JSON.stringify(body) : undefined,
+    });
+  } catch (error) {
+    console.error(`Python inference server unavailable: ${error.message}`);
+    return null;
+  }
+  // Keep the upstream status so 4xx answers are passed through, not turned into 500s
+  const result = await response.json();
+  Object.defineProperty(result, "httpStatus", { value: response.status });
+  return result;
+};
+
+// Submit raw audio as a job to the Python server's bounded worker pool and
+// long-poll until it finishes. Returns null when the server is unreachable,
+// { busy: true } when its queue is full (HTTP 429).
+const predictViaJob = async (buffer) => {
+  let response;
+  try {
+    response = await fetch(`${PYTHON_API_URL}/jobs`, {
+      method: "POST",
+      headers: { "Content-Type": "application/octet-stream" },
+      body: buffer,
+    });
+  } catch (error) {
+    console.error(`Python inference server unavailable: ${error.message}`);
+    return null;
+  }
+  if (response.status === 429) {
+    return { busy: true, retryAfter: response.headers.get("Retry-After") || "1" };
+  }
+  let job = await response.json();
+  if (job.success === false) {
+    return job;
+  }
+  while (!["done", "failed", "timeout"].includes(job.status)) {
+    let poll;
+    try {
+      poll = await fetch(`${PYTHON_API_URL}/jobs/${job.job_id}?wait=30`);
+    } catch (error) {
+      console.error(`Python inference server unavailable: ${error.message}`);
+      return null;
+    }
+    // 404 once the job was evicted or the Python server restarted
+    const body = await poll.json().catch(() => ({}));
+    if (!poll.ok || body.success === false || !body.status) {
+      return { success: false, error: body.error || `Job ${job.job_id} is no longer available (HTTP ${poll.status})` };
+    }
+    job = body;
+  }
+  if (job.status !== "done") {
+    return { success: false, error: job.error };
+  }
+  return { ...job.result, job: { id: job.job_id, queue_wait_ms: job.queue_wait_ms, service_ms: job.service_ms } };
+};
+
 // Create a Python script that processes audio and returns JSON results
 const createProcessorScript = async () => {
   const processorScript = `
@@ -132,9 +225,8 @@ try:
         }))
         sys.exit(1)
         
-    import joblib
-    import os
-    from feature_extraction import extract_features_from_file, features_dict_to_vector
+    from inference import load_models, predict_audio_file
+    from instrumentation import request_timer
     
 except ImportError as e:
     print(json.dumps({
@@ -151,100 +243,13 @@ def main():
     audio_file_path = sys.argv[1]
     
     try:
-        # Check if audio file exists
-        if not os.path.exists(audio_file_path):
-            raise Exception(f"Audio file not found: {audio_file_path}")
-            
-        # Check if models directory exists and contains required files
-        model_files = ["models/scaler.pkl", "models/pca.pkl", "models/final_model.pkl", "models/label_encoder.pkl"]
-        for model_file in model_files:
-            if not os.path.exists(model_file):
-                raise Exception(f"Required model file not found: {model_file}")
-        
-        # Load trained models
-        print(f"Loading models...", file=sys.stderr)
-        scaler = joblib.load("models/scaler.pkl")
-        pca = joblib.load("models/pca.pkl")
-        final_model = joblib.load("models/final_model.pkl")
-        label_encoder = joblib.load("models/label_encoder.pkl")
-        print(f"Models loaded successfully", file=sys.stderr)
-        
-        # Feature order
-        FEATURE_ORDER = ['meanfreq', 'sd', 'median', 'Q25', 'Q75', 'IQR', 'skew', 'kurt', 'sp.ent', 'sfm', 
-                         'mode', 'centroid', 'meanfun', 'minfun', 'maxfun', 'meandom', 'mindom', 'maxdom', 'dfrange', 'modindx']
-        
-        # Extract features from audio
-        print(f"Extracting features from: {audio_file_path}", file=sys.stderr)
-        
-        # Check if we need to convert webm to wav for better compatibility
-        processed_audio_path = audio_file_path
-        if audio_file_path.lower().endswith('.webm'):
-            try:
-                import subprocess
-                # Use FFmpeg to convert WebM to WAV
-                wav_path = audio_file_path.replace('.webm', '.wav')
-                
-                # FFmpeg command to convert WebM to WAV
-                ffmpeg_cmd = [
-                    'ffmpeg', '-i', audio_file_path, 
-                    '-acodec', 'pcm_s16le', 
-                    '-ar', '22050', 
-                    '-ac', '1', 
-                    '-y',  # overwrite output files
-                    wav_path
-                ]
-                
-                result = subprocess.run(ffmpeg_cmd, capture_output=True, text=True)
-                
-                if result.returncode == 0:
-                    processed_audio_path = wav_path
-                    print(f"Successfully converted WebM to WAV: {wav_path}", file=sys.stderr)
-                else:
-                    print(f"FFmpeg conversion failed: {result.stderr}", file=sys.stderr)
-                    raise Exception(f"FFmpeg conversion failed: {result.stderr}")
-                    
-            except FileNotFoundError:
-                print("FFmpeg not found. Please install FFmpeg to process WebM files.", file=sys.stderr)
-                raise Exception("FFmpeg is required to process WebM files. Please install FFmpeg and add it to your PATH.")
-            except Exception as conv_error:
-                print(f"WebM conversion failed: {conv_error}", file=sys.stderr)
-                raise Exception(f"Failed to convert WebM file: {str(conv_error)}")
-        
-        features_dict = extract_features_from_file(processed_audio_path)
-        print(f"Features extracted: {len(features_dict)} features", file=sys.stderr)
-        
-        # Convert to vector in correct order
-        features_vector = features_dict_to_vector(features_dict, FEATURE_ORDER)
-        print(f"Features vector shape: {features_vector.shape if hasattr(features_vector, 'shape') else 'N/A'}", file=sys.stderr)
-        
-        # Scale features
-        features_scaled = scaler.transform(features_vector)
-        
-        # Apply PCA transformation
-        features_pca = pca.transform(features_scaled)
-        
-        # Make prediction
-        pred_encoded = final_model.predict(features_pca)
-        pred_label = label_encoder.inverse_transform(pred_encoded)
-        probabilities = final_model.predict_proba(features_pca)
-        
-        # Prepare results
-        result = {
-            "success": True,
-            "prediction": pred_label[0],
-            "confidence": float(max(probabilities[0])),
-            "probabilities": {
-                label_encoder.classes_[i]: float(probabilities[0][i]) 
-                for i in range(len(label_encoder.classes_))
-            },
-            "extracted_features": {
-                feature_name: float(features_dict.get(feature_name, 0.0))
-                for feature_name in FEATURE_ORDER
-            },
-            "scaled_features": features_scaled.tolist()[0],
-            "pca_features": features_pca.tolist()[0]
-        }
-        
+        with request_timer("/predict", registry=None) as timer:
+            print(f"Loading models...", file=sys.stderr)
+            models = load_models()
+            print(f"Extracting features from: {audio_file_path}", file=sys.stderr)
+            result = predict_audio_file(models, audio_file_path)
+        if timer is not None:
+            result["timings"] = timer.as_dict()
         print(json.dumps(result))
         
     except Exception as e:
@@ -281,18 +286,36 @@ app.post("/api/predict", upload.single("audio"), async (req, res) => {
       return res.status(400).json({ error: "No audio file uploaded" });
     }
 
-    const audioFilePath = req.file.path;
+    let audioFilePath = null;
 
     try {
-      // Adjust path for Python script running from parent directory
-      const relativePath = path.join("backend", audioFilePath);
-
-      // Run Python script to process audio
-      const result = await runPythonScript("audio_processor.py", [
-        relativePath,
-      ]);
-      const parsedResult = JSON.parse(result);
+      // Prefer the persistent Python server's job queue (decodes the upload in
+      // memory), fall back to writing the file and running a one-off script
+      let parsedResult = await predictViaJob(req.file.buffer);
+      if (parsedResult && parsedResult.busy) {
+        res.set("Retry-After", parsedResult.retryAfter);
+        return res.status(503).json({
+          success: false,
+          error: "Server is busy, please retry shortly",
+        });
+      }
+      if (parsedResult === null) {
+        audioFilePath = path.join(
+          "uploads",
+          `${uuidv4()}${path.extname(req.file.originalname)}`
+        );
+        await fs.writeFile(audioFilePath, req.file.buffer);
+        // Adjust path for Python script running from parent directory
+        const relativePath = path.join("backend", audioFilePath);
+        const result = await runPythonScript("audio_processor.py", [
+          relativePath,
+        ]);
+        parsedResult = JSON.parse(result);
+      }
 
+      if (parsedResult.success === false) {
+        throw new Error(parsedResult.error);
+      }
       res.json(parsedResult);
     } catch (error) {
       console.error("Python processing error:", error);
@@ -301,11 +324,13 @@ app.post("/api/predict", upload.single("audio"), async (req, res) => {
         error: "Failed to process audio file: " + error.message,
       });
     } finally {
-      // Clean up uploaded file
-      try {
-        await fs.unlink(audioFilePath);
-      } catch (unlinkError) {
-        console.error("Failed to delete uploaded file:", unlinkError);
+      // Clean up the fallback's uploaded file
+      if (audioFilePath) {
+        try {
+          await fs.unlink(audioFilePath);
+        } catch (unlinkError) {
+          console.error("Failed to delete uploaded file:", unlinkError);
+        }
       }
     }
   } catch (error) {
@@ -326,83 +351,22 @@ app.post("/api/test-sample", async (req, res) => {
       return res.status(400).json({ error: "Invalid features data" });
     }
 
-    // Create a temporary Python script for testing samples
-    const testScript = `
-import sys
-import json
-import numpy as np
-import joblib
-
-def main():
-    features = ${JSON.stringify(features)}
-    
-    try:
-        # Load trained models
-        scaler = joblib.load("models/scaler.pkl")
-        pca = joblib.load("models/pca.pkl")
-        final_model = joblib.load("models/final_model.pkl")
-        label_encoder = joblib.load("models/label_encoder.pkl")
-        
-        # Convert to numpy array
-        X = np.array(features).reshape(1, -1)
-        
-        # Scale features
-        X_scaled = scaler.transform(X)
-        
-        # Apply PCA transformation
-        X_pca = pca.transform(X_scaled)
-        
-        # Make prediction
-        pred_encoded = final_model.predict(X_pca)
-        pred_label = label_encoder.inverse_transform(pred_encoded)
-        probabilities = final_model.predict_proba(X_pca)
-        
-        # Prepare results
-        result = {
-            "success": True,
-            "sample_name": "${sampleName}",
-            "prediction": pred_label[0],
-            "confidence": float(max(probabilities[0])),
-            "probabilities": {
-                label_encoder.classes_[i]: float(probabilities[0][i]) 
-                for i in range(len(label_encoder.classes_))
-            },
-            "raw_features": features,
-            "scaled_features": X_scaled.tolist()[0],
-            "pca_features": X_pca.tolist()[0]
-        }
-        
-        print(json.dumps(result))
-        
-    except Exception as e:
-        error_result = {
-            "success": False,
-            "error": str(e)
-        }
-        print(json.dumps(error_result))
-        sys.exit(1)
-
-if __name__ == "__main__":
-    main()
-`;
-
-    await fs.writeFile(
-      path.join(__dirname, "..", "test_sample.py"),
-      testScript
-    );
-
-    try {
-      const result = await runPythonScript("test_sample.py");
-      const parsedResult = JSON.parse(result);
-      res.json(parsedResult);
-    } finally {
-      // Clean up temporary script
-      try {
-        await fs.unlink(path.join(__dirname, "..", "test_sample.py"));
-      } catch (unlinkError) {
-        console.error("Failed to delete test script:", unlinkError);
-      }
+    const serviceResult = await callPythonService("/test-sample", {
+      sampleName,
+      features,
+    });
+    if (serviceResult !== null) {
+      return res.status(serviceResult.httpStatus).json(serviceResult);
     }
+
+    // Fall back to a one-off process; the features travel as an argument,
+    // never as generated code
+    const result = await runPythonScript("bulk_score.py", [
+      "--sample",
+      JSON.stringify(features),
+      ...(sampleName ? ["--sample-name", String(sampleName)] : []),
+    ]);
+    res.json(JSON.parse(result));
   } catch (error) {
     console.error("Sample test error:", error);
     res.status(500).json({
@@ -412,6 +376,35 @@ if __name__ == "__main__":
   }
 });
 
+// Bulk scoring of precomputed feature rows: a CSV, .npy or JSON body is piped
+// to the Python server's /score endpoint and its CSV / NDJSON output streamed
+// back (query string passed through: ?output=ndjson&mode=fast)
+app.post("/api/score", (req, res) => {
+  const query = new URLSearchParams(req.query).toString();
+  const headers = { "Content-Type": req.headers["content-type"] || "text/csv" };
+  if (req.headers["content-length"]) {
+    headers["Content-Length"] = req.headers["content-length"];
+  }
+  const proxy = http.request(
+    `${PYTHON_API_URL}/score${query ? `?${query}` : ""}`,
+    { method: "POST", headers },
+    (response) => {
+      res.status(response.statusCode);
+      res.set("Content-Type", response.headers["content-type"]);
+      response.pipe(res);
+    }
+  );
+  proxy.on("error", (error) => {
+    console.error(`Python inference server unavailable: ${error.message}`);
+    if (!res.headersSent) {
+      res.status(503).json({ success: false, error: "Python inference server unavailable" });
+    } else {
+      res.end();
+    }
+  });
+  req.pipe(proxy);
+});
+
 // Get available test samples (matching Streamlit app)
 app.get("/api/test-samples", (req, res) => {
   const testSamples = {
@@ -470,8 +463,13 @@ app.get("/api/model-metrics", async (req, res) => {
     const includeAll = req.query.all === "true";
     const args = includeAll ? ["--all"] : [];
 
-    const result = await runPythonScript("get_model_metrics.py", args);
-    const parsedResult = JSON.parse(result);
+    let parsedResult = await callPythonService(
+      `/model-metrics${includeAll ? "?all=true" : ""}`
+    );
+    if (parsedResult === null) {
+      const result = await runPythonScript("get_model_metrics.py", args);
+      parsedResult = JSON.parse(result);
+    }
 
     if (parsedResult.error) {
       return res.status(500).json({
@@ -498,6 +496,7 @@ const startServer = async () => {
   try {
     await createUploadsDir();
     await createProcessorScript();
+    startPythonService();
 
     app.listen(PORT, () => {
       console.log(
@@ -505,6 +504,7 @@ const startServer = async () => {
       );
       console.log(`📁 Uploads directory ready`);
       console.log(`🐍 Python processor script created`);
+      console.log(`🐍 Python inference server starting on ${PYTHON_API_URL}`);
     });
   } catch (error) {
     console.error("Failed to start server:", error);
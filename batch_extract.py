@@ -0,0 +1,238 @@
+# batch_extract.py
+"""
+Batch feature extraction over many recordings.
+
+Fans extract_features_from_file out over a process pool and streams one row per
+file (columns in FEATURE_ORDER) to CSV or Parquet. Progress is resumable: files
+already present in the output (or in the error log) are skipped on restart, so
+a crash late in a long run does not start over from zero. Per-file failures are
+written to <output>.errors.csv instead of stopping the run.
+
+Usage:
+    python batch_extract.py recordings/ -o features.csv
+    python batch_extract.py "archive/**/*.wav" -o features.parquet --predict
+    python batch_extract.py manifest.txt -o features.csv --workers 8
+"""
+
+import argparse
+import csv
+import glob
+import os
+import sys
+import time
+import warnings
+from multiprocessing import Pool
+
+import numpy as np
+from feature_extraction import extract_features_from_file, FEATURE_ORDER, PITCH_METHODS
+from feature_cache import cached_extract_features
+
+warnings.filterwarnings("ignore", category=UserWarning)
+warnings.filterwarnings("ignore", category=FutureWarning)
+
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.flac', '.m4a', '.ogg', '.webm')
+ERROR_COLUMNS = ["path", "error"]
+
+# Extraction parameters for pool workers (set once per worker process)
+_extract_kwargs = {}
+_use_cache = True
+
+
+def collect_inputs(source):
+    """Resolve a directory, glob pattern or manifest file (one path per line / CSV with a 'path' column)."""
+    if os.path.isdir(source):
+        paths = []
+        for root, _, files in os.walk(source):
+            paths.extend(os.path.join(root, f) for f in files if f.lower().endswith(AUDIO_EXTENSIONS))
+        return sorted(paths)
+
+    if os.path.isfile(source) and not source.lower().endswith(AUDIO_EXTENSIONS):
+        with open(source, newline="") as f:
+            if source.lower().endswith(".csv"):
+                return [row["path"] for row in csv.DictReader(f) if row.get("path")]
+            return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+    return sorted(glob.glob(source, recursive=True))
+
+
+def _init_worker(extract_kwargs, use_cache):
+    global _use_cache
+    _extract_kwargs.update(extract_kwargs)
+    _use_cache = use_cache
+
+
+def _extract_one(path):
+    """Pool worker: returns (path, feature list or None, error message or None)."""
+    try:
+        if _use_cache:
+            features = cached_extract_features(path, **_extract_kwargs)
+        else:
+            features = extract_features_from_file(path, **_extract_kwargs)
+        return path, [float(features.get(k, 0.0)) for k in FEATURE_ORDER], None
+    except Exception as e:
+        return path, None, f"{type(e).__name__}: {e}"
+
+
+def _truncate_partial_line(path):
+    """Drop a half-written trailing line left behind by a crash."""
+    with open(path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+
+def _read_done_paths(csv_path):
+    if not os.path.exists(csv_path):
+        return set()
+    _truncate_partial_line(csv_path)
+    with open(csv_path, newline="") as f:
+        return {row["path"] for row in csv.DictReader(f) if row.get("path")}
+
+
+class CsvSink:
+    """Appends result rows to a CSV file."""
+
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = columns
+
+    def done_paths(self):
+        return _read_done_paths(self.path)
+
+    def write(self, rows):
+        new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        with open(self.path, "a", newline="") as f:
+            writer = csv.writer(f)
+            if new_file:
+                writer.writerow(self.columns)
+            writer.writerows(rows)
+
+
+class ParquetSink:
+    """Writes each flushed chunk as a part file inside an output directory."""
+
+    def __init__(self, path, columns):
+        import pandas as pd  # only needed for Parquet output
+        self.pd = pd
+        self.path = path
+        self.columns = columns
+        os.makedirs(path, exist_ok=True)
+
+    def _parts(self):
+        return sorted(glob.glob(os.path.join(self.path, "part-*.parquet")))
+
+    def done_paths(self):
+        done = set()
+        for part in self._parts():
+            done.update(self.pd.read_parquet(part, columns=["path"])["path"])
+        return done
+
+    def write(self, rows):
+        part = os.path.join(self.path, f"part-{len(self._parts()):05d}.parquet")
+        df = self.pd.DataFrame(rows, columns=self.columns)
+        df.to_parquet(part + ".tmp", index=False)
+        os.replace(part + ".tmp", part)  # atomic, so a crash never leaves a half part
+
+
+def run_batch(paths, output, workers=None, predict=False, flush_every=200, retry_failed=False, use_cache=True,
+              mode="exact", **extract_kwargs):
+    """Extract features for every path, streaming rows to output. Returns (n_ok, n_failed, n_skipped)."""
+    columns = ["path"] + FEATURE_ORDER + (["prediction", "confidence"] if predict else [])
+    sink = ParquetSink(output, columns) if output.lower().endswith(".parquet") else CsvSink(output, columns)
+    error_path = output.rstrip("/\\") + ".errors.csv"
+
+    done = sink.done_paths()
+    if not retry_failed:
+        done |= _read_done_paths(error_path)
+    todo = [p for p in paths if p not in done]
+    n_skipped = len(paths) - len(todo)
+    if n_skipped:
+        print(f"⏩ Resuming: {n_skipped} files already processed, {len(todo)} remaining", file=sys.stderr)
+
+    models = None
+    if predict:
+        from inference import load_models, predict_vector, DEFAULT_PREDICTOR
+        models = load_models(predictor="numpy" if mode == "fast" else DEFAULT_PREDICTOR)
+
+    workers = workers or os.cpu_count() or 1
+    n_ok = n_failed = 0
+    rows, errors = [], []
+    start = time.perf_counter()
+
+    def flush():
+        if rows:
+            if models is not None:
+                X = np.array([r[1:] for r in rows])
+                _, _, labels, probabilities = predict_vector(models, X, mode)
+                confidence = probabilities.max(axis=1)
+                for r, label, conf in zip(rows, labels, confidence):
+                    r.extend([label, float(conf)])
+            sink.write(rows)
+            rows.clear()
+        if errors:
+            new_file = not os.path.exists(error_path)
+            with open(error_path, "a", newline="") as f:
+                writer = csv.writer(f)
+                if new_file:
+                    writer.writerow(ERROR_COLUMNS)
+                writer.writerows(errors)
+            errors.clear()
+
+    with Pool(workers, initializer=_init_worker, initargs=(extract_kwargs, use_cache)) as pool:
+        for i, (path, features, error) in enumerate(pool.imap_unordered(_extract_one, todo, chunksize=4), start=1):
+            if error is None:
+                rows.append([path] + features)
+                n_ok += 1
+            else:
+                errors.append([path, error])
+                n_failed += 1
+
+            if len(rows) + len(errors) >= flush_every:
+                flush()
+            if i % 100 == 0 or i == len(todo):
+                rate = i / (time.perf_counter() - start)
+                print(f"📊 {i}/{len(todo)} files ({rate:.1f} files/s, {n_failed} failed)", file=sys.stderr)
+    flush()
+
+    return n_ok, n_failed, n_skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel batch feature extraction")
+    parser.add_argument("source", help="Directory, glob pattern or manifest file (.txt / .csv with 'path' column)")
+    parser.add_argument("-o", "--output", required=True, help="Output .csv file or .parquet directory")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--predict", action="store_true", help="Add prediction and confidence columns")
+    parser.add_argument("--mode", choices=["exact", "fast"], default="exact",
+                        help="With --predict: exact RBF SVC or the fast approximate model")
+    parser.add_argument("--retry-failed", action="store_true", help="Retry files listed in the error log")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the shared on-disk feature cache")
+    parser.add_argument("--flush-every", type=int, default=200, help="Rows buffered before each write")
+    parser.add_argument("--sr", type=int, default=22050)
+    parser.add_argument("--duration", type=float, default=3.0)
+    parser.add_argument("--offset", type=float, default=0.0)
+    parser.add_argument("--pitch-method", choices=PITCH_METHODS, default="pyin",
+                        help="F0 backend: pyin (accurate) or yin (fast)")
+    parser.add_argument("--vad", action="store_true",
+                        help="Trim silence first; clips without voice go to the error log")
+    args = parser.parse_args()
+
+    paths = collect_inputs(args.source)
+    if not paths:
+        print(f"❌ No audio files found for: {args.source}", file=sys.stderr)
+        sys.exit(1)
+    print(f"🔍 Found {len(paths)} files", file=sys.stderr)
+
+    start = time.perf_counter()
+    n_ok, n_failed, n_skipped = run_batch(
+        paths, args.output, workers=args.workers, predict=args.predict,
+        flush_every=args.flush_every, retry_failed=args.retry_failed, use_cache=not args.no_cache, mode=args.mode,
+        sr=args.sr, duration=args.duration, offset=args.offset,
+        pitch_method=args.pitch_method, vad=args.vad
+    )
+    print(f"\n✅ Done in {time.perf_counter() - start:.1f}s: {n_ok} extracted, "
+          f"{n_failed} failed, {n_skipped} skipped -> {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
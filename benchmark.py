@@ -0,0 +1,283 @@
+# benchmark.py
+"""
+Stage-level performance benchmarks.
+
+Generates synthetic voiced (harmonic, with vibrato) and unvoiced (noise)
+clips at several lengths and sample rates, then times every stage of
+extract_features_from_file: decode/resample, STFT, the single-pass spectral
+engine (STFT included), pitch (pyin and yin) and the statistics block.
+feature_extraction.py and the original feature_extraction_fixed.py are also
+timed end to end side by side.
+Scaler / PCA / SVC inference is timed at batch sizes 1 to 10k for both the
+sklearn and the NumPy predictor.
+
+Each benchmark reports p50/p95/p99 latency, throughput and the process peak
+RSS. Results are written as JSON tagged with the git commit, so runs on
+different commits can be diffed:
+
+    python benchmark.py                          # -> bench_results/<commit>.json
+    python benchmark.py --quick                  # fewer lengths and repeats
+    python benchmark.py --compare old.json new.json
+"""
+
+import argparse
+import importlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import soundfile as sf
+# Imported first: sets NUMBA_CACHE_DIR before librosa is imported
+from startup import NUMBA_CACHE_DIR
+
+RESULTS_DIR = "bench_results"
+LENGTHS = [1.0, 3.0, 10.0]
+SAMPLE_RATES = [16000, 44100]
+BATCH_SIZES = [1, 10, 100, 1000, 10000]
+TARGET_SR = 22050
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, or None if unavailable."""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    try:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+    except (ImportError, AttributeError):
+        return None
+
+
+def synth_clip(kind, seconds, sr, seed=0):
+    """Voiced: 150 Hz harmonic stack with vibrato and breath noise. Unvoiced: band-limited noise."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sr)) / sr
+    if kind == "voiced":
+        f0 = 150 + 10 * np.sin(2 * np.pi * 5 * t)
+        phase = 2 * np.pi * np.cumsum(f0) / sr
+        y = sum(np.sin(k * phase) / k for k in range(1, 8))
+        y = 0.3 * y / np.abs(y).max() + 0.01 * rng.standard_normal(len(t))
+    else:
+        y = 0.1 * rng.standard_normal(len(t))
+    return y.astype(np.float32)
+
+
+def time_call(fn, repeats, warmup=1):
+    """Run fn warmup + repeats times; return per-call latencies in seconds."""
+    for _ in range(warmup):
+        fn()
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def summarize(latencies, items=1):
+    lat = np.asarray(latencies)
+    return {
+        "repeats": len(lat),
+        "mean_ms": float(lat.mean() * 1000),
+        "p50_ms": float(np.percentile(lat, 50) * 1000),
+        "p95_ms": float(np.percentile(lat, 95) * 1000),
+        "p99_ms": float(np.percentile(lat, 99) * 1000),
+        "throughput_per_s": float(items / lat.mean()),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def bench_extraction(clip_dir, lengths, sample_rates, repeats):
+    """Per-stage timings of the extraction path for every synthetic clip."""
+    import feature_extraction as fe
+
+    results = []
+    for kind in ("voiced", "unvoiced"):
+        for seconds in lengths:
+            for sr in sample_rates:
+                path = os.path.join(clip_dir, f"{kind}_{seconds:g}s_{sr}.wav")
+                sf.write(path, synth_clip(kind, seconds, sr), sr)
+                y, _ = fe.load_audio(path, sr=TARGET_SR, duration=seconds)
+                summary = fe.spectral_summary(y)
+                f0_clean = fe.estimate_f0(y, TARGET_SR)
+
+                stages = {
+                    "decode_resample": lambda: fe.load_audio(path, sr=TARGET_SR, duration=seconds),
+                    "stft": lambda: list(fe.stft_magnitude_blocks(y)),
+                    "spectral": lambda: fe.spectral_summary(y),
+                    "pitch_pyin": lambda: fe.estimate_f0(y, TARGET_SR, method="pyin"),
+                    "pitch_yin": lambda: fe.estimate_f0(y, TARGET_SR, method="yin"),
+                    "statistics": lambda: fe.spectrum_statistics(*summary, f0_clean, TARGET_SR),
+                }
+                for stage, fn in stages.items():
+                    row = {"group": "extraction", "clip": kind, "seconds": seconds, "sr": sr, "stage": stage}
+                    row.update(summarize(time_call(fn, repeats), items=seconds))
+                    results.append(row)
+                    print(f"  {kind:<8} {seconds:>5g}s {sr:>6} Hz  {stage:<16} p50 {row['p50_ms']:9.2f} ms")
+    return results
+
+
+def bench_modules(clip_dir, lengths, repeats, modules=("feature_extraction", "feature_extraction_fixed")):
+    """End-to-end extract_features_from_file of each extractor module on the same clips."""
+    results = []
+    for seconds in lengths:
+        path = os.path.join(clip_dir, f"voiced_{seconds:g}s_{SAMPLE_RATES[0]}.wav")
+        if not os.path.exists(path):
+            sf.write(path, synth_clip("voiced", seconds, SAMPLE_RATES[0]), SAMPLE_RATES[0])
+        for name in modules:
+            module = importlib.import_module(name)
+            variants = {"default": {}}
+            if "pitch_method" in module.extract_features_from_file.__code__.co_varnames:
+                variants["yin"] = {"pitch_method": "yin"}
+            for variant, kwargs in variants.items():
+                fn = lambda: module.extract_features_from_file(path, sr=TARGET_SR, duration=seconds, **kwargs)
+                row = {"group": "module", "module": name, "variant": variant, "seconds": seconds,
+                       "stage": "extract_features_from_file"}
+                row.update(summarize(time_call(fn, repeats), items=seconds))
+                results.append(row)
+                print(f"  {name:<26} {variant:<8} {seconds:>5g}s  p50 {row['p50_ms']:9.2f} ms")
+    return results
+
+
+def bench_inference(batch_sizes, repeats, data_path="data/voice.csv"):
+    """Scaler, PCA and SVC (sklearn) and the fused NumPy predictor at several batch sizes."""
+    from dataset_cache import load_dataset
+    from inference import load_models
+    from numpy_predictor import NumpyPredictor
+
+    models = load_models(predictor="sklearn")
+    scaler, pca, model = models["scaler"], models["pca"], models["final_model"]
+    X_all = np.asarray(load_dataset(data_path).X)
+    try:
+        fast = NumpyPredictor.from_models(models)
+    except ValueError:
+        fast = None
+
+    results = []
+    for batch in batch_sizes:
+        X = X_all[np.arange(batch) % len(X_all)]
+        X_scaled = scaler.transform(X)
+        X_pca = pca.transform(X_scaled)
+        stages = {
+            "scaler": lambda: scaler.transform(X),
+            "pca": lambda: pca.transform(X_scaled),
+            "svc_predict_proba": lambda: (model.predict(X_pca), model.predict_proba(X_pca)),
+            "sklearn_pipeline": lambda: model.predict_proba(pca.transform(scaler.transform(X))),
+        }
+        if fast is not None:
+            stages["numpy_pipeline"] = lambda: fast.predict_vector(X)
+        n_repeats = max(3, repeats if batch <= 1000 else repeats // 4)
+        for stage, fn in stages.items():
+            row = {"group": "inference", "batch": batch, "stage": stage}
+            row.update(summarize(time_call(fn, n_repeats), items=batch))
+            results.append(row)
+            print(f"  batch {batch:>6}  {stage:<18} p50 {row['p50_ms']:9.3f} ms  "
+                  f"{row['throughput_per_s']:12.0f} rows/s")
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                    capture_output=True, text=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        commit, dirty = "unknown", False
+    import librosa
+    import sklearn
+    return {
+        "commit": commit,
+        "dirty": dirty,
+        "created": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "librosa": librosa.__version__,
+        "sklearn": sklearn.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "numba_cache_dir": NUMBA_CACHE_DIR,
+    }
+
+
+def run(quick=False, repeats=None, groups=("extraction", "module", "inference")):
+    lengths = [1.0, 3.0] if quick else LENGTHS
+    sample_rates = SAMPLE_RATES[:1] if quick else SAMPLE_RATES
+    repeats = repeats or (3 if quick else 10)
+
+    report = {"environment": environment(), "repeats": repeats, "results": []}
+    with tempfile.TemporaryDirectory(prefix="voice_bench_") as clip_dir:
+        if "extraction" in groups:
+            print("\n⏱️  Extraction stages")
+            report["results"] += bench_extraction(clip_dir, lengths, sample_rates, repeats)
+        if "module" in groups:
+            print("\n⏱️  feature_extraction vs feature_extraction_fixed")
+            report["results"] += bench_modules(clip_dir, lengths, repeats)
+    if "inference" in groups:
+        print("\n⏱️  Model inference")
+        report["results"] += bench_inference(BATCH_SIZES, repeats * 5)
+    report["peak_rss_mb"] = peak_rss_mb()
+    return report
+
+
+def _row_key(row):
+    return tuple(str(row.get(k, "")) for k in ("group", "module", "variant", "clip", "seconds", "sr", "batch", "stage"))
+
+
+def compare(old_path, new_path):
+    """Print p50 latency of every benchmark present in both reports, with the new/old ratio."""
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    old_rows = {_row_key(r): r for r in old["results"]}
+    print(f"\n{'benchmark':<70} {'old p50':>10} {'new p50':>10} {'ratio':>7}")
+    print(f"{'':<70} {old['environment']['commit']:>10} {new['environment']['commit']:>10}")
+    for row in new["results"]:
+        before = old_rows.get(_row_key(row))
+        if before is None:
+            continue
+        label = " ".join(part for part in _row_key(row) if part)
+        ratio = row["p50_ms"] / before["p50_ms"] if before["p50_ms"] > 0 else float("nan")
+        flag = "  ⚠️" if ratio > 1.2 else ""
+        print(f"{label:<70} {before['p50_ms']:10.3f} {row['p50_ms']:10.3f} {ratio:7.2f}{flag}")
+
+
+if __name__ == "__main__":
+    import warnings
+    warnings.filterwarnings("ignore")
+
+    parser = argparse.ArgumentParser(description="Stage-level extraction and inference benchmarks")
+    parser.add_argument("--quick", action="store_true", help="Fewer clip lengths, sample rates and repeats")
+    parser.add_argument("--repeats", type=int, help="Timed repetitions per extraction benchmark")
+    parser.add_argument("--only", choices=["extraction", "module", "inference"], action="append",
+                        help="Run only the given group (repeatable)")
+    parser.add_argument("--output", help=f"Report path (default {RESULTS_DIR}/<commit>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Diff two saved reports")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        sys.exit(0)
+
+    report = run(quick=args.quick, repeats=args.repeats,
+                 groups=args.only or ("extraction", "module", "inference"))
+    env = report["environment"]
+    output = args.output or os.path.join(RESULTS_DIR, f"{env['commit']}{'-dirty' if env['dirty'] else ''}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✅ Benchmark report saved to {output} (peak RSS {report['peak_rss_mb']:.0f} MB)")
@@ -0,0 +1,280 @@
+# dataset_cache.py
+"""
+Columnar, memory-mapped cache of the training CSV (data/voice.csv).
+
+The CSV is parsed once, in chunks, into typed .npy arrays under
+.dataset_cache/<sha256 of the CSV>/ and every later load is a zero-copy
+np.load(mmap_mode="r"):
+
+    meta.json                  columns, classes, row count, source hash
+    X.npy, y.npy               float64 features (rows x 20), int32 encoded labels
+    split-<test>-<seed>/       stratified split: train_idx / test_idx plus
+                               contiguous X_train / X_test / y_train / y_test
+        proj-<key>/            X_{train,test}_{scaled,pca} for one fitted
+                               scaler + PCA (key = hash of the two pickles)
+
+Labels are encoded like LabelEncoder (sorted classes). The split uses
+train_test_split(test_size, random_state, stratify=y), so the indices are
+identical to the ones train.py always used. Conversion and projection work
+chunk by chunk into preallocated memmaps, so datasets much larger than
+memory only cost disk space. The CSV hash is remembered per (path, size,
+mtime), so unchanged data is not even re-hashed.
+
+Used by train.py, get_model_metrics.py, debug_model.py and model_bundle.py.
+
+    python dataset_cache.py            # build (if needed) and describe the cache
+    python dataset_cache.py --clear    # delete it
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+import uuid
+
+import numpy as np
+
+from feature_cache import hash_file
+
+DATA_PATH = "data/voice.csv"
+CACHE_DIR = os.environ.get("VOICE_DATASET_CACHE_DIR", ".dataset_cache")
+LABEL_COLUMN = "label"
+CHUNK_ROWS = 100_000
+SCHEMA_VERSION = 1
+_INDEX_FILE = "index.json"
+
+
+def _load(path):
+    return np.load(path, mmap_mode="r")
+
+
+def _publish(tmp_dir, final_dir):
+    """Move a fully written directory into place; another process may have won the race."""
+    try:
+        os.replace(tmp_dir, final_dir)
+    except OSError:
+        if not os.path.isdir(final_dir):
+            raise
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def _tmp_dir(parent):
+    path = os.path.join(parent, f".tmp-{uuid.uuid4().hex}")
+    os.makedirs(path)
+    return path
+
+
+def csv_fingerprint(path=DATA_PATH, cache_dir=CACHE_DIR):
+    """SHA-256 of the CSV, reusing the stored hash while its size and mtime are unchanged."""
+    stat = os.stat(path)
+    index_path = os.path.join(cache_dir, _INDEX_FILE)
+    try:
+        with open(index_path) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        index = {}
+    key = os.path.abspath(path)
+    entry = index.get(key)
+    if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+        return entry["sha256"]
+
+    sha256 = hash_file(path)
+    index[key] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": sha256}
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{index_path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(index, f, indent=2)
+    os.replace(tmp_path, index_path)
+    return sha256
+
+
+def _convert(csv_path, out_dir):
+    """Parse the CSV chunk by chunk into X.npy / y.npy / meta.json."""
+    import pandas as pd
+
+    n_lines, last = 0, b"\n"
+    with open(csv_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            n_lines += block.count(b"\n")
+            last = block[-1:]
+    n_rows = n_lines - (last == b"\n")  # minus the header line
+    header = pd.read_csv(csv_path, nrows=0).columns.tolist()
+    feature_names = [c for c in header if c != LABEL_COLUMN]
+    # Blank lines make the line count an overestimate; X is trimmed below if so
+    X = np.lib.format.open_memmap(os.path.join(out_dir, "X.tmp.npy"), mode="w+", dtype=np.float64,
+                                  shape=(n_rows, len(feature_names)))
+    raw_labels = np.empty(n_rows, dtype=np.int32)
+    label_ids = {}
+    n = 0
+    for chunk in pd.read_csv(csv_path, chunksize=CHUNK_ROWS):
+        rows = len(chunk)
+        X[n:n + rows] = chunk[feature_names].to_numpy(dtype=np.float64)
+        codes, uniques = pd.factorize(chunk[LABEL_COLUMN])
+        mapping = np.array([label_ids.setdefault(label, len(label_ids)) for label in uniques], dtype=np.int32)
+        raw_labels[n:n + rows] = mapping[codes]
+        n += rows
+
+    # LabelEncoder order: sorted class names
+    classes = sorted(label_ids)
+    remap = np.empty(len(classes), dtype=np.int32)
+    for encoded, label in enumerate(classes):
+        remap[label_ids[label]] = encoded
+    np.save(os.path.join(out_dir, "y.npy"), remap[raw_labels[:n]])
+
+    if n == n_rows:
+        X.flush()
+        del X
+        os.replace(os.path.join(out_dir, "X.tmp.npy"), os.path.join(out_dir, "X.npy"))
+    else:
+        final = np.lib.format.open_memmap(os.path.join(out_dir, "X.npy"), mode="w+", dtype=np.float64,
+                                          shape=(n, len(feature_names)))
+        for start in range(0, n, CHUNK_ROWS):
+            final[start:start + CHUNK_ROWS] = X[start:start + CHUNK_ROWS]
+        final.flush()
+        del X, final
+        os.unlink(os.path.join(out_dir, "X.tmp.npy"))
+
+    return {"version": SCHEMA_VERSION, "n_rows": n, "feature_names": feature_names, "classes": classes}
+
+
+def _copy_rows(src, idx, path):
+    """Gather src[idx] into a new .npy at path, CHUNK_ROWS at a time."""
+    out = np.lib.format.open_memmap(path, mode="w+", dtype=src.dtype, shape=(len(idx),) + src.shape[1:])
+    for start in range(0, len(idx), CHUNK_ROWS):
+        out[start:start + CHUNK_ROWS] = src[idx[start:start + CHUNK_ROWS]]
+    out.flush()
+
+
+def projection_key(*paths):
+    """Key for a fitted scaler + PCA: hash of their pickle files."""
+    h = hashlib.sha256()
+    for path in paths:
+        h.update(hash_file(path).encode())
+    return h.hexdigest()[:16]
+
+
+class Split:
+    """A persisted stratified train/test split; every array is a read-only memmap."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        for name in ("train_idx", "test_idx", "X_train", "X_test", "y_train", "y_test"):
+            setattr(self, name, _load(os.path.join(directory, f"{name}.npy")))
+
+    def arrays(self):
+        """(X_train, X_test, y_train, y_test), like train_test_split."""
+        return self.X_train, self.X_test, self.y_train, self.y_test
+
+    def load_projections(self, key):
+        """Stored scaled / PCA matrices for a projection key, or None."""
+        directory = os.path.join(self.directory, f"proj-{key}")
+        if not os.path.isdir(directory):
+            return None
+        names = ("X_train_scaled", "X_test_scaled", "X_train_pca", "X_test_pca")
+        return {name: _load(os.path.join(directory, f"{name}.npy")) for name in names}
+
+    def save_projections(self, key, **arrays):
+        """Persist already computed X_{train,test}_{scaled,pca} arrays under key."""
+        directory = os.path.join(self.directory, f"proj-{key}")
+        if not os.path.isdir(directory):
+            tmp = _tmp_dir(self.directory)
+            for name, array in arrays.items():
+                np.save(os.path.join(tmp, f"{name}.npy"), np.ascontiguousarray(array))
+            _publish(tmp, directory)
+        return self.load_projections(key)
+
+    def projections(self, scaler, pca, key):
+        """Scaled and PCA-projected train/test matrices, computed in chunks on first use."""
+        stored = self.load_projections(key)
+        if stored is not None:
+            return stored
+        tmp = _tmp_dir(self.directory)
+        for part, X in (("train", self.X_train), ("test", self.X_test)):
+            scaled = np.lib.format.open_memmap(os.path.join(tmp, f"X_{part}_scaled.npy"), mode="w+",
+                                               dtype=np.float64, shape=X.shape)
+            projected = np.lib.format.open_memmap(os.path.join(tmp, f"X_{part}_pca.npy"), mode="w+",
+                                                  dtype=np.float64, shape=(len(X), int(pca.n_components_)))
+            for start in range(0, len(X), CHUNK_ROWS):
+                block = scaler.transform(X[start:start + CHUNK_ROWS])
+                scaled[start:start + CHUNK_ROWS] = block
+                projected[start:start + CHUNK_ROWS] = pca.transform(block)
+            scaled.flush()
+            projected.flush()
+            del scaled, projected
+        _publish(tmp, os.path.join(self.directory, f"proj-{key}"))
+        return self.load_projections(key)
+
+
+class Dataset:
+    """Memory-mapped features (X) and encoded labels (y) of one version of the CSV."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.X = _load(os.path.join(directory, "X.npy"))
+        self.y = _load(os.path.join(directory, "y.npy"))
+
+    @property
+    def feature_names(self):
+        return self.meta["feature_names"]
+
+    @property
+    def classes(self):
+        return np.asarray(self.meta["classes"])
+
+    @property
+    def sha256(self):
+        return self.meta["sha256"]
+
+    def split(self, test_size=0.2, random_state=42):
+        """The stratified train/test split, created and persisted on first use."""
+        directory = os.path.join(self.directory, f"split-{test_size:g}-{random_state}")
+        if not os.path.isdir(directory):
+            from sklearn.model_selection import train_test_split
+            train_idx, test_idx = train_test_split(np.arange(len(self.y)), test_size=test_size,
+                                                   random_state=random_state, stratify=self.y)
+            tmp = _tmp_dir(self.directory)
+            np.save(os.path.join(tmp, "train_idx.npy"), train_idx)
+            np.save(os.path.join(tmp, "test_idx.npy"), test_idx)
+            for part, idx in (("train", train_idx), ("test", test_idx)):
+                _copy_rows(self.X, idx, os.path.join(tmp, f"X_{part}.npy"))
+                np.save(os.path.join(tmp, f"y_{part}.npy"), self.y[idx])
+            _publish(tmp, directory)
+        return Split(directory)
+
+    def head(self, n=10):
+        """First n rows as a DataFrame in the CSV's column layout."""
+        import pandas as pd
+        df = pd.DataFrame(np.asarray(self.X[:n]), columns=self.feature_names)
+        df[LABEL_COLUMN] = self.classes[self.y[:n]]
+        return df
+
+
+def load_dataset(path=DATA_PATH, cache_dir=CACHE_DIR):
+    """Open the cached arrays for the CSV at path, converting it on first use."""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{path} not found!")
+    sha256 = csv_fingerprint(path, cache_dir)
+    directory = os.path.join(cache_dir, sha256)
+    if not os.path.isdir(directory):
+        tmp = _tmp_dir(cache_dir)
+        meta = _convert(path, tmp)
+        meta.update(sha256=sha256, source=os.path.basename(path))
+        with open(os.path.join(tmp, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=2)
+        _publish(tmp, directory)
+    return Dataset(directory)
+
+
+if __name__ == "__main__":
+    if "--clear" in sys.argv:
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+        print(f"🗑️  Removed {CACHE_DIR}/")
+        sys.exit(0)
+    dataset = load_dataset()
+    split = dataset.split()
+    print(f"✅ {dataset.directory}: {len(dataset.y)} rows x {len(dataset.feature_names)} features, "
+          f"classes {dataset.classes.tolist()}")
+    print(f"   train {len(split.y_train)} / test {len(split.y_test)} ({split.directory})")
@@ -1,6 +1,6 @@
 # debug_dataset.py
-import pandas as pd
 import os
+from dataset_cache import load_dataset, LABEL_COLUMN
 
 # Path to your dataset CSV
 DATA_PATH = "data/voice.csv"  # replace with your CSV path
@@ -8,13 +8,13 @@ DATA_PATH = "data/voice.csv"  # replace with your CSV path
 if not os.path.exists(DATA_PATH):
     raise FileNotFoundError(f"{DATA_PATH} not found!")
 
-# Load dataset
-df = pd.read_csv(DATA_PATH)
+# Load dataset (memory-mapped cache, converted from the CSV on first use)
+dataset = load_dataset(DATA_PATH)
 
 # Print column names
 print("Columns in the dataset:")
-for i, col in enumerate(df.columns, start=1):
+for i, col in enumerate(dataset.feature_names + [LABEL_COLUMN], start=1):
     print(f"{i}. {col}")
 
 print("\nFirst 10 rows of the dataset:")
-print(df.head(10))
+print(dataset.head(10))
@@ -0,0 +1,198 @@
+# feature_cache.py
+"""
+Content-addressed on-disk cache for extracted audio features.
+
+Entries are keyed by a SHA-256 of the audio bytes plus the extraction
+parameters (sr, duration, offset, pitch method) and an extractor version that
+is itself a hash of the extraction code (feature_extraction.py, audio_io.py
+and voice_activity.py), so any change to decoding, resampling, VAD or the
+features invalidates old entries automatically. Each entry is the 20 features in
+FEATURE_ORDER stored as 160 raw little-endian float64 bytes (followed by the
+voice-activity stats for vad=True extractions). The cache is
+bounded by size and evicts least recently used entries (by file mtime, which
+is refreshed on every hit).
+
+Shared by app.py, the inference server / processor script (via inference.py)
+and batch_extract.py. Configure with VOICE_FEATURE_CACHE_DIR,
+VOICE_FEATURE_CACHE_MAX_MB, or disable with VOICE_FEATURE_CACHE=0.
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+import audio_io
+import feature_extraction
+import voice_activity
+from feature_extraction import extract_features_from_file, FEATURE_ORDER
+from instrumentation import timed
+
+DEFAULT_CACHE_DIR = os.environ.get("VOICE_FEATURE_CACHE_DIR", ".feature_cache")
+DEFAULT_MAX_MB = float(os.environ.get("VOICE_FEATURE_CACHE_MAX_MB", "256"))
+ENTRY_SUFFIX = ".f64"
+# Stored after the features when extraction ran with vad=True
+VAD_FIELDS = ("total_samples", "voiced_samples", "skipped_samples", "regions")
+
+# Modules whose code determines the cached features
+EXTRACTOR_MODULES = (feature_extraction, audio_io, voice_activity)
+_extractor_version = None
+
+
+def extractor_version():
+    """Hash of the EXTRACTOR_MODULES sources; changes whenever the extraction code changes."""
+    global _extractor_version
+    if _extractor_version is None:
+        h = hashlib.sha256()
+        for module in EXTRACTOR_MODULES:
+            with open(module.__file__, "rb") as f:
+                h.update(f.read())
+        _extractor_version = h.hexdigest()[:16]
+    return _extractor_version
+
+
+def hash_file(path, chunk_size=1 << 20):
+    """SHA-256 of a file's bytes, read in chunks."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def hash_source(source):
+    """SHA-256 of a file path's contents or of in-memory audio bytes."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return hashlib.sha256(source).hexdigest()
+    return hash_file(source)
+
+
+def make_key(audio_hash, **params):
+    """Cache key for an audio content hash and extraction parameters."""
+    params = dict(params, extractor=extractor_version())
+    h = hashlib.sha256(audio_hash.encode())
+    h.update(json.dumps(params, sort_keys=True).encode())
+    return h.hexdigest()
+
+
+class FeatureCache:
+    """Size-bounded LRU feature store on disk."""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_mb=DEFAULT_MAX_MB, check_every=100):
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.check_every = check_every
+        self._puts = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self.evict()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ENTRY_SUFFIX)
+
+    def get(self, key):
+        """Return the cached feature dict or None."""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)  # mark as recently used
+        except OSError:
+            return None
+        values = np.frombuffer(data, dtype="<f8")
+        if len(values) not in (len(FEATURE_ORDER), len(FEATURE_ORDER) + len(VAD_FIELDS)):
+            return None
+        features = {k: float(v) for k, v in zip(FEATURE_ORDER, values)}
+        if len(values) > len(FEATURE_ORDER):
+            features["vad"] = {k: int(v) for k, v in zip(VAD_FIELDS, values[len(FEATURE_ORDER):])}
+        return features
+
+    def put(self, key, features):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        values = [features.get(k, 0.0) for k in FEATURE_ORDER]
+        if "vad" in features:
+            values += [features["vad"][k] for k in VAD_FIELDS]
+        data = np.array(values, dtype="<f8").tobytes()
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._puts += 1
+            check = self._puts % self.check_every == 0
+        if check:
+            self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(ENTRY_SUFFIX):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            total -= size
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_default_cache():
+    """Process-wide cache, or None when disabled with VOICE_FEATURE_CACHE=0."""
+    global _default_cache
+    if os.environ.get("VOICE_FEATURE_CACHE", "1") == "0":
+        return None
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = FeatureCache()
+        return _default_cache
+
+
+def cached_extract_features(path, sr=22050, duration=3.0, offset=0.0, pitch_method="pyin", cache=None,
+                            extract_fn=extract_features_from_file, vad=False):
+    """
+    extract_features_from_file with the on-disk cache in front of it.
+
+    path may be a file path, raw audio bytes or a binary file object (read
+    once into bytes). Its contents are hashed for the key; on a miss
+    extract_fn(path, sr=..., duration=..., offset=..., pitch_method=...)
+    produces the features. vad=True is passed on (and keyed) only when set, so
+    entries for plain extractions keep their keys; clips without voice raise
+    NoVoiceDetected and are not cached.
+    """
+    if hasattr(path, "read"):
+        path = path.read()
+    params = dict(sr=sr, duration=duration, offset=offset, pitch_method=pitch_method)
+    if vad:
+        params["vad"] = True
+    cache = cache or get_default_cache()
+    if cache is None:
+        return extract_fn(path, **params)
+
+    with timed("cache_lookup"):
+        key = make_key(hash_source(path), resampler=audio_io.DEFAULT_RESAMPLER, **params)
+        features = cache.get(key)
+    if features is None:
+        features = extract_fn(path, **params)
+        cache.put(key, features)
+    return features
@@ -1,10 +1,21 @@
 # feature_extraction_fixed.py
 import numpy as np
-import librosa
-from scipy.stats import skew, kurtosis
+from startup import lazy_import
+from instrumentation import timed
+from audio_io import load_audio
+from voice_activity import detect_voice, NoVoiceDetected
 import warnings
 warnings.filterwarnings("ignore", category=UserWarning)
 
+# librosa (and numba behind it) is heavy; only import it on first use
+librosa = lazy_import("librosa")
+scipy_signal = lazy_import("scipy.signal")
+scipy_fft = lazy_import("scipy.fft")
+
+# Feature order from voice.csv dataset
+FEATURE_ORDER = ['meanfreq', 'sd', 'median', 'Q25', 'Q75', 'IQR', 'skew', 'kurt', 'sp.ent', 'sfm',
+                 'mode', 'centroid', 'meanfun', 'minfun', 'maxfun', 'meandom', 'mindom', 'maxdom', 'dfrange', 'modindx']
+
 def spectral_entropy(S, power_spectrogram=True):
     if power_spectrogram:
         S = S**2
@@ -13,46 +24,271 @@ def spectral_entropy(S, power_spectrogram=True):
     ent = -np.sum(P * np.log2(P + 1e-12), axis=0)
     return np.mean(ent)
 
-def extract_features_from_file(path, sr=22050, duration=3.0, offset=0.0):
-    y, sr = librosa.load(path, sr=sr, duration=duration, offset=offset)
+def yin_fast(y, sr, fmin=80, fmax=400, target_sr=4000, frame_length=2048, hop_length=512, threshold=0.3):
+    """
+    Vectorized YIN pitch tracker on a decimated signal.
+
+    Fast alternative to librosa.pyin: the signal is low-passed and decimated to
+    about target_sr (only 80-400 Hz matters), the cumulative mean normalized
+    difference function is computed for all frames at once via FFT, and frames
+    whose YIN dip stays above threshold or which are near-silent are unvoiced.
+    frame_length/hop_length are given at the original rate so frame timing
+    matches pyin. Returns f0 per frame with NaN for unvoiced frames, like pyin.
+
+    Feature-level agreement with pyin (3 s clips): on temp.wav
+    meanfun/minfun/maxfun/modindx differ by -0.0060/+0.0002/+0.0039/+0.0098;
+    on synthetic harmonic voices at 100-320 Hz with vibrato meanfun is within
+    0.0004 (0.4 Hz). F0 tracking is ~15x faster than pyin and full extraction
+    ~9x faster. The effect on classifier accuracy / F1 has NOT been measured:
+    the repository has no labeled recordings (data/voice.csv holds features
+    computed by another extractor, not audio). To measure it, extract a
+    labeled corpus with batch_extract.py --pitch-method pyin and yin and score
+    both feature sets with the same model.
+    """
+    q = max(1, int(sr // target_sr))
+    y_d = scipy_signal.resample_poly(y, 1, q) if q > 1 else np.asarray(y, dtype=float)
+    sr_d = sr / q
+    frame_length = max(int(round(frame_length / q)), 4)
+    hop_length = max(int(round(hop_length / q)), 1)
+
+    tau_min = max(int(np.floor(sr_d / fmax)), 1)
+    tau_max = min(int(np.ceil(sr_d / fmin)), frame_length // 2)
+    W = frame_length - tau_max - 1
+
+    y_d = np.pad(y_d, frame_length // 2)
+    if len(y_d) < frame_length:
+        y_d = np.pad(y_d, (0, frame_length - len(y_d)))
+    frames = np.lib.stride_tricks.sliding_window_view(y_d, frame_length)[::hop_length]
+
+    # Difference function d(tau) = E(x[:W]) + E(x[tau:tau+W]) - 2 r(tau)
+    n_fft = int(2 ** np.ceil(np.log2(frame_length + W)))
+    r = np.fft.irfft(np.fft.rfft(frames, n_fft) * np.conj(np.fft.rfft(frames[:, :W], n_fft)), n_fft)
+    r = r[:, :tau_max + 2]
+    energy = np.cumsum(np.pad(frames ** 2, ((0, 0), (1, 0))), axis=1)
+    lags = np.arange(tau_max + 2)
+    d = energy[:, [W]] + energy[:, lags + W] - energy[:, lags] - 2 * r
+    d = np.maximum(d, 0)
+
+    # Cumulative mean normalized difference
+    cmnd = np.ones_like(d)
+    cumsum = np.cumsum(d[:, 1:], axis=1)
+    cmnd[:, 1:] = d[:, 1:] * lags[1:] / (cumsum + 1e-12)
+
+    # First local minimum below threshold within [tau_min, tau_max]
+    search = cmnd[:, tau_min:tau_max + 1]
+    below = (search[:, :-1] < threshold) & (search[:, :-1] <= search[:, 1:])
+    voiced = below.any(axis=1)
+    tau = np.argmax(below, axis=1) + tau_min
+
+    # Parabolic interpolation for sub-sample lag precision
+    rows = np.arange(len(tau))
+    left = cmnd[rows, np.maximum(tau - 1, 0)]
+    mid = cmnd[rows, tau]
+    right = cmnd[rows, tau + 1]
+    denom = left - 2 * mid + right
+    shift = np.where(np.abs(denom) > 1e-12, 0.5 * (left - right) / np.where(denom == 0, 1, denom), 0.0)
+    tau_hat = tau + np.clip(shift, -1, 1)
+
+    # Near-silent frames are unvoiced regardless of periodicity
+    rms = np.sqrt(energy[:, -1] / frame_length)
+    voiced &= rms > 0.02 * (rms.max() + 1e-12)
+
+    f0 = sr_d / tau_hat
+    voiced &= (f0 >= fmin) & (f0 <= fmax)
+    return np.where(voiced, f0, np.nan)
+
+PITCH_METHODS = ("pyin", "yin")
+
+def estimate_f0(y, sr, method="pyin", fmin=80, fmax=400):
+    """Return voiced F0 values (Hz) using the selected pitch backend."""
+    if method not in PITCH_METHODS:
+        raise ValueError(f"Unknown pitch method '{method}', expected one of {PITCH_METHODS}")
+    try:
+        if method == "yin":
+            f0 = yin_fast(y, sr, fmin=fmin, fmax=fmax)
+        else:
+            f0, voiced_flag, voiced_probs = librosa.pyin(y, fmin=fmin, fmax=fmax, sr=sr)
+        return f0[~np.isnan(f0)]
+    except Exception:
+        return np.array([])
+
+N_FFT = 2048
+HOP_LENGTH = 512
+# STFT frames processed per block by the spectral engine
+BLOCK_FRAMES = 64
+# librosa.feature.spectral_flatness floor on the power spectrum
+FLATNESS_AMIN = 1e-10
+
+def stft_magnitude_blocks(y, n_fft=N_FFT, hop_length=HOP_LENGTH, block_frames=BLOCK_FRAMES):
+    """
+    Yield |STFT| in blocks of up to block_frames frames, shape (frames, 1 + n_fft // 2).
+
+    Same frames as librosa.stft(y, n_fft, hop_length) (centered, zero padded,
+    periodic Hann window), but only one block is ever materialized, so memory
+    is O(block_frames * n_fft) whatever the signal length.
+    """
+    y = np.asarray(y, dtype=np.float32)
+    window = scipy_signal.get_window("hann", n_fft, fftbins=True).astype(np.float32)
+    half = n_fft // 2
+    n_frames = 1 + (len(y) + 2 * half - n_fft) // hop_length
+    for t0 in range(0, n_frames, block_frames):
+        t1 = min(t0 + block_frames, n_frames)
+        # Signal span covered by frames t0..t1-1, zero padded past either end
+        start, stop = t0 * hop_length - half, (t1 - 1) * hop_length + half + (n_fft - 2 * half)
+        segment = y[max(start, 0):min(stop, len(y))]
+        if start < 0 or stop > len(y):
+            segment = np.pad(segment, (max(-start, 0), max(stop - len(y), 0)))
+        frames = np.lib.stride_tricks.sliding_window_view(segment, n_fft)[::hop_length]
+        yield np.abs(scipy_fft.rfft(frames * window, axis=1)).astype(np.float32, copy=False)
+
+def frame_entropy_flatness(S):
+    """Per-frame spectral entropy (bits) and flatness of |STFT| frames along the last axis."""
+    power = np.square(S)
+    floored = np.maximum(power, FLATNESS_AMIN)
+    log_power = np.log(floored)
+
+    # Spectral entropy of each frame's normalized power distribution P = power / total,
+    # expanded as sum(P * log P) = sum(power * log power) / total - log(total) * sum(P).
+    # Bins below the flatness floor contribute < 1e-10 / total either way.
+    power_sum = power.sum(axis=-1)
+    total = power_sum + 1e-12
+    entropy = (np.log(total) * (power_sum / total) - np.sum(power * log_power, axis=-1) / total) / np.log(2)
+
+    # Spectral flatness: geometric / arithmetic mean of the floored power
+    flatness = np.exp(np.mean(log_power, axis=-1)) / np.mean(floored, axis=-1)
+    return entropy, flatness
+
+class SpectralAccumulator:
+    """
+    Running float32 accumulators for every spectrum-derived feature.
+
+    Feed |STFT| blocks (frames x bins) to update(); summary() returns the
+    mean magnitude spectrum, mean per-frame spectral entropy (bits) and mean
+    spectral flatness, i.e. what np.mean(S, axis=1), spectral_entropy(S) and
+    np.mean(librosa.feature.spectral_flatness(S=S)) give on the full
+    spectrogram. State is O(n_bins), so it also serves streaming input.
+
+    Against the previous full-spectrogram implementation every feature
+    matches within 1e-5 relative or 1e-6 absolute (float32 accumulation),
+    except sfm on very quiet input (power near the 1e-10 floor), which stays
+    within 2e-5 relative; the bin-valued features (median, Q25, Q75, mode)
+    are identical.
+    """
+
+    def __init__(self, n_bins=1 + N_FFT // 2):
+        self.magnitude_sum = np.zeros(n_bins, dtype=np.float32)
+        self.entropy_sum = np.float32(0.0)
+        self.flatness_sum = np.float32(0.0)
+        self.n_frames = 0
+
+    def update(self, S_block):
+        self.magnitude_sum += S_block.sum(axis=0)
+        entropy, flatness = frame_entropy_flatness(S_block)
+        self.entropy_sum += entropy.sum()
+        self.flatness_sum += flatness.sum()
+        self.n_frames += len(S_block)
+
+    def summary(self):
+        """(mean magnitude spectrum, mean entropy, mean flatness); zeros before any update."""
+        n = max(self.n_frames, 1)
+        return (self.magnitude_sum / n, float(self.entropy_sum / n),
+                float(self.flatness_sum / n) if self.n_frames else 0.0)
+
+def spectral_summary(y, n_fft=N_FFT, hop_length=HOP_LENGTH, block_frames=BLOCK_FRAMES):
+    """One pass over the STFT frames of y; see SpectralAccumulator.summary."""
+    accumulator = SpectralAccumulator(1 + n_fft // 2)
+    for S_block in stft_magnitude_blocks(y, n_fft, hop_length, block_frames):
+        accumulator.update(S_block)
+    return accumulator.summary()
+
+def extract_features_from_file(path, sr=22050, duration=3.0, offset=0.0, pitch_method="pyin", vad=False):
+    """
+    Extract the 20 voice.csv features from an audio file.
+
+    path may also be raw bytes or a binary file object; see audio_io.load_audio
+    (WebM and other non-libsndfile formats are decoded through an ffmpeg pipe).
+
+    pitch_method selects the F0 backend feeding meanfun/minfun/maxfun/modindx:
+    "pyin" (default, accurate) or "yin" (vectorized YIN on a decimated signal,
+    several times faster; see yin_fast).
+
+    vad=True restricts extraction to the voiced regions (see extract_features).
+    """
+    y, sr = load_audio(path, sr=sr, duration=duration, offset=offset)
+    return extract_features(y, sr, pitch_method=pitch_method, vad=vad)
+
+def extract_features(y, sr, pitch_method="pyin", vad=False):
+    """
+    Extract the 20 voice.csv features from an already decoded signal.
+
+    With vad=True, silence and noise are trimmed first (voice_activity.detect_voice):
+    the STFT accumulators and the pitch tracker only see the voiced regions, the
+    returned dict also carries the segmenter stats under "vad", and a clip without
+    voice raises voice_activity.NoVoiceDetected.
+    """
     if y.ndim > 1:
         y = librosa.to_mono(y)
 
+    vad_info = None
+    regions = None
+    if vad:
+        with timed("vad"):
+            regions, vad_info = detect_voice(y, sr)
+        if not regions:
+            raise NoVoiceDetected(vad_info)
+
     # Ensure we have enough samples
     if len(y) < 1024:
         y = np.pad(y, (0, 1024 - len(y)), mode='constant')
+    segments = [y] if regions is None else [y[start:end] for start, end in regions]
 
-    stft = librosa.stft(y, n_fft=2048, hop_length=512)
-    S = np.abs(stft)
-
-    # Extract spectral features
-    centroid = librosa.feature.spectral_centroid(S=S, sr=sr)[0]
-    flatness = librosa.feature.spectral_flatness(S=S)[0]
-    bandwidth = librosa.feature.spectral_bandwidth(S=S, sr=sr)[0]
+    # STFT and spectral features in a single blocked pass per segment (see SpectralAccumulator)
+    with timed("spectral"):
+        accumulator = SpectralAccumulator()
+        for segment in segments:
+            for S_block in stft_magnitude_blocks(segment):
+                accumulator.update(S_block)
+        magnitude_spectrum, sp_ent_raw, sfm = accumulator.summary()
     
-    try:
-        f0, voiced_flag, voiced_probs = librosa.pyin(y, fmin=80, fmax=400, sr=sr)
-        f0_clean = f0[~np.isnan(f0)]
-    except Exception:
-        f0_clean = np.array([])
+    with timed(f"pitch_{pitch_method}"):
+        f0_clean = np.concatenate([estimate_f0(segment, sr, method=pitch_method) for segment in segments])
+    with timed("statistics"):
+        features = spectrum_statistics(magnitude_spectrum, sp_ent_raw, sfm, f0_clean, sr)
+    if vad_info is not None:
+        features["vad"] = vad_info
+    return features
+
+def spectrum_statistics(magnitude_spectrum, sp_ent_raw, sfm, f0_clean, sr):
+    """
+    Statistics block: spectrum moments/quantiles, entropy, F0 and dominant-frequency features.
+
+    Takes the outputs of SpectralAccumulator.summary (mean magnitude spectrum,
+    mean frame entropy, mean flatness) and the voiced F0 values.
+    """
+    row = spectrum_statistics_batch(magnitude_spectrum[None, :], [sp_ent_raw], [sfm], [f0_clean], sr)[0]
+    return dict(zip(FEATURE_ORDER, row))
 
-    # Calculate frequency domain statistics
-    freqs = librosa.fft_frequencies(sr=sr, n_fft=2048)
-    magnitude_spectrum = np.mean(S, axis=1)
+def spectrum_statistics_batch(magnitude_spectra, sp_ent_raw, sfm, f0_list, sr):
+    """spectrum_statistics for N clips at once; returns an (N, 20) matrix in FEATURE_ORDER."""
+    freqs = librosa.fft_frequencies(sr=sr, n_fft=N_FFT)
+    magnitude_spectrum = np.asarray(magnitude_spectra, dtype=np.float64)
+    n = len(magnitude_spectrum)
     
     # Normalize spectrum
-    magnitude_spectrum = magnitude_spectrum / np.sum(magnitude_spectrum)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        magnitude_spectrum = magnitude_spectrum / np.sum(magnitude_spectrum, axis=1, keepdims=True)
     
     # Calculate weighted frequency statistics
-    mean_freq = np.sum(freqs * magnitude_spectrum)
-    freq_variance = np.sum(magnitude_spectrum * (freqs - mean_freq)**2)
+    mean_freq = np.sum(freqs * magnitude_spectrum, axis=1)
+    deviation = freqs - mean_freq[:, None]
+    freq_variance = np.sum(magnitude_spectrum * deviation**2, axis=1)
     freq_std = np.sqrt(freq_variance)
     
     # Calculate quantiles
-    cumsum_spectrum = np.cumsum(magnitude_spectrum)
-    median_freq = freqs[np.argmax(cumsum_spectrum >= 0.5)]
-    q25_freq = freqs[np.argmax(cumsum_spectrum >= 0.25)]
-    q75_freq = freqs[np.argmax(cumsum_spectrum >= 0.75)]
+    cumsum_spectrum = np.cumsum(magnitude_spectrum, axis=1)
+    median_freq = freqs[np.argmax(cumsum_spectrum >= 0.5, axis=1)]
+    q25_freq = freqs[np.argmax(cumsum_spectrum >= 0.25, axis=1)]
+    q75_freq = freqs[np.argmax(cumsum_spectrum >= 0.75, axis=1)]
     
     # Normalize to match dataset scale (0-0.3 range typically)
     freq_scale = 1.0 / (sr / 2.0)  # Normalize by Nyquist frequency
@@ -68,44 +304,42 @@ def extract_features_from_file(path, sr=22050, duration=3.0, offset=0.0):
     features['IQR'] = features['Q75'] - features['Q25']
     
     # Higher order statistics
-    freq_skew = np.sum(magnitude_spectrum * ((freqs - mean_freq) / freq_std)**3) if freq_std > 0 else 0
-    freq_kurt = np.sum(magnitude_spectrum * ((freqs - mean_freq) / freq_std)**4) if freq_std > 0 else 0
-    features['skew'] = freq_skew
-    features['kurt'] = freq_kurt
+    has_spread = freq_std > 0
+    z = deviation / np.where(has_spread, freq_std, 1.0)[:, None]
+    features['skew'] = np.where(has_spread, np.sum(magnitude_spectrum * z**3, axis=1), 0.0)
+    features['kurt'] = np.where(has_spread, np.sum(magnitude_spectrum * z**4, axis=1), 0.0)
     
     # Spectral entropy (normalize to 0.7-1.0 range)
-    sp_ent_raw = spectral_entropy(S, power_spectrogram=True)
-    features['sp.ent'] = 0.7 + 0.3 * (sp_ent_raw / 10.0)  # Scale to typical range
-    features['sp.ent'] = min(max(features['sp.ent'], 0.7), 1.0)  # Clamp
+    features['sp.ent'] = 0.7 + 0.3 * (np.asarray(sp_ent_raw, dtype=np.float64) / 10.0)  # Scale to typical range
+    features['sp.ent'] = np.clip(features['sp.ent'], 0.7, 1.0)  # Clamp
     
     # Spectral flatness
-    features['sfm'] = np.mean(flatness) if flatness.size > 0 else 0.0
+    features['sfm'] = np.asarray(sfm, dtype=np.float64)
     
     # Mode (most common frequency bin)
-    peak_bin = np.argmax(magnitude_spectrum)
+    peak_bin = np.argmax(magnitude_spectrum, axis=1)
     features['mode'] = freqs[peak_bin] * freq_scale
     
     # Centroid
     features['centroid'] = features['meanfreq']  # Same as mean frequency
     
     # Fundamental frequency features
-    if f0_clean.size > 0:
-        # Scale F0 to match dataset range (0.01-0.28)
-        f0_scaled = f0_clean / 1000.0
-        features['meanfun'] = np.nanmean(f0_scaled)
-        features['minfun'] = np.nanmin(f0_scaled)
-        features['maxfun'] = np.nanmax(f0_scaled)
-        
-        # Modulation index
-        f0_mean = np.nanmean(f0_scaled)
-        f0_std = np.nanstd(f0_scaled)
-        features['modindx'] = f0_std / (f0_mean + 1e-12) if f0_mean > 0 else 0.0
-        features['modindx'] = min(features['modindx'], 1.0)  # Cap at 1.0
-    else:
-        features['meanfun'] = 0.1  # Default reasonable value
-        features['minfun'] = 0.02  # Default reasonable value
-        features['maxfun'] = 0.25  # Default reasonable value
-        features['modindx'] = 0.1  # Default reasonable value
+    f0_features = np.empty((n, 4))
+    for i, f0_clean in enumerate(f0_list):
+        if f0_clean.size > 0:
+            # Scale F0 to match dataset range (0.01-0.28)
+            f0_scaled = f0_clean / 1000.0
+            
+            # Modulation index
+            f0_mean = np.nanmean(f0_scaled)
+            f0_std = np.nanstd(f0_scaled)
+            modindx = f0_std / (f0_mean + 1e-12) if f0_mean > 0 else 0.0
+            modindx = min(modindx, 1.0)  # Cap at 1.0
+            f0_features[i] = (f0_mean, np.nanmin(f0_scaled), np.nanmax(f0_scaled), modindx)
+        else:
+            # Default reasonable values
+            f0_features[i] = (0.1, 0.02, 0.25, 0.1)
+    features['meanfun'], features['minfun'], features['maxfun'], features['modindx'] = f0_features.T
     
     # Dominant frequency features (use spectral statistics)
     # Scale to match dataset range (0.007-22 range)
@@ -113,15 +347,90 @@ def extract_features_from_file(path, sr=22050, duration=3.0, offset=0.0):
     features['meandom'] = mean_freq * dom_scale * 0.1  # Scale down to reasonable range
     features['mindom'] = q25_freq * dom_scale * 0.1
     features['maxdom'] = q75_freq * dom_scale * 0.5  # Allow higher max
-    features['dfrange'] = features['maxdom'] - features['mindom']
     
     # Ensure all values are in reasonable ranges
-    features['meandom'] = min(max(features['meandom'], 0.005), 3.0)
-    features['mindom'] = min(max(features['mindom'], 0.004), 0.5)
-    features['maxdom'] = min(max(features['maxdom'], 0.01), 22.0)
+    features['meandom'] = np.clip(features['meandom'], 0.005, 3.0)
+    features['mindom'] = np.clip(features['mindom'], 0.004, 0.5)
+    features['maxdom'] = np.clip(features['maxdom'], 0.01, 22.0)
     features['dfrange'] = features['maxdom'] - features['mindom']
 
-    return features
+    return np.column_stack([features[name] for name in FEATURE_ORDER])
+
+def _stacked_spectral_summary(signals, n_fft=N_FFT, hop_length=HOP_LENGTH):
+    """
+    spectral_summary for equal-length-or-shorter signals via one 3-D STFT.
+
+    Shorter signals are zero padded to the longest. With centered, zero
+    padded framing the first n_frames(y) frames of the padded signal are
+    exactly those of y, so the extra frames are simply masked out.
+    """
+    half = n_fft // 2
+    lengths = np.array([len(y) for y in signals])
+    n_frames = 1 + (lengths + 2 * half - n_fft) // hop_length
+    Y = np.zeros((len(signals), lengths.max() + 2 * half), dtype=np.float32)
+    for i, y in enumerate(signals):
+        Y[i, half:half + len(y)] = y
+    window = scipy_signal.get_window("hann", n_fft, fftbins=True).astype(np.float32)
+    frames = np.lib.stride_tricks.sliding_window_view(Y, n_fft, axis=1)[:, ::hop_length]
+    S = np.abs(scipy_fft.rfft(frames * window, axis=-1)).astype(np.float32, copy=False)
+
+    mask = (np.arange(S.shape[1])[None, :] < n_frames[:, None]).astype(np.float32)
+    entropy, flatness = frame_entropy_flatness(S)
+    magnitude = np.einsum("nfb,nf->nb", S, mask) / n_frames[:, None]
+    return (magnitude, np.sum(entropy * mask, axis=1) / n_frames,
+            np.sum(flatness * mask, axis=1) / n_frames)
+
+def extract_features_batch(items, sr=22050, duration=3.0, offset=0.0, pitch_method="pyin",
+                           max_bucket_mb=64, bucket_ratio=1.25):
+    """
+    Extract features for many clips; returns an (N, 20) float matrix in FEATURE_ORDER.
+
+    items are 1-D signals already at sr, or anything extract_features_from_file
+    accepts (paths, bytes), which are decoded with load_audio first. Clips are
+    sorted by length and bucketed (longest at most bucket_ratio times the
+    shortest, at most max_bucket_mb of spectrogram per bucket); each bucket
+    runs the STFT and spectral statistics as one stacked 3-D array. Rows
+    match extract_features within the spectral engine's float32 tolerance.
+    The F0 backend still runs per clip.
+    """
+    signals = []
+    for item in items:
+        if isinstance(item, np.ndarray):
+            y = librosa.to_mono(item) if item.ndim > 1 else item
+        else:
+            y, _ = load_audio(item, sr=sr, duration=duration, offset=offset)
+        # Same minimum length as extract_features
+        if len(y) < 1024:
+            y = np.pad(y, (0, 1024 - len(y)), mode='constant')
+        signals.append(np.asarray(y, dtype=np.float32))
+    if not signals:
+        return np.empty((0, len(FEATURE_ORDER)))
+
+    n_bins = 1 + N_FFT // 2
+    magnitude = np.empty((len(signals), n_bins))
+    entropy = np.empty(len(signals))
+    flatness = np.empty(len(signals))
+    with timed("spectral"):
+        order = np.argsort([len(y) for y in signals], kind="stable")
+        i = 0
+        while i < len(order):
+            shortest = len(signals[order[i]])
+            frames = 1 + len(signals[order[i]]) // HOP_LENGTH
+            per_clip_bytes = frames * bucket_ratio * n_bins * 4 * 4  # |S|, power, P and temporaries
+            max_clips = max(1, int(max_bucket_mb * 1024 * 1024 // per_clip_bytes))
+            j = i + 1
+            while (j < len(order) and j - i < max_clips
+                   and len(signals[order[j]]) <= shortest * bucket_ratio):
+                j += 1
+            bucket = order[i:j]
+            magnitude[bucket], entropy[bucket], flatness[bucket] = _stacked_spectral_summary(
+                [signals[k] for k in bucket])
+            i = j
+
+    with timed(f"pitch_{pitch_method}"):
+        f0_list = [estimate_f0(y, sr, method=pitch_method) for y in signals]
+    with timed("statistics"):
+        return spectrum_statistics_batch(magnitude, entropy, flatness, f0_list, sr)
 
 def features_dict_to_vector(d, feature_order):
     """Convert dict to vector following feature_order list."""
@@ -2,54 +2,44 @@
 """
 Script to extract trained model metrics and confusion matrix data
 for display in the React frontend.
+
+Metrics are served from models/metrics.json (written by train.py) and only
+recomputed when the hashes of data/voice.csv or the model files change.
+Recomputation starts from the memory-mapped dataset cache (dataset_cache.py):
+the stored split and, when train.py already saved them, the PCA projections.
 """
 
 import json
-import os
-import pandas as pd
-import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler, LabelEncoder
-from sklearn.decomposition import PCA
-from sklearn.svm import SVC
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.linear_model import LogisticRegression
-from sklearn.metrics import (confusion_matrix, accuracy_score, f1_score, 
-                             precision_score, recall_score)
-import joblib
+from metrics_store import (compute_fingerprint, classification_metrics, cv_metrics, select_best_model,
+                           save_metrics, load_metrics)
 
 def load_models_and_data():
     """Load the trained models and test data to compute metrics"""
     
-    # Load the dataset
-    df = pd.read_csv("data/voice.csv")
-    X = df.drop(columns=['label'])
-    y = df['label']
+    # Heavy imports stay local so serving a stored artifact does not pay for them
+    import joblib
+    from dataset_cache import load_dataset, projection_key
     
-    # Load the saved preprocessing objects
-    scaler = joblib.load("models/scaler.pkl")
-    pca = joblib.load("models/pca.pkl")
+    # Same split as training, persisted with the dataset
+    split = load_dataset("data/voice.csv").split(test_size=0.2, random_state=42)
     le = joblib.load("models/label_encoder.pkl")
     
-    # Encode labels
-    y_enc = le.transform(y)
-    
-    # Split data (same as training)
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y_enc, test_size=0.2, random_state=42, stratify=y_enc
-    )
-    
-    # Apply preprocessing
-    X_train_scaled = scaler.transform(X_train)
-    X_test_scaled = scaler.transform(X_test)
-    X_train_pca = pca.transform(X_train_scaled)
-    X_test_pca = pca.transform(X_test_scaled)
+    # Scaled / PCA matrices of the saved preprocessing objects (computed once if missing)
+    key = projection_key("models/scaler.pkl", "models/pca.pkl")
+    projected = split.load_projections(key)
+    if projected is None:
+        projected = split.projections(joblib.load("models/scaler.pkl"), joblib.load("models/pca.pkl"), key)
     
-    return X_train_pca, X_test_pca, y_train, y_test, le
+    return projected["X_train_pca"], projected["X_test_pca"], split.y_train, split.y_test, le
 
 def evaluate_all_models():
     """Evaluate all trained models and return metrics"""
     
+    from sklearn.svm import SVC
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.model_selection import StratifiedKFold, cross_val_score
+    
     X_train_pca, X_test_pca, y_train, y_test, le = load_models_and_data()
     
     # Define the same models as in training
@@ -62,33 +52,22 @@ def evaluate_all_models():
     }
     
     results = {}
+    # Same folds and scoring as train.py's cross-validation
+    cv = StratifiedKFold(n_splits=5, shuffle=True, random_state=42)
     
     for name, model in models.items():
+        cv_scores = cross_val_score(model, X_train_pca, y_train, cv=cv, scoring="f1_macro")
+        
         # Train the model
         model.fit(X_train_pca, y_train)
         
-        # Make predictions
+        # Make predictions and calculate metrics
         y_pred = model.predict(X_test_pca)
-        
-        # Calculate metrics
-        acc = accuracy_score(y_test, y_pred)
-        f1 = f1_score(y_test, y_pred)
-        prec = precision_score(y_test, y_pred)
-        rec = recall_score(y_test, y_pred)
-        
-        # Get confusion matrix
-        cm = confusion_matrix(y_test, y_pred)
-        
-        results[name] = {
-            "accuracy": float(acc),
-            "f1_score": float(f1),
-            "precision": float(prec),
-            "recall": float(rec),
-            "confusion_matrix": cm.tolist()
-        }
+        results[name] = classification_metrics(y_test, y_pred)
+        results[name].update(cv_metrics(cv_scores))
     
-    # Find the best model (highest F1 score)
-    best_model_name = max(results.keys(), key=lambda k: results[k]["f1_score"])
+    # Same rule as train.py uses to pick the saved model
+    best_model_name = select_best_model(results)
     
     return {
         "models": results,
@@ -100,43 +79,44 @@ def get_final_model_metrics():
     """Get metrics for the saved final model"""
     
     try:
+        import joblib
         X_train_pca, X_test_pca, y_train, y_test, le = load_models_and_data()
         
         # Load the final model
         final_model = joblib.load("models/final_model.pkl")
         
-        # Make predictions
+        # Make predictions and calculate metrics
         y_pred = final_model.predict(X_test_pca)
-        
-        # Calculate metrics
-        acc = accuracy_score(y_test, y_pred)
-        f1 = f1_score(y_test, y_pred)
-        prec = precision_score(y_test, y_pred)
-        rec = recall_score(y_test, y_pred)
-        
-        # Get confusion matrix
-        cm = confusion_matrix(y_test, y_pred)
-        
-        return {
-            "accuracy": float(acc),
-            "f1_score": float(f1),
-            "precision": float(prec),
-            "recall": float(rec),
-            "confusion_matrix": cm.tolist(),
-            "label_classes": le.classes_.tolist()
-        }
+        results = classification_metrics(y_test, y_pred)
+        results["label_classes"] = le.classes_.tolist()
+        return results
         
     except Exception as e:
         return {"error": str(e)}
 
+def get_metrics(include_all=False, refresh=False):
+    """Serve metrics from the stored artifact, recomputing only when the fingerprint changed"""
+    
+    try:
+        fingerprint = compute_fingerprint()
+    except OSError as e:
+        return {"error": str(e)}
+    
+    artifact = None if refresh else load_metrics(fingerprint)
+    if artifact is None:
+        final_results = get_final_model_metrics()
+        if "error" in final_results:
+            return final_results
+        artifact = {"all": evaluate_all_models(), "final": final_results}
+        save_metrics(artifact["all"], artifact["final"], fingerprint)
+    
+    return artifact["all"] if include_all else artifact["final"]
+
 if __name__ == "__main__":
     import sys
     
-    if len(sys.argv) > 1 and sys.argv[1] == "--all":
-        # Return all model results
-        results = evaluate_all_models()
-    else:
-        # Return just the final model metrics
-        results = get_final_model_metrics()
+    # --all returns all model results, otherwise just the final model metrics;
+    # --refresh ignores the stored artifact and recomputes
+    results = get_metrics(include_all="--all" in sys.argv, refresh="--refresh" in sys.argv)
     
     print(json.dumps(results, indent=2))
\ No newline at end of file
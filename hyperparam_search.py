@@ -0,0 +1,224 @@
+# hyperparam_search.py
+"""
+Leak-free successive-halving hyperparameter search for train.py --search.
+
+Each candidate is a StandardScaler -> PCA -> classifier Pipeline, so the
+scaler and PCA are refit inside every CV fold instead of once on the whole
+training split. The pipelines share a joblib.Memory cache: candidates that
+only differ in classifier parameters reuse the fitted scaler/PCA of a fold
+instead of refitting them.
+
+Successive halving: every candidate is scored on a small stratified subsample
+of the training data, the best 1/factor survive to the next round on factor
+times more rows, and the last round uses the full training split. A round is
+only started if its projected cost still fits in the time budget, otherwise
+the best candidate of the last completed round wins. The first round has no
+timing to project from, so it scores the candidates in batches and stops
+once the next batch would overrun the budget (the first batch always runs).
+"""
+
+import csv
+import itertools
+import json
+import math
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+from joblib import Memory, Parallel, delayed
+from scipy.stats import loguniform
+from sklearn.base import clone
+from sklearn.decomposition import PCA
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import f1_score
+from sklearn.model_selection import ParameterSampler, StratifiedKFold, train_test_split
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.svm import SVC
+
+PCA_VARIANCES = [0.90, 0.95, 0.99]
+
+# model name -> (classifier, parameter distributions, number of candidates)
+SEARCH_SPACES = {
+    "SVM (RBF)": (
+        SVC(kernel='rbf', probability=True, random_state=42),
+        {"clf__C": loguniform(0.1, 100), "clf__gamma": loguniform(1e-3, 1),
+         "pca__n_components": PCA_VARIANCES},
+        18,
+    ),
+    "Random Forest": (
+        RandomForestClassifier(random_state=42),
+        {"clf__n_estimators": [100, 200, 400], "clf__max_depth": [None, 8, 16, 32],
+         "pca__n_components": PCA_VARIANCES},
+        6,
+    ),
+}
+
+# Fit time is assumed to grow as n_rows ** RESOURCE_EXPONENT when projecting the next round
+RESOURCE_EXPONENT = 1.5
+
+SEARCH_CONFIG_FILE = "search_config.json"
+SEARCH_LOG_FILE = "search_log.csv"
+
+
+def build_pipeline(classifier, memory=None):
+    """Scaler + PCA + classifier; transformer fits are cached in memory when given."""
+    return Pipeline([
+        ("scaler", StandardScaler()),
+        ("pca", PCA(random_state=42)),
+        ("clf", classifier),
+    ], memory=memory)
+
+
+def _score_fold(pipeline, X, y, train_idx, val_idx):
+    start = time.perf_counter()
+    fitted = clone(pipeline).fit(X[train_idx], y[train_idx])
+    score = f1_score(y[val_idx], fitted.predict(X[val_idx]), average='macro')
+    return score, time.perf_counter() - start
+
+
+def _json_value(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def successive_halving_search(X, y, time_budget=120.0, factor=3, n_splits=5, n_jobs=-1,
+                              search_spaces=None, random_state=42, verbose=True):
+    """
+    Search SEARCH_SPACES on raw (unscaled) training data.
+
+    Returns a dict with the winning "model" name, "params", its unfitted
+    "classifier" (best parameters set), "pca_variance", "cv_mean_f1" and the
+    per-candidate "log", plus budget bookkeeping.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y)
+    search_spaces = search_spaces or SEARCH_SPACES
+    start = time.perf_counter()
+
+    per_model = []
+    for name, (classifier, distributions, n_candidates) in search_spaces.items():
+        per_model.append([(name, classifier, {k: _json_value(v) for k, v in params.items()})
+                          for params in ParameterSampler(distributions, n_candidates, random_state=random_state)])
+    # Interleaved by model, so a first round cut short by the budget still covers every model
+    candidates = [c for group in itertools.zip_longest(*per_model) for c in group if c is not None]
+
+    n_rounds = max(1, math.ceil(math.log(len(candidates), factor)))
+    min_resources = max(n_splits * 20, len(X) // factor ** (n_rounds - 1))
+
+    cache_dir = tempfile.mkdtemp(prefix="voice_search_")
+    memory = Memory(cache_dir, verbose=0)
+    log = []
+    survivors = candidates
+    best = None
+    projected = 0.0
+    prev_resources = min_resources
+    stopped_early = False
+    try:
+        for round_idx in range(n_rounds):
+            n_resources = len(X) if round_idx == n_rounds - 1 else min(len(X), min_resources * factor ** round_idx)
+            elapsed = time.perf_counter() - start
+            # Nothing to project round 0 from yet; its batches are checked below instead
+            if best is not None and (elapsed + projected * (n_resources / prev_resources) ** RESOURCE_EXPONENT
+                                     > time_budget):
+                stopped_early = True
+                if verbose:
+                    print(f"⏳ Time budget reached, skipping round {round_idx} ({len(survivors)} candidates)")
+                break
+
+            round_start = time.perf_counter()
+            if n_resources < len(X):
+                idx, _ = train_test_split(np.arange(len(X)), train_size=n_resources,
+                                          stratify=y, random_state=random_state + round_idx)
+            else:
+                idx = np.arange(len(X))
+            X_round, y_round = X[idx], y[idx]
+
+            folds = list(StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=random_state)
+                         .split(X_round, y_round))
+            # The first round runs in batches of 1/factor of the candidates and stops once
+            # the next batch would overrun the budget; the first batch always runs
+            batch_size = max(1, math.ceil(len(survivors) / factor)) if best is None else len(survivors)
+            outputs, evaluated = [], []
+            for b in range(0, len(survivors), batch_size):
+                batch = survivors[b:b + batch_size]
+                if evaluated:
+                    so_far = time.perf_counter() - round_start
+                    if time.perf_counter() - start + so_far * len(batch) / len(evaluated) > time_budget:
+                        stopped_early = True
+                        if verbose:
+                            print(f"⏳ Time budget reached, scoring {len(evaluated)} of {len(survivors)} "
+                                  f"candidates in round {round_idx}")
+                        break
+                pipelines = [build_pipeline(clone(classifier), memory).set_params(**params)
+                             for _, classifier, params in batch]
+                outputs += Parallel(n_jobs=n_jobs)(
+                    delayed(_score_fold)(pipeline, X_round, y_round, train_idx, val_idx)
+                    for pipeline in pipelines for train_idx, val_idx in folds
+                )
+                evaluated += batch
+            survivors = evaluated
+
+            round_time = time.perf_counter() - round_start
+            fit_times = [sum(seconds for _, seconds in outputs[i * n_splits:(i + 1) * n_splits])
+                         for i in range(len(survivors))]
+            scored = []
+            for i, (name, classifier, params) in enumerate(survivors):
+                fold_outputs = outputs[i * n_splits:(i + 1) * n_splits]
+                scores = [score for score, _ in fold_outputs]
+                scored.append((np.mean(scores), i))
+                log.append({
+                    "round": round_idx,
+                    "n_resources": n_resources,
+                    "model": name,
+                    "params": json.dumps(params, sort_keys=True),
+                    "cv_mean_f1": float(np.mean(scores)),
+                    "cv_std": float(np.std(scores)),
+                    "fit_seconds": float(fit_times[i]),
+                })
+
+            scored.sort(key=lambda item: -item[0])
+            best_score, best_idx = scored[0]
+            best = survivors[best_idx] + (best_score, n_resources)
+            if verbose:
+                print(f"🔎 Round {round_idx}: {len(survivors)} candidates on {n_resources} rows, "
+                      f"best F1 = {best_score:.4f} ({best[0]}), {round_time:.1f}s")
+
+            n_keep = max(1, math.ceil(len(survivors) / factor))
+            keep = [i for _, i in scored[:n_keep]]
+            # Wall time of the survivors at this round's size; scaled up by the row ratio next round
+            projected = round_time * sum(fit_times[i] for i in keep) / max(sum(fit_times), 1e-9)
+            prev_resources = n_resources
+            survivors = [survivors[i] for i in keep]
+            if stopped_early:
+                break
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    name, classifier, params, score, n_resources = best
+    return {
+        "model": name,
+        "params": params,
+        "classifier": clone(classifier).set_params(
+            **{k[len("clf__"):]: v for k, v in params.items() if k.startswith("clf__")}),
+        "pca_variance": params["pca__n_components"],
+        "cv_mean_f1": float(score),
+        "n_resources": n_resources,
+        "n_candidates": len(candidates),
+        "time_budget": time_budget,
+        "elapsed_seconds": time.perf_counter() - start,
+        "stopped_early": stopped_early,
+        "log": log,
+    }
+
+
+def save_search(result, models_dir="models"):
+    """Write the winning configuration (JSON) and the per-candidate search log (CSV)."""
+    config = {k: v for k, v in result.items() if k not in ("classifier", "log")}
+    with open(os.path.join(models_dir, SEARCH_CONFIG_FILE), "w") as f:
+        json.dump(config, f, indent=2)
+    with open(os.path.join(models_dir, SEARCH_LOG_FILE), "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(result["log"][0].keys()))
+        writer.writeheader()
+        writer.writerows(result["log"])
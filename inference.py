@@ -0,0 +1,197 @@
+# inference.py
+"""
+Shared model loading and prediction helpers.
+
+Used by the persistent API server (api_server.py) and the backend processor
+script so that both return exactly the same JSON shape.
+"""
+
+import os
+import subprocess
+import numpy as np
+from startup import lazy_import
+from feature_extraction import features_dict_to_vector, FEATURE_ORDER
+from feature_cache import cached_extract_features
+from instrumentation import timed
+from voice_activity import NoVoiceDetected
+from model_bundle import BUNDLE_PATH
+
+MODELS_DIR = "models"
+# "sklearn" runs the pickled estimators; "numpy" uses the fused NumpyPredictor,
+# built from the memory-mapped model bundle when there is one
+PREDICTORS = ("sklearn", "numpy")
+DEFAULT_PREDICTOR = os.environ.get("VOICE_PREDICTOR") or ("numpy" if os.path.exists(BUNDLE_PATH) else "sklearn")
+# "exact" is the RBF SVC; "fast" the opt-in Nystroem approximation stored in the bundle (fast_model.py)
+MODES = ("exact", "fast")
+
+# joblib/sklearn are only needed once models are actually loaded
+joblib = lazy_import("joblib")
+MODEL_FILES = {
+    "scaler": "scaler.pkl",
+    "pca": "pca.pkl",
+    "final_model": "final_model.pkl",
+    "label_encoder": "label_encoder.pkl",
+}
+
+
+def load_models(models_dir=MODELS_DIR, predictor=DEFAULT_PREDICTOR):
+    """
+    Load scaler, PCA, final model and label encoder from models_dir.
+
+    With predictor="numpy" and a model_bundle.bin in models_dir, only the
+    bundle is read (memory-mapped); the dict then holds "predictor",
+    "label_encoder" and "bundle" instead of the sklearn objects.
+    """
+    if predictor not in PREDICTORS:
+        raise ValueError(f"Unknown predictor '{predictor}', expected one of {PREDICTORS}")
+    bundle_path = os.path.join(models_dir, os.path.basename(BUNDLE_PATH))
+    if predictor == "numpy" and os.path.exists(bundle_path):
+        from model_bundle import load_bundle, BundleLabelEncoder
+        from numpy_predictor import NumpyPredictor
+        with timed("load_models"):
+            bundle = load_bundle(bundle_path)
+            return {
+                "bundle": bundle,
+                "predictor": NumpyPredictor.from_bundle(bundle),
+                "label_encoder": BundleLabelEncoder(bundle.classes),
+            }
+
+    models = {}
+    with timed("load_models"):
+        for name, filename in MODEL_FILES.items():
+            model_path = os.path.join(models_dir, filename)
+            if not os.path.exists(model_path):
+                raise Exception(f"Required model file not found: {model_path}")
+            models[name] = joblib.load(model_path)
+        if predictor == "numpy":
+            from numpy_predictor import NumpyPredictor
+            models["predictor"] = NumpyPredictor.from_models(models)
+    return models
+
+
+def convert_webm_to_wav(audio_file_path, sr=22050):
+    """
+    Convert a WebM recording to a mono WAV file next to it using FFmpeg.
+
+    Only needed where a seekable file is required (stream_inference);
+    single predictions decode WebM in memory via audio_io.
+    """
+    wav_path = audio_file_path[:-len(".webm")] + ".wav"
+    ffmpeg_cmd = [
+        'ffmpeg', '-i', audio_file_path,
+        '-acodec', 'pcm_s16le',
+        '-ar', str(sr),
+        '-ac', '1',
+        '-y',  # overwrite output files
+        wav_path
+    ]
+    try:
+        with timed("conversion"):
+            result = subprocess.run(ffmpeg_cmd, capture_output=True, text=True)
+    except FileNotFoundError:
+        raise Exception("FFmpeg is required to process WebM files. Please install FFmpeg and add it to your PATH.")
+    if result.returncode != 0:
+        raise Exception(f"Failed to convert WebM file: FFmpeg conversion failed: {result.stderr}")
+    return wav_path
+
+
+def check_mode(models, mode):
+    """Raise ValueError unless mode is known and available with these models."""
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode '{mode}', expected one of {MODES}")
+    if mode == "fast" and getattr(models.get("predictor"), "fast", None) is None:
+        raise ValueError("Fast mode needs the numpy predictor and a model bundle with a fast model")
+
+
+def predict_vector(models, features_vector, mode="exact"):
+    """Run scaler -> PCA -> model on a (n, 20) feature matrix; mode="fast" needs the bundle's fast model."""
+    check_mode(models, mode)
+    if "predictor" in models:
+        predictor = models["predictor"]
+        with timed("scaling"):
+            features_scaled = predictor.scale(features_vector)
+        with timed("pca"):
+            features_pca = predictor.transform(features_vector)
+        with timed("predict"):
+            pred_labels, probabilities = predictor.predict_transformed(features_pca, mode)
+        return features_scaled, features_pca, pred_labels, probabilities
+    with timed("scaling"):
+        features_scaled = models["scaler"].transform(features_vector)
+    with timed("pca"):
+        features_pca = models["pca"].transform(features_scaled)
+    with timed("predict"):
+        pred_encoded = models["final_model"].predict(features_pca)
+        pred_labels = models["label_encoder"].inverse_transform(pred_encoded)
+        probabilities = models["final_model"].predict_proba(features_pca)
+    return features_scaled, features_pca, pred_labels, probabilities
+
+
+def _prediction_fields(models, features_vector, mode="exact"):
+    """Common result fields for a single feature vector."""
+    label_encoder = models["label_encoder"]
+    features_scaled, features_pca, pred_labels, probabilities = predict_vector(models, features_vector, mode)
+    return {
+        "success": True,
+        "mode": mode,
+        "prediction": pred_labels[0],
+        "confidence": float(max(probabilities[0])),
+        "probabilities": {
+            label_encoder.classes_[i]: float(probabilities[0][i])
+            for i in range(len(label_encoder.classes_))
+        },
+    }, features_scaled, features_pca
+
+
+def predict_audio_file(models, audio_file_path, pitch_method="pyin", mode="exact", vad=False):
+    """
+    Extract features from an audio file and predict; same JSON shape as audio_processor.py.
+
+    audio_file_path may also be the uploaded audio as bytes. WebM recordings
+    are decoded through an ffmpeg pipe (audio_io), no intermediate WAV is written.
+    vad=True trims silence/noise first and adds a "vad" block; a clip without
+    voice returns voice_detected=False and prediction None without running the model.
+    """
+    if isinstance(audio_file_path, str) and not os.path.exists(audio_file_path):
+        raise Exception(f"Audio file not found: {audio_file_path}")
+
+    try:
+        features_dict = cached_extract_features(audio_file_path, pitch_method=pitch_method, vad=vad)
+    except NoVoiceDetected as e:
+        return {
+            "success": True,
+            "voice_detected": False,
+            "prediction": None,
+            "confidence": None,
+            "message": "No voice detected",
+            "vad": e.info,
+        }
+
+    features_vector = features_dict_to_vector(features_dict, FEATURE_ORDER)
+    result, features_scaled, features_pca = _prediction_fields(models, features_vector, mode)
+    result.update({
+        "extracted_features": {
+            feature_name: float(features_dict.get(feature_name, 0.0))
+            for feature_name in FEATURE_ORDER
+        },
+        "scaled_features": features_scaled.tolist()[0],
+        "pca_features": features_pca.tolist()[0]
+    })
+    if vad:
+        result["voice_detected"] = True
+        result["vad"] = features_dict["vad"]
+    return result
+
+
+def predict_sample(models, features, sample_name=None, mode="exact"):
+    """Predict a raw 20-value feature list; same JSON shape as /api/test-sample."""
+    if len(features) != len(FEATURE_ORDER):
+        raise ValueError(f"Expected {len(FEATURE_ORDER)} features, got {len(features)}")
+    X = np.array(features, dtype=float).reshape(1, -1)
+    result, X_scaled, X_pca = _prediction_fields(models, X, mode)
+    result.update({
+        "sample_name": sample_name,
+        "raw_features": features,
+        "scaled_features": X_scaled.tolist()[0],
+        "pca_features": X_pca.tolist()[0]
+    })
+    return result
@@ -0,0 +1,205 @@
+# instrumentation.py
+"""
+Per-request stage timings and rolling latency metrics.
+
+A request handler opens a request_timer(); code anywhere below it on the same
+thread marks stages with `with timed("stage"):` (WebM conversion, audio load,
+each feature group, scaling, PCA, prediction, ...). The collected timings are
+attached to the result JSON as a "timings" block and folded into process-wide
+counters and histograms that api_server.py exposes at GET /metrics.
+
+When no timer is active, or instrumentation is disabled (VOICE_TIMINGS=0 or
+set_enabled(False)), timed() returns a shared no-op context manager, so the
+cost is one ContextVar lookup per stage.
+"""
+
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+# Histogram bucket upper bounds in milliseconds
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, float("inf"))
+# Recent samples kept per histogram for percentiles
+WINDOW = 1024
+
+_enabled = os.environ.get("VOICE_TIMINGS", "1") != "0"
+_current = contextvars.ContextVar("voice_request_timer", default=None)
+
+
+def set_enabled(enabled):
+    global _enabled
+    _enabled = bool(enabled)
+
+
+def is_enabled():
+    return _enabled
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    __slots__ = ("timer", "name", "start")
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timer.add(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class RequestTimer:
+    """Stage name -> accumulated seconds for one request, in first-seen order."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages = {}
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def total(self):
+        return time.perf_counter() - self.start
+
+    def as_dict(self):
+        """The "timings" block: milliseconds per stage plus the request total."""
+        timings = {f"{stage}_ms": round(seconds * 1000, 3) for stage, seconds in self.stages.items()}
+        timings["total_ms"] = round(self.total() * 1000, 3)
+        return timings
+
+
+def timed(stage):
+    """Context manager timing a stage of the active request (no-op when there is none)."""
+    timer = _current.get()
+    if timer is None:
+        return _NULL_STAGE
+    return _Stage(timer, stage)
+
+
+def current_timer():
+    return _current.get()
+
+
+class Histogram:
+    """Fixed-bucket latency histogram plus a window of recent samples for percentiles."""
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS_MS)
+        self.count = 0
+        self.sum_ms = 0.0
+        self.recent = deque(maxlen=WINDOW)
+
+    def observe(self, ms):
+        for i, bound in enumerate(BUCKETS_MS):
+            if ms <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum_ms += ms
+        self.recent.append(ms)
+
+    def snapshot(self):
+        recent = np.asarray(self.recent) if self.recent else np.zeros(1)
+        return {
+            "count": self.count,
+            "mean_ms": self.sum_ms / self.count if self.count else 0.0,
+            "p50_ms": float(np.percentile(recent, 50)),
+            "p95_ms": float(np.percentile(recent, 95)),
+            "p99_ms": float(np.percentile(recent, 99)),
+            "buckets": {("+Inf" if bound == float("inf") else str(bound)): n
+                        for bound, n in zip(BUCKETS_MS, self.counts)},
+        }
+
+
+class MetricsRegistry:
+    """Thread-safe request counters and per-route / per-stage latency histograms."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.counters = {}
+        self.histograms = {}
+
+    def increment(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name, ms):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(ms)
+
+    def record(self, route, timer, error=False):
+        self.increment(f"requests{route}")
+        if error:
+            self.increment(f"errors{route}")
+        self.observe(f"request{route}", timer.total() * 1000)
+        for stage, seconds in timer.stages.items():
+            self.observe(f"stage.{stage}", seconds * 1000)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "uptime_s": time.time() - self.started,
+                "enabled": _enabled,
+                "counters": dict(self.counters),
+                "histograms": {name: h.snapshot() for name, h in sorted(self.histograms.items())},
+            }
+
+
+REGISTRY = MetricsRegistry()
+
+
+class request_timer:
+    """
+    Scope of one instrumented request:
+
+        with request_timer("/predict") as timer:
+            result = predict_audio_file(...)
+            if timer:
+                result["timings"] = timer.as_dict()
+
+    Yields None (and records nothing) when instrumentation is disabled.
+    """
+
+    def __init__(self, route, registry=REGISTRY):
+        self.route = route
+        self.registry = registry
+        self.timer = None
+        self.token = None
+
+    def __enter__(self):
+        if not _enabled:
+            return None
+        self.timer = RequestTimer()
+        self.token = _current.set(self.timer)
+        return self.timer
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.timer is not None:
+            _current.reset(self.token)
+            if self.registry is not None:
+                self.registry.record(self.route, self.timer, error=exc_type is not None)
+        return False
@@ -0,0 +1,382 @@
+# job_queue.py
+"""
+Asynchronous prediction jobs with backpressure.
+
+submit() hashes the audio, coalesces it with an identical job that is still
+queued or running (same audio, pitch method, mode and VAD flag), and
+otherwise enqueues a new job and returns at once. Finished jobs are never
+reused, so a resubmission after the models are retrained or reloaded gets a
+fresh prediction rather than a stale result. A fixed pool of worker
+processes runs predict_audio_file; each worker process loads the models once
+and is driven by its own dispatcher thread, which enforces the per-job
+timeout by terminating (and respawning) the process, so a runaway pyin
+extraction cannot pin a core forever.
+
+Clients poll get(), block in wait_for_change() (long polling / server-sent
+events in api_server.py), and submit() raises QueueFull once max_queue jobs
+are waiting. A worker that fails to (re)start is retried with exponential
+backoff; once every worker is lost, queued jobs fail and submit() raises
+WorkersUnavailable instead of accepting jobs nobody will run. Queue wait and service time are recorded separately in the
+metrics registry ("jobs.queue_wait", "jobs.service"), alongside the worker's
+per-stage timings.
+"""
+
+import multiprocessing
+import queue
+import sys
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+
+from feature_cache import hash_source
+from instrumentation import REGISTRY, is_enabled
+
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_QUEUE = 32
+DEFAULT_TIMEOUT = 60.0
+# Finished jobs kept for polling
+DEFAULT_RETENTION = 1000
+# Worker (re)start attempts, with RESTART_BACKOFF * 2**attempt seconds between them
+RESTART_ATTEMPTS = 3
+RESTART_BACKOFF = 1.0
+
+FINISHED = ("done", "failed", "timeout")
+
+
+class QueueFull(Exception):
+    """Raised by submit() when max_queue jobs are already waiting."""
+
+
+class WorkersUnavailable(Exception):
+    """Raised by submit() once every worker process has failed to (re)start."""
+
+
+class Job:
+    """One prediction job; status goes queued -> running -> done | failed | timeout."""
+
+    def __init__(self, key, audio, pitch_method, mode, vad=False):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.audio = audio
+        self.pitch_method = pitch_method
+        self.mode = mode
+        self.vad = vad
+        self.status = "queued"
+        self.version = 0
+        self.coalesced = 0
+        self.result = None
+        self.error = None
+        self.submitted = time.perf_counter()
+        self.started = None
+        self.finished = None
+        self.changed = threading.Condition()
+
+    def set_status(self, status, result=None, error=None):
+        with self.changed:
+            now = time.perf_counter()
+            if status == "running":
+                self.started = now
+            elif status in FINISHED:
+                self.finished = now
+                self.result = result
+                self.error = error
+                self.audio = None  # the bytes are no longer needed
+            self.status = status
+            self.version += 1
+            self.changed.notify_all()
+
+    def snapshot(self):
+        with self.changed:
+            info = {"job_id": self.id, "status": self.status, "version": self.version,
+                    "coalesced": self.coalesced}
+            if self.started is not None:
+                info["queue_wait_ms"] = round((self.started - self.submitted) * 1000, 3)
+            if self.finished is not None and self.started is not None:
+                info["service_ms"] = round((self.finished - self.started) * 1000, 3)
+            if self.result is not None:
+                info["result"] = self.result
+            if self.error is not None:
+                info["error"] = self.error
+            return info
+
+
+def _worker_main(conn, models_dir, predictor, warm_up_methods, timings):
+    """Worker process: load the models once, then answer (audio, pitch_method, mode, vad) requests."""
+    import warnings
+    warnings.filterwarnings('ignore', category=UserWarning)
+    warnings.filterwarnings('ignore', category=FutureWarning)
+    from inference import load_models, predict_audio_file
+    from instrumentation import request_timer, set_enabled
+
+    # Spawned processes start from the environment default, not the parent's setting
+    set_enabled(timings)
+
+    try:
+        models = load_models(models_dir, predictor=predictor)
+        if warm_up_methods:
+            from startup import warm_up
+            warm_up(pitch_methods=warm_up_methods)
+        conn.send(("ready", None))
+        while True:
+            request = conn.recv()
+            if request is None:
+                return
+            audio, pitch_method, mode, vad = request
+            try:
+                with request_timer("/jobs", registry=None) as timer:
+                    result = predict_audio_file(models, audio, pitch_method=pitch_method, mode=mode, vad=vad)
+                if timer is not None:
+                    result["timings"] = timer.as_dict()
+                conn.send(("ok", result))
+            except Exception as e:
+                traceback.print_exc()
+                conn.send(("error", str(e)))
+    except (KeyboardInterrupt, EOFError):
+        return
+
+
+class _Worker:
+    """A worker process plus the pipe to it; restarted after a timeout or crash."""
+
+    def __init__(self, ctx, models_dir, predictor, warm_up_methods, timings):
+        self.ctx = ctx
+        self.args = (models_dir, predictor, warm_up_methods, timings)
+        self.process = None
+        self.conn = None
+
+    def start(self):
+        self.conn, child_conn = self.ctx.Pipe()
+        self.process = self.ctx.Process(target=_worker_main, args=(child_conn,) + self.args, daemon=True)
+        self.process.start()
+        child_conn.close()
+        kind, _ = self.conn.recv()  # wait until the models are loaded
+        if kind != "ready":
+            raise RuntimeError("Job worker failed to start")
+
+    def stop(self, kill=False):
+        if self.process is None:
+            return
+        if not kill:
+            try:
+                self.conn.send(None)
+                self.process.join(5)
+            except (OSError, BrokenPipeError):
+                pass
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(5)
+        self.conn.close()
+        self.process = None
+
+    def run(self, job, timeout):
+        """(status, payload) for one job; kills the process on timeout or crash (see alive)."""
+        try:
+            self.conn.send((job.audio, job.pitch_method, job.mode, job.vad))
+            if self.conn.poll(timeout):
+                kind, payload = self.conn.recv()
+                return ("done", payload) if kind == "ok" else ("failed", payload)
+            status, payload = "timeout", f"Job exceeded the {timeout:g}s timeout and was killed"
+        except (EOFError, OSError, BrokenPipeError):
+            status, payload = "failed", "Job worker process died"
+        self.stop(kill=True)
+        return status, payload
+
+    @property
+    def alive(self):
+        return self.process is not None
+
+
+class JobQueue:
+    """Bounded queue of prediction jobs served by a fixed pool of worker processes."""
+
+    def __init__(self, workers=DEFAULT_WORKERS, max_queue=DEFAULT_MAX_QUEUE, timeout=DEFAULT_TIMEOUT,
+                 models_dir="models", predictor=None, warm_up_methods=None,
+                 retention=DEFAULT_RETENTION, registry=REGISTRY, timings=None):
+        """timings=None follows instrumentation.is_enabled() at construction time."""
+        from inference import DEFAULT_PREDICTOR
+        self.n_workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.retention = retention
+        self.registry = registry
+        self.timings = is_enabled() if timings is None else bool(timings)
+        ctx = multiprocessing.get_context("spawn")
+        self._workers = [_Worker(ctx, models_dir, predictor or DEFAULT_PREDICTOR, warm_up_methods,
+                                 self.timings)
+                         for _ in range(workers)]
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._by_key = {}
+        self._queued = 0
+        self._running = 0
+        self._lost = 0
+        self._threads = []
+
+    def start(self):
+        # Processes start in parallel; each dispatcher thread waits for its own worker
+        for worker in self._workers:
+            thread = threading.Thread(target=self._dispatch, args=(worker,), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def shutdown(self):
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(10)
+
+    def submit(self, audio, pitch_method="pyin", mode="exact", vad=False):
+        """
+        Enqueue audio (path or bytes); returns (job, coalesced).
+
+        coalesced is True when an identical job is still queued or running
+        and is returned instead. Raises QueueFull or WorkersUnavailable.
+        """
+        key = (hash_source(audio), pitch_method, mode, vad)
+        with self._lock:
+            if self._lost >= self.n_workers:
+                raise WorkersUnavailable("No job workers available")
+            existing = self._by_key.get(key)
+            if existing is not None:
+                existing.coalesced += 1
+                self._count("jobs.coalesced")
+                return existing, True
+            if self._queued >= self.max_queue:
+                self._count("jobs.rejected")
+                raise QueueFull(f"Job queue is full ({self.max_queue} waiting)")
+            job = Job(key, audio, pitch_method, mode, vad)
+            self._jobs[job.id] = job
+            self._by_key[key] = job
+            self._queued += 1
+            self._evict()
+            # Enqueued under the lock so _worker_lost() cannot miss it
+            self._queue.put(job)
+        self._count("jobs.submitted")
+        return job, False
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def wait_for_change(self, job, version, timeout):
+        """Block until job.version != version, the job is finished, or timeout; returns a snapshot."""
+        with job.changed:
+            job.changed.wait_for(lambda: job.version != version or job.status in FINISHED, timeout)
+        return job.snapshot()
+
+    def stats(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return {
+                "workers": self.n_workers,
+                "workers_alive": self.n_workers - self._lost,
+                "max_queue": self.max_queue,
+                "timeout_s": self.timeout,
+                "queued": self._queued,
+                "running": self._running,
+                "retained": dict(counts),
+            }
+
+    def _count(self, name):
+        if self.registry is not None:
+            self.registry.increment(name)
+
+    def _observe(self, name, ms):
+        if self.registry is not None and self.timings:
+            self.registry.observe(name, ms)
+
+    def _evict(self):
+        """Drop the oldest finished jobs beyond the retention limit (caller holds the lock)."""
+        excess = len(self._jobs) - self.retention
+        if excess <= 0:
+            return
+        for job_id, job in list(self._jobs.items()):
+            if excess <= 0:
+                break
+            if job.status in FINISHED:
+                del self._jobs[job_id]
+                excess -= 1
+
+    def _start_worker(self, worker):
+        """(Re)start a worker, retrying with backoff; False when it keeps failing."""
+        for attempt in range(RESTART_ATTEMPTS):
+            try:
+                worker.start()
+                return True
+            except Exception as e:
+                worker.stop(kill=True)
+                print(f"❌ Job worker failed to start (attempt {attempt + 1}/{RESTART_ATTEMPTS}): {e}",
+                      file=sys.stderr)
+                if attempt + 1 < RESTART_ATTEMPTS:
+                    time.sleep(RESTART_BACKOFF * 2 ** attempt)
+        return False
+
+    def _worker_lost(self):
+        """Account for a worker that is gone for good; with none left, fail every queued job."""
+        self._count("jobs.workers_lost")
+        failed = []
+        with self._lock:
+            self._lost += 1
+            if self._lost < self.n_workers:
+                return
+            sentinels = 0
+            while True:
+                try:
+                    job = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if job is None:
+                    sentinels += 1
+                    continue
+                self._queued -= 1
+                if self._by_key.get(job.key) is job:
+                    del self._by_key[job.key]
+                failed.append(job)
+            for _ in range(sentinels):
+                self._queue.put(None)
+        print("❌ No job workers left; failing queued jobs", file=sys.stderr)
+        for job in failed:
+            job.set_status("failed", error="No job workers available")
+            self._count("jobs.failed")
+
+    def _dispatch(self, worker):
+        if not self._start_worker(worker):
+            self._worker_lost()
+            return
+        try:
+            while True:
+                job = self._queue.get()
+                if job is None:
+                    return
+                with self._lock:
+                    self._queued -= 1
+                    self._running += 1
+                job.set_status("running")
+                self._observe("jobs.queue_wait", (job.started - job.submitted) * 1000)
+
+                status, payload = worker.run(job, self.timeout)
+
+                with self._lock:
+                    self._running -= 1
+                    if self._by_key.get(job.key) is job:
+                        del self._by_key[job.key]  # only queued/running jobs are coalesced
+                if status == "done":
+                    job.set_status("done", result=payload)
+                else:
+                    job.set_status(status, error=payload)
+                self._count(f"jobs.{status}")
+                self._observe("jobs.service", (job.finished - job.started) * 1000)
+                for stage, ms in (payload.get("timings", {}) if status == "done" else {}).items():
+                    if stage != "total_ms":
+                        self._observe(f"stage.{stage[:-3]}", ms)
+                if not worker.alive and not self._start_worker(worker):
+                    self._worker_lost()
+                    return
+        finally:
+            worker.stop()
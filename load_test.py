@@ -0,0 +1,498 @@
+# load_test.py
+"""
+Local load testing of the prediction service.
+
+Synthesizes WAV (and, with ffmpeg, WebM/Opus) clips of several lengths,
+starts api_server.py on a free port (pickled sklearn models, feature cache
+disabled, so every request runs extract_features_from_file and the full
+scaler -> PCA -> SVC path just like audio_processor.py), and replays the
+clips in one or more scenarios:
+
+- closed loop, "c<N>": N clients each send the next request as soon as the
+  previous one returns;
+- open loop, "r<λ>": requests arrive as a Poisson process at λ per second
+  whatever the service does. Latency is measured from the scheduled
+  arrival, so a saturated service shows up as growing latency rather than
+  as a lower request rate.
+
+Requests go to POST /predict (raw audio bytes) or through the job queue
+(POST /jobs, then long-polling GET /jobs/<id>). Every request body is
+unique, so the job queue never coalesces two requests into one: WAV bodies
+carry a random tag in the least significant bits of their first samples,
+WebM bodies end with an EBML Void element holding random bytes, which
+demuxers skip.
+
+For every scenario, overall and per clip, the report gives:
+
+- request count and error rate (by kind: http, failed, rejected, timeout);
+- p50/p95/p99 latency;
+- achieved throughput;
+- CPU% and RSS of the server and its job worker processes, sampled with
+  psutil when it is installed.
+
+Reports are JSON tagged with the git commit, as in benchmark.py:
+
+    python load_test.py                                  # -> load_results/<commit>.json
+    python load_test.py --concurrency 1,4 --rate 1,2 --duration 20 --endpoint jobs --job-workers 2
+    python load_test.py --url http://127.0.0.1:5001 --pid 12345   # an already running server
+    python load_test.py --compare old.json new.json
+"""
+
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import numpy as np
+import soundfile as sf
+from benchmark import environment, synth_clip
+
+RESULTS_DIR = "load_results"
+DEFAULT_CLIPS = "wav:1,wav:3,wav:10,webm:3"
+CLIP_SR = 16000
+REQUEST_TIMEOUT = 120.0
+SAMPLE_INTERVAL = 0.5
+TAG_BITS = 64
+# EBML Void element (ID 0xEC) with an 8-byte payload, appended to WebM bodies
+VOID_TAG = b"\xec\x88"
+CONTENT_TYPES = {"wav": "audio/wav", "webm": "audio/webm"}
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+# ----------------------------------------------------------------------------
+# Clips
+# ----------------------------------------------------------------------------
+
+class Clip:
+    """One synthetic recording; body() returns bytes that are unique per request."""
+
+    def __init__(self, fmt, seconds, data):
+        self.fmt = fmt
+        self.seconds = seconds
+        self.name = f"{fmt}-{seconds:g}s"
+        self.data = data
+        self.content_type = CONTENT_TYPES[fmt]
+        if fmt == "wav":
+            self.data_offset = data.find(b"data") + 8
+
+    def body(self, rng):
+        data = self.data
+        tag = int(rng.integers(1 << 62))
+        if self.fmt != "wav":
+            # ffmpeg writes an unknown-size Segment to a pipe, so a trailing element is still inside it
+            return data + VOID_TAG + tag.to_bytes(8, "little")
+        # A random 64-bit tag in the least significant bits of the first 64 PCM_16 samples
+        samples = np.frombuffer(data, dtype="<i2", count=TAG_BITS, offset=self.data_offset).copy()
+        bits = (tag >> np.arange(TAG_BITS)) & 1
+        samples = (samples & ~1) | bits
+        return data[:self.data_offset] + samples.astype("<i2").tobytes() + data[self.data_offset + 2 * TAG_BITS:]
+
+
+def make_clips(spec, sr=CLIP_SR, workdir=None):
+    """Clips for a "wav:1,wav:3,webm:3" spec; WebM clips are skipped (with a warning) without ffmpeg."""
+    clips = []
+    for item in spec.split(","):
+        fmt, _, seconds = item.strip().partition(":")
+        if fmt not in CONTENT_TYPES:
+            raise ValueError(f"Unknown clip format '{fmt}', expected one of {tuple(CONTENT_TYPES)}")
+        seconds = float(seconds or 3)
+        wav = os.path.join(workdir, f"{fmt}_{seconds:g}.wav")
+        if fmt == "wav":
+            sf.write(wav, synth_clip("voiced", seconds, sr), sr, subtype="PCM_16")
+            with open(wav, "rb") as f:
+                clips.append(Clip(fmt, seconds, f.read()))
+            continue
+        sf.write(wav, synth_clip("voiced", seconds, sr), sr, subtype="PCM_16")
+        try:
+            result = subprocess.run(["ffmpeg", "-v", "error", "-y", "-i", wav, "-c:a", "libopus",
+                                     "-f", "webm", "pipe:1"], capture_output=True)
+        except FileNotFoundError:
+            print(f"⚠️  ffmpeg not found, skipping {item}", file=sys.stderr)
+            continue
+        if result.returncode != 0:
+            print(f"⚠️  ffmpeg failed for {item}: {result.stderr.decode(errors='replace').strip()}",
+                  file=sys.stderr)
+            continue
+        clips.append(Clip(fmt, seconds, result.stdout))
+    if not clips:
+        raise ValueError("No clips to send")
+    return clips
+
+
+# ----------------------------------------------------------------------------
+# Service under test
+# ----------------------------------------------------------------------------
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(predictor="sklearn", pitch_method="pyin", job_workers=2, max_queue=64, timeout=60.0):
+    """Spawn api_server.py with the feature cache off; returns (process, url) once /health answers."""
+    port = _free_port()
+    env = dict(os.environ, VOICE_FEATURE_CACHE="0")
+    process = subprocess.Popen(
+        [sys.executable, "api_server.py", "--port", str(port), "--predictor", predictor,
+         "--pitch-method", pitch_method, "--job-workers", str(job_workers), "--max-queue", str(max_queue)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"api_server.py exited with code {process.returncode}")
+        try:
+            status, _ = _request(url, "GET", "/health", timeout=2)
+            if status == 200:
+                return process, url
+        except OSError:
+            pass
+        time.sleep(0.25)
+    process.kill()
+    raise RuntimeError(f"api_server.py did not become healthy within {timeout:g}s")
+
+
+def _request(url, method, path, body=None, content_type=None, timeout=REQUEST_TIMEOUT):
+    parsed = urlparse(url)
+    conn = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=timeout)
+    try:
+        headers = {"Content-Type": content_type} if content_type else {}
+        conn.request(method, path, body=body, headers=headers)
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+
+def send(url, endpoint, clip, body, pitch_method=None):
+    """One prediction; returns None on success or the error kind."""
+    query = f"?pitch_method={pitch_method}" if pitch_method else ""
+    if endpoint == "predict":
+        status, payload = _request(url, "POST", f"/predict{query}", body, clip.content_type)
+        if status != 200:
+            return "http"
+        return None if json.loads(payload).get("success") else "failed"
+
+    status, payload = _request(url, "POST", f"/jobs{query}", body, clip.content_type)
+    if status == 429:
+        return "rejected"
+    if status != 202 and status != 200:
+        return "http"
+    job = json.loads(payload)
+    while job.get("status") not in ("done", "failed", "timeout"):
+        status, payload = _request(url, "GET", f"/jobs/{job['job_id']}?wait=30")
+        if status != 200:
+            return "http"
+        job = json.loads(payload)
+    return None if job["status"] == "done" else job["status"]
+
+
+# ----------------------------------------------------------------------------
+# Resource sampling
+# ----------------------------------------------------------------------------
+
+class ResourceSampler:
+    """Samples CPU% and RSS of a process and all its children (job workers) in the background."""
+
+    def __init__(self, pid, interval=SAMPLE_INTERVAL):
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = None
+        self._procs = {}
+
+    def _tree(self):
+        root = psutil.Process(self.pid)
+        procs = [root] + root.children(recursive=True)
+        # Keep the same Process objects so cpu_percent() measures since the last sample
+        current = {}
+        for p in procs:
+            current[p.pid] = self._procs.get(p.pid, p)
+        self._procs = current
+        return list(current.values())
+
+    def _sample(self):
+        cpu = rss = 0.0
+        n = 0
+        for p in self._tree():
+            try:
+                cpu += p.cpu_percent(None)
+                rss += p.memory_info().rss / (1024 * 1024)
+                n += 1
+            except psutil.Error:
+                continue
+        return cpu, rss, n
+
+    def _run(self):
+        self._sample()  # prime cpu_percent
+        while not self._stop.wait(self.interval):
+            try:
+                self.samples.append(self._sample())
+            except psutil.Error:
+                return
+
+    def __enter__(self):
+        if psutil is not None and self.pid is not None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return False
+
+    def summary(self):
+        if not self.samples:
+            return {"cpu_percent_mean": None, "cpu_percent_max": None, "rss_mb_max": None, "processes": None}
+        cpu, rss, n = (np.asarray(col) for col in zip(*self.samples))
+        return {
+            "cpu_percent_mean": float(cpu.mean()),
+            "cpu_percent_max": float(cpu.max()),
+            "rss_mb_max": float(rss.max()),
+            "processes": int(n.max()),
+        }
+
+
+# ----------------------------------------------------------------------------
+# Scenarios
+# ----------------------------------------------------------------------------
+
+def _record(records, lock, clip, started, error):
+    with lock:
+        records.append((clip.name, started, time.perf_counter(), error))
+
+
+def _attempt(url, endpoint, clip, body, pitch_method):
+    try:
+        return send(url, endpoint, clip, body, pitch_method)
+    except socket.timeout:
+        return "timeout"
+    except (OSError, http.client.HTTPException, ValueError):
+        return "http"
+
+
+def run_closed(url, endpoint, clips, concurrency, duration, pitch_method=None, seed=0):
+    """concurrency clients sending back to back for duration seconds."""
+    records, lock = [], threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(index):
+        rng = np.random.default_rng((seed, index))
+        while time.perf_counter() < deadline:
+            clip = clips[int(rng.integers(len(clips)))]
+            body = clip.body(rng)
+            started = time.perf_counter()
+            _record(records, lock, clip, started, _attempt(url, endpoint, clip, body, pitch_method))
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return records
+
+
+def run_open(url, endpoint, clips, rate, duration, pitch_method=None, seed=0, max_inflight=256):
+    """Poisson arrivals at rate per second for duration seconds; latency counts from the scheduled arrival."""
+    rng = np.random.default_rng(seed)
+    arrivals = np.cumsum(rng.exponential(1.0 / rate, size=int(rate * duration * 2) + 10))
+    arrivals = arrivals[arrivals < duration]
+    records, lock = [], threading.Lock()
+
+    def request(clip, body, scheduled):
+        _record(records, lock, clip, scheduled, _attempt(url, endpoint, clip, body, pitch_method))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_inflight) as pool:
+        for offset in arrivals:
+            clip = clips[int(rng.integers(len(clips)))]
+            body = clip.body(rng)
+            delay = start + offset - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(request, clip, body, start + offset)
+    return records
+
+
+def summarize(records, wall):
+    """Latency percentiles, error rate and throughput for a list of (clip, start, end, error)."""
+    n = len(records)
+    errors = {}
+    for _, _, _, error in records:
+        if error is not None:
+            errors[error] = errors.get(error, 0) + 1
+    ok = [end - start for _, start, end, error in records if error is None]
+    lat = np.asarray(ok) * 1000 if ok else np.full(1, np.nan)
+    return {
+        "requests": n,
+        "errors": sum(errors.values()),
+        "error_rate": float(sum(errors.values()) / n) if n else 0.0,
+        "errors_by_kind": errors,
+        "mean_ms": float(lat.mean()),
+        "p50_ms": float(np.percentile(lat, 50)),
+        "p95_ms": float(np.percentile(lat, 95)),
+        "p99_ms": float(np.percentile(lat, 99)),
+        "max_ms": float(lat.max()),
+        "throughput_per_s": float(len(ok) / wall) if wall > 0 else 0.0,
+    }
+
+
+def run_scenario(url, endpoint, clips, kind, value, duration, pid, pitch_method=None):
+    """One closed ("c") or open ("r") scenario; returns the overall row plus one row per clip."""
+    scenario = f"c{value:g}" if kind == "c" else f"r{value:g}"
+    with ResourceSampler(pid) as sampler:
+        start = time.perf_counter()
+        if kind == "c":
+            records = run_closed(url, endpoint, clips, int(value), duration, pitch_method)
+        else:
+            records = run_open(url, endpoint, clips, value, duration, pitch_method)
+        wall = time.perf_counter() - start
+
+    base = {"group": "load", "endpoint": endpoint, "scenario": scenario, "duration_s": round(wall, 3)}
+    if kind == "r":
+        base["offered_rate_per_s"] = value
+    overall = dict(base, clip="all", **summarize(records, wall), **sampler.summary())
+    rows = [overall]
+    for clip in clips:
+        subset = [r for r in records if r[0] == clip.name]
+        if subset:
+            rows.append(dict(base, clip=clip.name, **summarize(subset, wall)))
+
+    cpu = overall["cpu_percent_mean"]
+    resources = (f"  cpu {cpu:6.1f}%  rss {overall['rss_mb_max']:7.1f} MB ({overall['processes']} procs)"
+                 if cpu is not None else "")
+    print(f"  {endpoint:<8} {scenario:<6} {overall['requests']:>5} req  "
+          f"p50 {overall['p50_ms']:8.1f}  p95 {overall['p95_ms']:8.1f}  p99 {overall['p99_ms']:8.1f} ms  "
+          f"err {overall['error_rate'] * 100:5.1f}%  {overall['throughput_per_s']:6.2f}/s{resources}")
+    return rows
+
+
+def warm(url, endpoint, clips, pitch_method=None):
+    """One unrecorded request per clip (numba JIT, ffmpeg page cache, worker start-up)."""
+    rng = np.random.default_rng(0)
+    for clip in clips:
+        _attempt(url, endpoint, clip, clip.body(rng), pitch_method)
+
+
+def _parse_list(text, cast=float):
+    return [cast(v) for v in text.split(",") if v.strip()] if text else []
+
+
+# ----------------------------------------------------------------------------
+# Comparison
+# ----------------------------------------------------------------------------
+
+def _row_key(row):
+    return tuple(str(row.get(k, "")) for k in ("endpoint", "scenario", "clip"))
+
+
+def compare(old_path, new_path):
+    """Print latency, error rate and throughput of every scenario present in both reports."""
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    old_rows = {_row_key(r): r for r in old["results"]}
+    print(f"\n{'scenario':<28} {'p50 old/new':>19} {'p95 old/new':>19} {'p99 old/new':>19} "
+          f"{'err% old/new':>13} {'req/s old/new':>15}")
+    print(f"{old['environment']['commit']} -> {new['environment']['commit']}")
+    for row in new["results"]:
+        before = old_rows.get(_row_key(row))
+        if before is None:
+            continue
+        label = " ".join(_row_key(row))
+        slower = before["p95_ms"] > 0 and row["p95_ms"] / before["p95_ms"] > 1.2
+        worse = row["error_rate"] > before["error_rate"] + 0.01
+        fewer = before["throughput_per_s"] > 0 and row["throughput_per_s"] / before["throughput_per_s"] < 0.8
+        flag = "  ⚠️" if slower or worse or fewer else ""
+        print(f"{label:<28} {before['p50_ms']:9.1f}/{row['p50_ms']:<9.1f} {before['p95_ms']:9.1f}/{row['p95_ms']:<9.1f} "
+              f"{before['p99_ms']:9.1f}/{row['p99_ms']:<9.1f} {before['error_rate'] * 100:6.1f}/"
+              f"{row['error_rate'] * 100:<6.1f} {before['throughput_per_s']:7.2f}/{row['throughput_per_s']:<7.2f}{flag}")
+
+
+# ----------------------------------------------------------------------------
+# Main
+# ----------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    import warnings
+    warnings.filterwarnings("ignore")
+
+    parser = argparse.ArgumentParser(description="Load test the prediction service on this machine")
+    parser.add_argument("--clips", default=DEFAULT_CLIPS, help=f"FORMAT:SECONDS list (default {DEFAULT_CLIPS})")
+    parser.add_argument("--concurrency", default="1,4", help="Closed-loop client counts, comma separated")
+    parser.add_argument("--rate", default="", help="Open-loop arrival rates (requests/s), comma separated")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds per scenario")
+    parser.add_argument("--endpoint", choices=["predict", "jobs"], action="append",
+                        help="Service path to exercise (repeatable, default predict)")
+    parser.add_argument("--url", help="Test an already running api_server.py instead of starting one")
+    parser.add_argument("--pid", type=int, help="Process to sample CPU/RSS of with --url")
+    parser.add_argument("--predictor", choices=["sklearn", "numpy"], default="sklearn",
+                        help="Predictor of the spawned server (default: the pickled sklearn models)")
+    parser.add_argument("--pitch-method", choices=["pyin", "yin"], default="pyin")
+    parser.add_argument("--job-workers", type=int, default=2, help="Job worker processes of the spawned server")
+    parser.add_argument("--output", help=f"Report path (default {RESULTS_DIR}/<commit>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Diff two saved reports")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        sys.exit(0)
+    if psutil is None:
+        print("⚠️  psutil not installed: CPU/RSS of the service will not be recorded", file=sys.stderr)
+
+    scenarios = [("c", c) for c in _parse_list(args.concurrency, int)] + [("r", r) for r in _parse_list(args.rate)]
+    endpoints = args.endpoint or ["predict"]
+    config = {"clips": args.clips, "clip_sr": CLIP_SR, "duration_s": args.duration, "endpoints": endpoints,
+              "scenarios": [f"{k}{v:g}" for k, v in scenarios], "predictor": args.predictor,
+              "pitch_method": args.pitch_method, "job_workers": args.job_workers,
+              "target": args.url or "spawned api_server.py"}
+
+    process = None
+    with tempfile.TemporaryDirectory(prefix="voice_load_") as workdir:
+        clips = make_clips(args.clips, workdir=workdir)
+    try:
+        if args.url:
+            url, pid, pitch_method = args.url.rstrip("/"), args.pid, args.pitch_method
+        else:
+            print("🚀 Starting api_server.py ...")
+            process, url = start_server(args.predictor, args.pitch_method, args.job_workers)
+            pid, pitch_method = process.pid, None
+        print(f"🎯 {url}  clips: {', '.join(c.name for c in clips)}")
+
+        report = {"environment": environment(), "config": config, "results": []}
+        for endpoint in endpoints:
+            warm(url, endpoint, clips, pitch_method)
+            for kind, value in scenarios:
+                report["results"] += run_scenario(url, endpoint, clips, kind, value, args.duration, pid,
+                                                  pitch_method)
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    env = report["environment"]
+    output = args.output or os.path.join(RESULTS_DIR, f"{env['commit']}{'-dirty' if env['dirty'] else ''}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✅ Load test report saved to {output}")
@@ -0,0 +1,84 @@
+# metrics_store.py
+"""
+Versioned evaluation-metrics artifact (models/metrics.json).
+
+train.py writes per-model test metrics, confusion matrices and CV scores once,
+fingerprinted by the SHA-256 of data/voice.csv and of the saved model files.
+get_model_metrics.py serves from the artifact and only recomputes when the
+fingerprint no longer matches the files on disk.
+"""
+
+import json
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+
+from feature_cache import hash_file
+
+SCHEMA_VERSION = 1
+DATA_PATH = "data/voice.csv"
+MODELS_DIR = "models"
+METRICS_PATH = os.path.join(MODELS_DIR, "metrics.json")
+FINGERPRINT_FILES = ["scaler.pkl", "pca.pkl", "final_model.pkl", "label_encoder.pkl"]
+
+
+def compute_fingerprint(data_path=DATA_PATH, models_dir=MODELS_DIR):
+    """Hashes of the training data and every saved model file."""
+    return {
+        "data": hash_file(data_path),
+        "models": {name: hash_file(os.path.join(models_dir, name)) for name in FINGERPRINT_FILES},
+    }
+
+
+def classification_metrics(y_true, y_pred):
+    """Test-set metrics in the shape served by /api/model-metrics."""
+    from sklearn.metrics import confusion_matrix, accuracy_score, f1_score, precision_score, recall_score
+    return {
+        "accuracy": float(accuracy_score(y_true, y_pred)),
+        "f1_score": float(f1_score(y_true, y_pred)),
+        "precision": float(precision_score(y_true, y_pred)),
+        "recall": float(recall_score(y_true, y_pred)),
+        "confusion_matrix": confusion_matrix(y_true, y_pred).tolist()
+    }
+
+
+def cv_metrics(cv_scores):
+    """Cross-validation fields stored next to each model's test metrics."""
+    return {
+        "cv_scores": [float(score) for score in cv_scores],
+        "cv_mean_f1": float(np.mean(cv_scores)),
+        "cv_std": float(np.std(cv_scores)),
+    }
+
+
+def select_best_model(model_metrics):
+    """Name of the model train.py saves: highest test accuracy, the first listed on ties."""
+    return max(model_metrics, key=lambda name: model_metrics[name]["accuracy"])
+
+
+def save_metrics(all_models, final_model, fingerprint, path=METRICS_PATH):
+    """Write the artifact atomically. all_models/final_model use get_model_metrics' output shapes."""
+    artifact = {
+        "version": SCHEMA_VERSION,
+        "created": datetime.now(timezone.utc).isoformat(),
+        "fingerprint": fingerprint,
+        "all": all_models,
+        "final": final_model,
+    }
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(artifact, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def load_metrics(fingerprint, path=METRICS_PATH):
+    """Return the stored artifact, or None if it is missing, from another schema version or stale."""
+    try:
+        with open(path) as f:
+            artifact = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if artifact.get("version") != SCHEMA_VERSION or artifact.get("fingerprint") != fingerprint:
+        return None
+    return artifact
@@ -0,0 +1,235 @@
+# model_bundle.py
+"""
+Single versioned, memory-mappable model artifact (models/model_bundle.bin).
+
+One file holds everything inference needs: feature order, scaler, PCA, the
+RBF SVC (support vectors, dual coefficients, intercept, gamma, Platt
+parameters), the class labels and a fingerprint of the training data, so the
+pieces can no longer drift apart. It optionally also carries the fast
+approximate model (fast_model.py) and its evaluation report. train.py writes it next to the pickles;
+inference.load_models(predictor="numpy") and the frontend models.json export
+are generated from it.
+
+Layout: 8-byte magic, uint32 format version, uint64 header length, a JSON
+header (metadata plus name -> dtype/shape/offset for every array), then the
+raw little-endian arrays, each 64-byte aligned. load_bundle() memory-maps the
+file and returns zero-copy array views.
+
+    python model_bundle.py --from-pickles     # build from the current models/*.pkl
+    python model_bundle.py                    # print the header
+"""
+
+import json
+import os
+import struct
+import sys
+from datetime import datetime, timezone
+
+import numpy as np
+
+MAGIC = b"VGBUNDLE"
+BUNDLE_VERSION = 1
+BUNDLE_PATH = os.path.join("models", "model_bundle.bin")
+ALIGNMENT = 64
+_PREFIX = struct.Struct("<8sIQ")
+
+
+class BundleLabelEncoder:
+    """The part of LabelEncoder the services use, backed by the bundle's classes."""
+
+    def __init__(self, classes):
+        self.classes_ = np.asarray(classes)
+
+    def transform(self, labels):
+        return np.searchsorted(self.classes_, labels)
+
+    def inverse_transform(self, encoded):
+        return self.classes_[np.asarray(encoded, dtype=int)]
+
+
+class ModelBundle:
+    """Header metadata (.meta) plus named arrays (.arrays), usually memory-mapped."""
+
+    def __init__(self, meta, arrays):
+        self.meta = meta
+        self.arrays = arrays
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    @property
+    def feature_order(self):
+        return self.meta["feature_order"]
+
+    @property
+    def classes(self):
+        return self.meta["classes"]
+
+
+def bundle_arrays(scaler, pca, svc):
+    """Arrays stored in the bundle for a StandardScaler -> PCA -> RBF SVC pipeline."""
+    if getattr(svc, "kernel", None) != "rbf" or len(svc.classes_) != 2:
+        raise ValueError("The model bundle only supports binary RBF SVC models")
+    if getattr(pca, "whiten", False):
+        raise ValueError("The model bundle does not support whitened PCA")
+    return {
+        "scaler_mean": scaler.mean_,
+        "scaler_scale": scaler.scale_,
+        "pca_components": pca.components_,
+        "pca_mean": pca.mean_,
+        "pca_explained_variance": pca.explained_variance_,
+        "support_vectors": svc.support_vectors_,
+        "dual_coef": svc.dual_coef_,
+        "intercept": svc.intercept_,
+        "prob_a": svc.probA_,
+        "prob_b": svc.probB_,
+        "n_support": svc.n_support_,
+    }
+
+
+def save_bundle(scaler, pca, svc, label_encoder, data_fingerprint, path=BUNDLE_PATH, fast=None, fast_report=None):
+    """
+    Write the bundle atomically. data_fingerprint is the SHA-256 of the training CSV;
+    fast is the dict from fast_model.fit_fast_model (optional).
+    """
+    from feature_extraction import FEATURE_ORDER
+    import sklearn
+
+    arrays = bundle_arrays(scaler, pca, svc)
+    if fast is not None:
+        arrays.update({
+            "fast_landmarks": fast["landmarks"],
+            "fast_weights": fast["weights"],
+            "fast_intercept": [fast["intercept"]],
+        })
+    arrays = {name: np.ascontiguousarray(value, dtype=np.int32 if name == "n_support" else "<f8")
+              for name, value in arrays.items()}
+    meta = {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "sklearn": sklearn.__version__,
+        "data_sha256": data_fingerprint,
+        "feature_order": list(FEATURE_ORDER),
+        "classes": label_encoder.classes_.tolist(),
+        "model": {
+            "type": type(svc).__name__,
+            "kernel": svc.kernel,
+            "gamma": svc.gamma,
+            "gamma_value": float(svc._gamma),
+            "C": float(svc.C),
+            "svc_classes": svc.classes_.tolist(),
+        },
+        "pca_n_components": int(pca.n_components_),
+    }
+    if fast is not None:
+        meta["fast"] = dict(fast_report or {}, gamma=fast["gamma"], C=fast["C"])
+
+    # Header offsets are relative to the start of the data section
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        offset = -(-offset // ALIGNMENT) * ALIGNMENT
+        layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += array.nbytes
+    header = json.dumps({"version": BUNDLE_VERSION, "meta": meta, "arrays": layout}).encode("utf-8")
+    data_start = -(-(_PREFIX.size + len(header)) // ALIGNMENT) * ALIGNMENT
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_PREFIX.pack(MAGIC, BUNDLE_VERSION, len(header)))
+        f.write(header)
+        for name, array in arrays.items():
+            f.seek(data_start + layout[name]["offset"])
+            f.write(array.tobytes())
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_header(path=BUNDLE_PATH):
+    """(header dict, data section offset) without touching the arrays."""
+    with open(path, "rb") as f:
+        magic, version, header_len = _PREFIX.unpack(f.read(_PREFIX.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a model bundle")
+        if version != BUNDLE_VERSION:
+            raise ValueError(f"{path} has bundle format version {version}, expected {BUNDLE_VERSION}")
+        header = json.loads(f.read(header_len))
+    return header, -(-(_PREFIX.size + header_len) // ALIGNMENT) * ALIGNMENT
+
+
+def load_bundle(path=BUNDLE_PATH, mmap=True):
+    """Open a bundle; arrays are read-only views into a memory map (or copies with mmap=False)."""
+    header, data_start = read_header(path)
+    if mmap:
+        buffer = np.memmap(path, dtype=np.uint8, mode="r")
+    else:
+        with open(path, "rb") as f:
+            buffer = np.frombuffer(f.read(), dtype=np.uint8)
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        dtype = np.dtype(spec["dtype"])
+        count = int(np.prod(spec["shape"], dtype=np.int64))
+        start = data_start + spec["offset"]
+        arrays[name] = buffer[start:start + count * dtype.itemsize].view(dtype).reshape(spec["shape"])
+    return ModelBundle(header["meta"], arrays)
+
+
+def export_json(bundle, path):
+    """Write the frontend models.json (compact) from a bundle."""
+    model = bundle.meta["model"]
+    params = {
+        "version": BUNDLE_VERSION,
+        "data_sha256": bundle.meta["data_sha256"],
+        "feature_order": bundle.feature_order,
+        "scaler": {"mean": bundle["scaler_mean"].tolist(), "scale": bundle["scaler_scale"].tolist()},
+        "pca": {
+            "components": bundle["pca_components"].tolist(),
+            "mean": bundle["pca_mean"].tolist(),
+            "explained_variance": bundle["pca_explained_variance"].tolist(),
+            "n_components": bundle.meta["pca_n_components"],
+        },
+        "label_encoder": {"classes": bundle.classes},
+        "model": {
+            "type": model["type"],
+            "support_vectors": bundle["support_vectors"].tolist(),
+            "dual_coef": bundle["dual_coef"].tolist(),
+            "intercept": bundle["intercept"].tolist(),
+            "gamma": model["gamma"],
+            "kernel": model["kernel"],
+            "degree": None,
+            "classes": model["svc_classes"],
+            "gamma_value": model["gamma_value"],
+            "prob_a": bundle["prob_a"].tolist(),
+            "prob_b": bundle["prob_b"].tolist(),
+        },
+    }
+    with open(path, "w") as f:
+        json.dump(params, f, separators=(",", ":"))
+
+
+def bundle_from_pickles(models_dir="models", data_path="data/voice.csv", path=BUNDLE_PATH):
+    """
+    Build the bundle from the existing scaler/PCA/model/encoder pickles.
+
+    The fast model is refit on train.py's split (test_size=0.2, random_state=42, stratified).
+    """
+    from dataset_cache import load_dataset, projection_key
+    from fast_model import fit_fast_model, evaluate_fast_model
+    from inference import load_models
+
+    models = load_models(models_dir, predictor="sklearn")
+    dataset = load_dataset(data_path)
+    split = dataset.split(test_size=0.2, random_state=42)
+    key = projection_key(os.path.join(models_dir, "scaler.pkl"), os.path.join(models_dir, "pca.pkl"))
+    projected = split.projections(models["scaler"], models["pca"], key)
+    fast = fit_fast_model(models["final_model"], projected["X_train_pca"], split.y_train)
+    report = evaluate_fast_model(models["final_model"], fast, projected["X_test_pca"], split.y_test)
+    return save_bundle(models["scaler"], models["pca"], models["final_model"], models["label_encoder"],
+                       dataset.sha256, path, fast=fast, fast_report=report)
+
+
+if __name__ == "__main__":
+    if "--from-pickles" in sys.argv:
+        print(f"✅ Model bundle written to {bundle_from_pickles()} ({os.path.getsize(BUNDLE_PATH)} bytes)")
+        sys.exit(0)
+    header, _ = read_header(sys.argv[1] if len(sys.argv) > 1 else BUNDLE_PATH)
+    print(json.dumps(header, indent=2))
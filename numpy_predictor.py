@@ -0,0 +1,224 @@
+# numpy_predictor.py
+"""
+Dependency-light predictor for the StandardScaler -> PCA -> RBF SVC pipeline.
+
+The scaler and PCA are both affine maps, so they are folded into a single
+precomputed matrix W and offset b (x_pca = x @ W + b). The RBF kernel is
+evaluated for the whole batch at once and Platt scaling reproduces
+SVC.predict_proba for the binary case, so inference needs only NumPy.
+
+Build it from the model bundle (model_bundle.py), the pickles
+(inference.load_models) or the exported frontend/src/lib/models.json.
+    python numpy_predictor.py --verify         # compare against sklearn
+    python numpy_predictor.py --export-json    # regenerate models.json from the bundle
+"""
+
+import json
+import sys
+
+import numpy as np
+
+# libsvm clamps pairwise probabilities to [MIN_PROB, 1 - MIN_PROB]
+MIN_PROB = 1e-7
+
+
+class NumpyPredictor:
+    """Fused scaler/PCA + RBF SVC with Platt-scaled probabilities."""
+
+    def __init__(self, scaler_mean, scaler_scale, pca_components, pca_mean,
+                 support_vectors, dual_coef, intercept, gamma, prob_a, prob_b, classes, fast=None):
+        scaler_mean = np.asarray(scaler_mean, dtype=np.float64)
+        scaler_scale = np.asarray(scaler_scale, dtype=np.float64)
+        components = np.asarray(pca_components, dtype=np.float64)
+        pca_mean = np.asarray(pca_mean, dtype=np.float64)
+
+        self.scaler_mean = scaler_mean
+        self.scaler_scale = scaler_scale
+        # ((x - mean) / scale - pca_mean) @ C.T  ==  x @ W + b
+        self.W = (components / scaler_scale).T
+        self.b = -(scaler_mean / scaler_scale + pca_mean) @ components.T
+
+        self.support_vectors = np.asarray(support_vectors, dtype=np.float64)
+        self.sv_sq_norm = np.einsum("ij,ij->i", self.support_vectors, self.support_vectors)
+        self.dual_coef = np.asarray(dual_coef, dtype=np.float64).ravel()
+        self.intercept = float(np.ravel(intercept)[0])
+        self.gamma = float(gamma)
+        self.prob_a = float(np.ravel(prob_a)[0])
+        self.prob_b = float(np.ravel(prob_b)[0])
+        self.classes_ = np.asarray(classes)
+        # Optional fast model (fast_model.py): landmarks, weights, intercept, same gamma
+        self.fast = fast
+
+    @classmethod
+    def from_models(cls, models):
+        """Build from the dict returned by inference.load_models."""
+        scaler, pca, svc = models["scaler"], models["pca"], models["final_model"]
+        if getattr(svc, "kernel", None) != "rbf" or len(svc.classes_) != 2:
+            raise ValueError("NumpyPredictor only supports binary RBF SVC models")
+        if getattr(pca, "whiten", False):
+            raise ValueError("NumpyPredictor does not support whitened PCA")
+        return cls(
+            scaler.mean_, scaler.scale_, pca.components_, pca.mean_,
+            svc.support_vectors_, svc.dual_coef_, svc.intercept_, svc._gamma,
+            svc.probA_, svc.probB_, models["label_encoder"].classes_
+        )
+
+    @classmethod
+    def from_bundle(cls, bundle):
+        """Build from a model_bundle.ModelBundle (arrays may be memory-mapped)."""
+        fast = None
+        if "fast_landmarks" in bundle.arrays:
+            fast = {
+                "landmarks": bundle["fast_landmarks"],
+                "weights": bundle["fast_weights"],
+                "intercept": float(bundle["fast_intercept"][0]),
+                "gamma": bundle.meta["fast"]["gamma"],
+            }
+        return cls(
+            bundle["scaler_mean"], bundle["scaler_scale"], bundle["pca_components"], bundle["pca_mean"],
+            bundle["support_vectors"], bundle["dual_coef"], bundle["intercept"],
+            bundle.meta["model"]["gamma_value"], bundle["prob_a"], bundle["prob_b"], bundle.classes, fast=fast
+        )
+
+    @classmethod
+    def from_json(cls, path):
+        """Build from the exported models.json (needs numeric gamma and Platt parameters)."""
+        with open(path) as f:
+            params = json.load(f)
+        model = params["model"]
+        gamma = model.get("gamma_value", model.get("gamma"))
+        if model.get("kernel") != "rbf" or not isinstance(gamma, (int, float)):
+            raise ValueError(f"{path} does not describe an RBF SVC with a numeric gamma")
+        if "prob_a" not in model or "prob_b" not in model:
+            raise ValueError(f"{path} is missing the Platt parameters 'prob_a'/'prob_b'")
+        return cls(
+            params["scaler"]["mean"], params["scaler"]["scale"],
+            params["pca"]["components"], params["pca"]["mean"],
+            model["support_vectors"], model["dual_coef"], model["intercept"], gamma,
+            model["prob_a"], model["prob_b"], params["label_encoder"]["classes"]
+        )
+
+    def scale(self, X):
+        return (np.asarray(X, dtype=np.float64) - self.scaler_mean) / self.scaler_scale
+
+    def transform(self, X):
+        """Scaler + PCA as one matrix product."""
+        return np.asarray(X, dtype=np.float64) @ self.W + self.b
+
+    def decision_function(self, X, transformed=False):
+        """Same sign convention as SVC.decision_function (positive -> classes_[1])."""
+        P = X if transformed else self.transform(X)
+        sq_dist = np.einsum("ij,ij->i", P, P)[:, None] + self.sv_sq_norm[None, :] - 2.0 * (P @ self.support_vectors.T)
+        K = np.exp(-self.gamma * np.maximum(sq_dist, 0.0))
+        return K @ self.dual_coef + self.intercept
+
+    def predict_proba(self, X, transformed=False):
+        """Platt-scaled probabilities, matching sklearn's bundled libsvm."""
+        return self._platt(self.decision_function(X, transformed))
+
+    def _platt(self, decision):
+        # libsvm's decision value has the opposite sign of sklearn's
+        f_apb = -decision * self.prob_a + self.prob_b
+        # Numerically stable 1 / (1 + exp(f_apb)), as in libsvm's sigmoid_predict
+        e = np.exp(-np.abs(f_apb))
+        r = np.where(f_apb >= 0, e / (1.0 + e), 1.0 / (1.0 + e))
+        r = np.clip(r, MIN_PROB, 1.0 - MIN_PROB)
+        return _pairwise_to_proba(r)
+
+    def predict(self, X, transformed=False):
+        """Class labels; like SVC.predict this uses the decision sign, not the probabilities."""
+        return self.classes_[(self.decision_function(X, transformed) > 0).astype(int)]
+
+    def predict_transformed(self, P, mode="exact"):
+        """
+        (labels, probabilities) for already transformed (PCA space) rows, sharing one kernel evaluation.
+
+        mode="fast" uses the reduced Nystroem expansion with logistic probabilities instead.
+        """
+        if mode == "fast":
+            if self.fast is None:
+                raise ValueError("This model has no fast approximation; retrain with train.py to add one")
+            from fast_model import fast_decision
+            decision = fast_decision(self.fast, P)
+            p1 = 1.0 / (1.0 + np.exp(-decision))
+            return self.classes_[(decision > 0).astype(int)], np.column_stack([1.0 - p1, p1])
+        decision = self.decision_function(P, transformed=True)
+        return self.classes_[(decision > 0).astype(int)], self._platt(decision)
+
+    def predict_vector(self, X, mode="exact"):
+        """Same return value as inference.predict_vector: (scaled, pca, labels, probabilities)."""
+        P = self.transform(X)
+        labels, probabilities = self.predict_transformed(P, mode)
+        return self.scale(X), P, labels, probabilities
+
+
+def _pairwise_to_proba(r, max_iter=100):
+    """
+    libsvm's multiclass_probability for two classes, vectorized over samples.
+
+    sklearn's bundled libsvm has no two-class shortcut: it runs the iterative
+    pairwise-coupling solver (stopping at eps = 0.005 / k) even for k = 2, so
+    its output is close to but not exactly [r, 1 - r]. Replicating the solver
+    keeps probabilities bit-close to SVC.predict_proba.
+    """
+    k = 2
+    eps = 0.005 / k
+    r01, r10 = r, 1.0 - r
+    Q = np.empty((len(r), k, k))
+    Q[:, 0, 0] = r10 * r10
+    Q[:, 1, 1] = r01 * r01
+    Q[:, 0, 1] = Q[:, 1, 0] = -r10 * r01
+    p = np.full((len(r), k), 1.0 / k)
+
+    active = np.ones(len(r), dtype=bool)
+    for _ in range(max_iter):
+        Qp = np.einsum("nij,nj->ni", Q, p)
+        pQp = np.einsum("ni,ni->n", p, Qp)
+        active &= np.abs(Qp - pQp[:, None]).max(axis=1) >= eps
+        if not active.any():
+            break
+        for t in range(k):
+            diff = np.where(active, (-Qp[:, t] + pQp) / Q[:, t, t], 0.0)
+            p[:, t] += diff
+            pQp = (pQp + diff * (diff * Q[:, t, t] + 2 * Qp[:, t])) / (1 + diff) / (1 + diff)
+            Qp = (Qp + diff[:, None] * Q[:, t, :]) / (1 + diff)[:, None]
+            p /= (1 + diff)[:, None]
+    return p
+
+
+def verify(models_dir="models", data_path="data/voice.csv"):
+    """Compare against the sklearn pickles on the full dataset; returns max abs differences."""
+    import pandas as pd
+    from inference import load_models, predict_vector
+
+    models = load_models(models_dir, predictor="sklearn")
+    predictor = NumpyPredictor.from_models(models)
+    X = pd.read_csv(data_path).drop(columns=['label']).to_numpy(dtype=np.float64)
+
+    scaled, pca_features, labels, probabilities = predict_vector(models, X)
+    np_scaled, np_pca, np_labels, np_probabilities = predictor.predict_vector(X)
+    return {
+        "rows": len(X),
+        "max_abs_diff_pca": float(np.abs(np_pca - pca_features).max()),
+        "max_abs_diff_decision": float(np.abs(
+            predictor.decision_function(X) - models["final_model"].decision_function(pca_features)).max()),
+        "max_abs_diff_proba": float(np.abs(np_probabilities - probabilities).max()),
+        "label_mismatches": int((np_labels != labels).sum()),
+    }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--export-json":
+        from model_bundle import load_bundle, export_json
+        bundle = load_bundle()
+        for json_path in sys.argv[2:] or ["frontend/src/lib/models.json", "frontend/public/models.json"]:
+            export_json(bundle, json_path)
+            print(f"✅ Exported model parameters to {json_path}")
+        sys.exit(0)
+    if len(sys.argv) > 1 and sys.argv[1] == "--verify":
+        report = verify()
+        print(json.dumps(report, indent=2))
+        ok = report["label_mismatches"] == 0 and report["max_abs_diff_proba"] < 1e-9
+        print("✅ NumPy predictor matches sklearn" if ok else "❌ NumPy predictor differs from sklearn")
+        sys.exit(0 if ok else 1)
+    print("Usage: python numpy_predictor.py --verify | --export-json [paths...]")
@@ -0,0 +1,310 @@
+# realtime_stream.py
+"""
+Real-time streaming inference over incrementally computed features.
+
+A StreamSession takes raw PCM chunks as they arrive from a microphone
+(float32 or int16 little-endian, mono, any sample rate), resamples them to
+22050 Hz with a streaming soxr resampler and keeps:
+
+- a ring buffer with the last `window` seconds of audio;
+- the STFT tail: only samples not yet covered by a full frame; each chunk
+  adds its new frames (same framing as librosa.stft with center=True, the
+  stream start being zero padded);
+- sliding spectral accumulators: per-frame magnitude / entropy / flatness
+  rows for the frames of the last `window` seconds in a ring, with running
+  sums that add the new frames and subtract the evicted ones (re-summed once
+  per ring wrap to cancel float drift).
+
+Every `interval` seconds of received audio, predict() turns the
+accumulators into the 20 features (the F0 features use the vectorized YIN
+tracker on the ring buffer) and runs the model. Per-update cost is bounded:
+chunks longer than max_chunk seconds are rejected, STFT work is
+proportional to the chunk, and the window-sized work (YIN, statistics,
+model) runs at most once per chunk, however far behind the client is.
+In steady state the features approximate extract_features() on the last
+`window` seconds with pitch_method="yin".
+
+api_server.py serves sessions on the WebSocket endpoint /stream. This file
+is also a test client that streams an audio file in real time:
+
+    python realtime_stream.py temp.wav [--url ws://127.0.0.1:5001/stream] [--speed 4]
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+from startup import lazy_import
+from feature_extraction import (FEATURE_ORDER, N_FFT, HOP_LENGTH, frame_entropy_flatness,
+                                estimate_f0, spectrum_statistics, features_dict_to_vector)
+
+scipy_signal = lazy_import("scipy.signal")
+scipy_fft = lazy_import("scipy.fft")
+soxr = lazy_import("soxr")
+
+MODEL_SR = 22050
+PCM_FORMATS = {"f32le": "<f4", "s16le": "<i2"}
+DEFAULT_WINDOW = 3.0
+DEFAULT_INTERVAL = 0.5
+DEFAULT_MAX_CHUNK = 1.0
+
+
+class StreamSession:
+    """Incremental features and periodic predictions for one PCM stream."""
+
+    def __init__(self, models, input_sr=MODEL_SR, pcm_format="f32le", window=DEFAULT_WINDOW,
+                 interval=DEFAULT_INTERVAL, max_chunk=DEFAULT_MAX_CHUNK, mode="exact"):
+        if pcm_format not in PCM_FORMATS:
+            raise ValueError(f"Unknown PCM format '{pcm_format}', expected one of {tuple(PCM_FORMATS)}")
+        if not (0.5 <= window <= 10.0) or not (0.1 <= interval <= window):
+            raise ValueError("window must be 0.5-10 s and interval 0.1 s to window")
+        self.models = models
+        self.input_sr = int(input_sr)
+        self.dtype = np.dtype(PCM_FORMATS[pcm_format])
+        self.mode = mode
+        self.window = window
+        self.max_chunk_bytes = int(max_chunk * self.input_sr) * self.dtype.itemsize
+        self.resampler = (soxr.ResampleStream(self.input_sr, MODEL_SR, 1, dtype="float32")
+                          if self.input_sr != MODEL_SR else None)
+
+        # Audio ring buffer (last `window` seconds) for the F0 tracker
+        self.audio = np.zeros(int(window * MODEL_SR), dtype=np.float32)
+        self.audio_pos = 0
+        self.audio_filled = 0
+
+        # STFT state: unframed tail, starting with the center=True zero padding
+        self.stft_window = scipy_signal.get_window("hann", N_FFT, fftbins=True).astype(np.float32)
+        self.tail = np.zeros(N_FFT // 2, dtype=np.float32)
+
+        # Sliding spectral accumulators over the frames of the last `window` seconds
+        n_frames = max(1, int(window * MODEL_SR) // HOP_LENGTH)
+        self.frame_magnitude = np.zeros((n_frames, 1 + N_FFT // 2), dtype=np.float32)
+        self.frame_entropy = np.zeros(n_frames)
+        self.frame_flatness = np.zeros(n_frames)
+        self.magnitude_sum = np.zeros(1 + N_FFT // 2)
+        self.entropy_sum = 0.0
+        self.flatness_sum = 0.0
+        self.frame_pos = 0
+        self.frames_filled = 0
+
+        self.received = 0  # samples at MODEL_SR
+        self.interval_samples = int(interval * MODEL_SR)
+        self.next_update = self.interval_samples
+
+    def _decode(self, data):
+        if len(data) > self.max_chunk_bytes:
+            raise ValueError(f"Chunk too long: at most {self.max_chunk_bytes} bytes per message")
+        if len(data) % self.dtype.itemsize:
+            raise ValueError(f"Chunk length must be a multiple of {self.dtype.itemsize} bytes")
+        x = np.frombuffer(data, dtype=self.dtype)
+        if self.dtype.kind == "i":
+            x = x / np.float32(32768.0)
+        x = x.astype(np.float32, copy=False)
+        if self.resampler is not None:
+            x = self.resampler.resample_chunk(x)
+        return x
+
+    def _push_audio(self, y):
+        y = y[-len(self.audio):]
+        idx = (self.audio_pos + np.arange(len(y))) % len(self.audio)
+        self.audio[idx] = y
+        self.audio_pos = (self.audio_pos + len(y)) % len(self.audio)
+        self.audio_filled = min(self.audio_filled + len(y), len(self.audio))
+
+    def _push_frames(self, y):
+        """Frame the new samples, add their rows to the sliding accumulators."""
+        self.tail = np.concatenate([self.tail, y])
+        if len(self.tail) < N_FFT:
+            return
+        n = 1 + (len(self.tail) - N_FFT) // HOP_LENGTH
+        frames = np.lib.stride_tricks.sliding_window_view(self.tail, N_FFT)[::HOP_LENGTH][:n]
+        S = np.abs(scipy_fft.rfft(frames * self.stft_window, axis=1)).astype(np.float32, copy=False)
+        self.tail = self.tail[n * HOP_LENGTH:]
+        entropy, flatness = frame_entropy_flatness(S)
+
+        capacity = len(self.frame_entropy)
+        if n > capacity:  # only the newest frames can still be in the window
+            S, entropy, flatness = S[-capacity:], entropy[-capacity:], flatness[-capacity:]
+            n = capacity
+        idx = (self.frame_pos + np.arange(n)) % capacity
+        # Until the ring is full, slots 0..frames_filled-1 hold frames and the rest are empty
+        evicted = idx if self.frames_filled == capacity else idx[idx < self.frames_filled]
+        if len(evicted):
+            self.magnitude_sum -= self.frame_magnitude[evicted].sum(axis=0)
+            self.entropy_sum -= self.frame_entropy[evicted].sum()
+            self.flatness_sum -= self.frame_flatness[evicted].sum()
+        self.frame_magnitude[idx] = S
+        self.frame_entropy[idx] = entropy
+        self.frame_flatness[idx] = flatness
+        self.magnitude_sum += S.sum(axis=0, dtype=np.float64)
+        self.entropy_sum += float(entropy.sum())
+        self.flatness_sum += float(flatness.sum())
+        self.frames_filled = min(self.frames_filled + n, capacity)
+
+        wrapped = self.frame_pos + n >= capacity
+        self.frame_pos = (self.frame_pos + n) % capacity
+        if wrapped and self.frames_filled == capacity:
+            self.magnitude_sum = self.frame_magnitude.sum(axis=0, dtype=np.float64)
+            self.entropy_sum = float(self.frame_entropy.sum())
+            self.flatness_sum = float(self.frame_flatness.sum())
+
+    def feed(self, data):
+        """Add a PCM chunk (bytes); returns a prediction dict when an update is due, else None."""
+        y = self._decode(data)
+        if not len(y):
+            return None
+        self._push_audio(y)
+        self._push_frames(y)
+        self.received += len(y)
+        if self.received < self.next_update:
+            return None
+        # Skip updates the client has already streamed past: at most one per chunk
+        self.next_update += self.interval_samples * (1 + (self.received - self.next_update) // self.interval_samples)
+        return self.predict()
+
+    def recent_audio(self):
+        """The ring buffer contents in time order."""
+        if self.audio_filled < len(self.audio):
+            return self.audio[:self.audio_filled].copy()
+        return np.roll(self.audio, -self.audio_pos)
+
+    def features(self):
+        """The 20 features over the current window (None before the first STFT frame)."""
+        if not self.frames_filled:
+            return None
+        n = self.frames_filled
+        magnitude = (self.magnitude_sum / n).astype(np.float32)
+        f0_clean = estimate_f0(self.recent_audio(), MODEL_SR, method="yin")
+        return spectrum_statistics(magnitude, self.entropy_sum / n, self.flatness_sum / n, f0_clean, MODEL_SR)
+
+    def predict(self):
+        """Prediction over the current window, in the /predict result shape plus stream fields."""
+        from inference import predict_vector
+
+        start = time.perf_counter()
+        features = self.features()
+        if features is None:
+            return None
+        X = features_dict_to_vector(features, FEATURE_ORDER)
+        _, _, labels, probabilities = predict_vector(self.models, X, self.mode)
+        classes = self.models["label_encoder"].classes_
+        return {
+            "type": "prediction",
+            "time": round(self.received / MODEL_SR, 3),
+            "window": round(min(self.received / MODEL_SR, self.window), 3),
+            "mode": self.mode,
+            "prediction": str(labels[0]),
+            "confidence": float(max(probabilities[0])),
+            "probabilities": {str(c): float(p) for c, p in zip(classes, probabilities[0])},
+            "compute_ms": round((time.perf_counter() - start) * 1000, 3),
+        }
+
+
+def session_from_params(models, params):
+    """StreamSession from /stream query parameters; raises ValueError for bad ones (before the upgrade)."""
+    from inference import check_mode
+
+    mode = params.get("mode", "exact")
+    check_mode(models, mode)
+    try:
+        return StreamSession(
+            models,
+            input_sr=int(params.get("sr", MODEL_SR)),
+            pcm_format=params.get("format", "f32le"),
+            window=float(params.get("window", DEFAULT_WINDOW)),
+            interval=float(params.get("interval", DEFAULT_INTERVAL)),
+            mode=mode,
+        )
+    except TypeError as e:
+        raise ValueError(str(e))
+
+
+def _command(payload):
+    """The "type" of a JSON control message, or None when it is not a JSON object."""
+    try:
+        message = json.loads(payload.decode("utf-8") if payload else "{}")
+    except ValueError:  # includes UnicodeDecodeError
+        return None
+    return message.get("type") if isinstance(message, dict) else None
+
+
+def serve(ws, session):
+    """Run one WebSocket stream: binary messages are PCM, text messages are JSON control."""
+    from websocket_io import WebSocketClosed, OP_BINARY
+
+    try:
+        ws.send_text(json.dumps({"type": "ready", "model_sr": MODEL_SR, "input_sr": session.input_sr,
+                                 "max_chunk_bytes": session.max_chunk_bytes}))
+        while True:
+            opcode, payload = ws.receive()
+            if opcode == OP_BINARY:
+                try:
+                    update = session.feed(payload)
+                except ValueError as e:
+                    ws.send_text(json.dumps({"type": "error", "error": str(e)}))
+                    continue
+            else:
+                command = _command(payload)
+                if command not in ("end", "flush"):
+                    ws.send_text(json.dumps({"type": "error",
+                                             "error": 'Expected a JSON object with "type": "end" or "flush"'}))
+                    continue
+                if command == "end":
+                    final = session.predict() or {"type": "prediction", "prediction": None}
+                    final["type"] = "final"
+                    ws.send_text(json.dumps(final))
+                    ws.close()
+                    return
+                update = session.predict() if command == "flush" else None
+            if update is not None:
+                ws.send_text(json.dumps(update))
+    except (WebSocketClosed, OSError):  # the client went away (ConnectionError is an OSError)
+        return
+
+
+def stream_file(url, path, chunk_ms=100, speed=1.0, mode="exact"):
+    """Test client: send path as int16 PCM chunks at `speed` x real time and print the updates."""
+    import threading
+    from urllib.parse import urlparse
+    import soundfile as sf
+    from websocket_io import client_connect, WebSocketClosed
+
+    y, sr = sf.read(path, dtype="float32", always_2d=True)
+    pcm = (np.clip(y.mean(axis=1), -1, 1) * 32767).astype("<i2")
+    parsed = urlparse(url)
+    ws = client_connect(parsed.hostname, parsed.port or 80,
+                        f"{parsed.path or '/stream'}?sr={sr}&format=s16le&mode={mode}")
+
+    def reader():
+        try:
+            while True:
+                _, message = ws.receive()
+                print(json.dumps(json.loads(message)))
+        except (WebSocketClosed, OSError):
+            pass
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    step = int(sr * chunk_ms / 1000)
+    for start in range(0, len(pcm), step):
+        ws.send_binary(pcm[start:start + step].tobytes())
+        time.sleep(chunk_ms / 1000 / speed)
+    ws.send_text(json.dumps({"type": "end"}))
+    thread.join(10)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream an audio file to the /stream WebSocket endpoint")
+    parser.add_argument("audio_path")
+    parser.add_argument("--url", default="ws://127.0.0.1:5001/stream")
+    parser.add_argument("--chunk-ms", type=int, default=100)
+    parser.add_argument("--speed", type=float, default=1.0, help="Playback speed relative to real time")
+    parser.add_argument("--mode", choices=["exact", "fast"], default="exact")
+    args = parser.parse_args()
+    try:
+        stream_file(args.url, args.audio_path, chunk_ms=args.chunk_ms, speed=args.speed, mode=args.mode)
+    except (OSError, ConnectionError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,203 @@
+# segment_sampling.py
+"""
+Multi-segment sampling for long recordings.
+
+Instead of scoring only the first 3 seconds (extract_features_from_file) or
+every window (stream_inference.py), predict_segments() reads the duration
+from the file header, places K segments evenly across the recording (each
+centred in its 1/K of the file) and decodes only those spans: audio_io seeks
+with soundfile, or passes -ss/-t to ffmpeg for other containers. The K
+extractions run concurrently on a shared thread pool (the STFT, resampling
+and pitch tracking spend most of their time in numpy/scipy/numba code that
+releases the GIL), so the cost is about K short clips whatever the length of
+the file.
+
+The K feature vectors are combined with an element-wise median, which
+ignores a minority of unrepresentative segments (a cough, a door, a second
+speaker), and the median vector is scored once; per-segment predictions are
+reported alongside. With vad=True, segments without voice are dropped
+before aggregating.
+
+Uploads whose container does not record a duration (MediaRecorder WebM) and
+byte streams ffmpeg cannot seek in are decoded once and sliced in memory.
+
+Usage:
+    python segment_sampling.py long_call.wav --segments 5 --pitch-method yin
+"""
+
+import argparse
+import contextvars
+import io
+import json
+import os
+import sys
+import threading
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import soundfile as sf
+from audio_io import audio_duration, load_audio
+from feature_extraction import (extract_features, extract_features_from_file, features_dict_to_vector,
+                                FEATURE_ORDER, PITCH_METHODS)
+from inference import load_models, predict_vector, _prediction_fields
+from instrumentation import timed
+from voice_activity import NoVoiceDetected
+
+warnings.filterwarnings("ignore", category=UserWarning)
+warnings.filterwarnings("ignore", category=FutureWarning)
+
+DEFAULT_SEGMENTS = 5
+SEGMENT_SECONDS = 3.0
+MAX_SEGMENTS = 32
+DEFAULT_WORKERS = int(os.environ.get("VOICE_SEGMENT_WORKERS", min(DEFAULT_SEGMENTS, os.cpu_count() or 1)))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool(workers=None):
+    """Process-wide extraction pool, so concurrent requests share the same threads."""
+    global _pool
+    if workers is not None:
+        return ThreadPoolExecutor(max_workers=workers)
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=max(1, DEFAULT_WORKERS), thread_name_prefix="segment")
+        return _pool
+
+
+def segment_offsets(total, k=DEFAULT_SEGMENTS, segment=SEGMENT_SECONDS):
+    """
+    Start times of k segments of `segment` seconds spread over a total-second recording.
+
+    Each segment is centred in its 1/k stratum and clipped to the file; k is
+    reduced so segments do not overlap, down to one segment from the start
+    for recordings no longer than a segment.
+    """
+    if total <= segment:
+        return [0.0]
+    k = max(1, min(int(k), int(total // segment)))
+    centres = (np.arange(k) + 0.5) * total / k
+    starts = np.clip(centres - segment / 2, 0.0, total - segment)
+    return [round(float(s), 3) for s in starts]
+
+
+def _segment_features(source, y, sr, start, segment, pitch_method, vad):
+    """Feature dict for one segment, or None when VAD finds no voice in it."""
+    try:
+        if y is None:
+            return extract_features_from_file(source, sr=sr, duration=segment, offset=start,
+                                              pitch_method=pitch_method, vad=vad)
+        return extract_features(y[int(start * sr):int((start + segment) * sr)], sr,
+                                pitch_method=pitch_method, vad=vad)
+    except NoVoiceDetected:
+        return None
+
+
+def _plan(source):
+    """(duration in seconds or None, whether segment reads can seek) for a path or bytes."""
+    if isinstance(source, (str, os.PathLike)):
+        return audio_duration(source), True
+    try:
+        info = sf.info(io.BytesIO(bytes(source)))
+        return info.frames / info.samplerate, True
+    except RuntimeError:
+        return None, False  # ffmpeg would decode a pipe from the start for every segment
+
+
+def predict_segments(models, source, segments=DEFAULT_SEGMENTS, segment=SEGMENT_SECONDS, sr=22050,
+                     pitch_method="pyin", mode="exact", vad=False, workers=None):
+    """
+    Predict from `segments` clips spread across source (path or bytes); JSON shape of predict_audio_file.
+
+    Adds "segments" (start/end, prediction and confidence per clip, or
+    voice_detected=False), "segment_votes", "aggregate" and "duration".
+    workers=None uses the shared pool (DEFAULT_WORKERS threads).
+    """
+    if isinstance(source, str) and not os.path.exists(source):
+        raise Exception(f"Audio file not found: {source}")
+    segments = max(1, min(int(segments), MAX_SEGMENTS))
+
+    y = None
+    with timed("probe"):
+        total, seekable = _plan(source)
+    if total is None or not seekable:
+        y, _ = load_audio(source, sr=sr)
+        total = len(y) / sr
+    starts = segment_offsets(total, segments, segment)
+
+    pool = _get_pool(workers)
+    try:
+        # copy_context() carries the request timer into the pool threads
+        futures = [pool.submit(contextvars.copy_context().run, _segment_features, source, y, sr, start,
+                               segment, pitch_method, vad)
+                   for start in starts]
+        features = [f.result() for f in futures]
+    finally:
+        if workers is not None:
+            pool.shutdown()
+
+    report = [{"start": start, "end": round(min(start + segment, total), 3)} for start in starts]
+    voiced = [i for i, f in enumerate(features) if f is not None]
+    if not voiced:
+        return {
+            "success": True,
+            "voice_detected": False,
+            "prediction": None,
+            "confidence": None,
+            "message": "No voice detected",
+            "duration": round(total, 3),
+            "segments": [dict(r, voice_detected=False) for r in report],
+        }
+
+    X = np.vstack([features_dict_to_vector(features[i], FEATURE_ORDER) for i in voiced])
+    median = np.median(X, axis=0, keepdims=True)
+    result, features_scaled, features_pca = _prediction_fields(models, median, mode)
+    _, _, labels, probabilities = predict_vector(models, X, mode)
+    for i, label, probs in zip(voiced, labels, probabilities):
+        report[i].update(prediction=str(label), confidence=float(max(probs)))
+    for i in set(range(len(report))) - set(voiced):
+        report[i]["voice_detected"] = False
+
+    classes = list(models["label_encoder"].classes_)
+    result.update({
+        "aggregate": "median",
+        "duration": round(total, 3),
+        "segment_votes": {str(c): int(sum(1 for label in labels if label == c)) for c in classes},
+        "segments": report,
+        "extracted_features": {name: float(v) for name, v in zip(FEATURE_ORDER, median[0])},
+        "scaled_features": features_scaled.tolist()[0],
+        "pca_features": features_pca.tolist()[0],
+    })
+    if vad:
+        result["voice_detected"] = True
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Predict from K segments sampled across a recording")
+    parser.add_argument("audio_path")
+    parser.add_argument("--segments", type=int, default=DEFAULT_SEGMENTS, help="Number of segments (K)")
+    parser.add_argument("--segment", type=float, default=SEGMENT_SECONDS, help="Segment length in seconds")
+    parser.add_argument("--workers", type=int, default=None, help="Extraction threads")
+    parser.add_argument("--pitch-method", choices=PITCH_METHODS, default="pyin")
+    parser.add_argument("--mode", choices=("exact", "fast"), default="exact")
+    parser.add_argument("--vad", action="store_true", help="Drop segments without voice")
+    args = parser.parse_args()
+
+    try:
+        start = time.perf_counter()
+        result = predict_segments(load_models(), args.audio_path, segments=args.segments, segment=args.segment,
+                                  pitch_method=args.pitch_method, mode=args.mode, vad=args.vad,
+                                  workers=args.workers)
+        result["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    except Exception as e:
+        print(json.dumps({"success": False, "error": str(e)}))
+        sys.exit(1)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+# stream_inference.py
+"""
+Streaming sliding-window inference for long recordings.
+
+extract_features_from_file only looks at the first 3 seconds of a file. This
+module reads the file block by block with soundfile, keeps at most one
+analysis window of audio in memory, computes the 20 features per window
+(window/hop configurable) and runs scaler -> PCA -> model on batches of
+windows. It yields a per-window timeline plus an aggregated verdict, with
+memory bounded by the window size regardless of file length.
+
+Usage:
+    python stream_inference.py long_call.wav --window 3 --hop 1.5
+"""
+
+import argparse
+import json
+import os
+import sys
+import warnings
+
+import numpy as np
+import soundfile as sf
+from startup import lazy_import
+from feature_extraction import extract_features_batch, PITCH_METHODS
+from inference import load_models, predict_vector, convert_webm_to_wav
+
+warnings.filterwarnings("ignore", category=UserWarning)
+warnings.filterwarnings("ignore", category=FutureWarning)
+
+librosa = lazy_import("librosa")
+
+
+def iter_windows(path, sr=22050, window=3.0, hop=1.5, block_size=65536):
+    """
+    Yield (start_seconds, y) analysis windows resampled to sr.
+
+    Audio is read in native-rate blocks; only the samples of the current
+    window are buffered. A shorter final window covers any tail left after
+    the last full window.
+    """
+    with sf.SoundFile(path) as f:
+        native_sr = f.samplerate
+        win = int(round(window * native_sr))
+        step = int(round(hop * native_sr))
+        if win <= 0 or step <= 0:
+            raise ValueError("window and hop must be positive")
+
+        buffer = np.zeros(0, dtype=np.float32)
+        buffer_start = 0  # absolute native-rate index of buffer[0]
+        covered_until = 0
+        skip = 0  # samples still to discard before buffer_start (hop > window spans blocks)
+
+        for block in f.blocks(blocksize=block_size, dtype='float32', always_2d=True):
+            samples = block.mean(axis=1)
+            if skip:
+                dropped = min(skip, len(samples))
+                samples = samples[dropped:]
+                skip -= dropped
+            buffer = np.concatenate([buffer, samples])
+            while len(buffer) >= win:
+                y = librosa.resample(buffer[:win], orig_sr=native_sr, target_sr=sr) if native_sr != sr else buffer[:win]
+                yield buffer_start / native_sr, y
+                covered_until = buffer_start + win
+                drop = min(step, len(buffer))
+                buffer = buffer[drop:]
+                buffer_start += step
+                skip = step - drop
+
+        if len(buffer) and buffer_start + len(buffer) > covered_until:
+            y = librosa.resample(buffer, orig_sr=native_sr, target_sr=sr) if native_sr != sr else buffer
+            yield buffer_start / native_sr, y
+
+
+def stream_predict(models, path, sr=22050, window=3.0, hop=1.5, batch_size=32, pitch_method="pyin", mode="exact"):
+    """Yield one timeline entry per window; predictions run on batches of batch_size windows."""
+    label_encoder = models["label_encoder"]
+    pending = []
+
+    def run_batch():
+        # Equal-length windows: one stacked STFT / statistics pass for the whole batch
+        X = extract_features_batch([y for _, _, y in pending], sr=sr, pitch_method=pitch_method)
+        _, _, pred_labels, probabilities = predict_vector(models, X, mode)
+        for (start, length, _), label, probs in zip(pending, pred_labels, probabilities):
+            yield {
+                "start": round(start, 3),
+                "end": round(start + length, 3),
+                "prediction": label,
+                "confidence": float(max(probs)),
+                "probabilities": {
+                    label_encoder.classes_[i]: float(probs[i])
+                    for i in range(len(label_encoder.classes_))
+                },
+            }
+        pending.clear()
+
+    for start, y in iter_windows(path, sr=sr, window=window, hop=hop):
+        pending.append((start, len(y) / sr, y))
+        if len(pending) >= batch_size:
+            yield from run_batch()
+    if pending:
+        yield from run_batch()
+
+
+def predict_long_file(models, path, sr=22050, window=3.0, hop=1.5, batch_size=32, pitch_method="pyin",
+                      mode="exact"):
+    """
+    Score a whole recording window by window.
+
+    The verdict averages per-window class probabilities (weighted by window
+    length); the timeline lists every window's prediction.
+    """
+    classes = list(models["label_encoder"].classes_)
+    prob_sum = np.zeros(len(classes))
+    total = 0.0
+    timeline = []
+
+    # soundfile cannot decode WebM; convert browser recordings first
+    processed_path = convert_webm_to_wav(path) if path.lower().endswith('.webm') else path
+    try:
+        for entry in stream_predict(models, processed_path, sr=sr, window=window, hop=hop,
+                                    batch_size=batch_size, pitch_method=pitch_method, mode=mode):
+            weight = entry["end"] - entry["start"]
+            prob_sum += weight * np.array([entry["probabilities"][c] for c in classes])
+            total += weight
+            timeline.append(entry)
+    finally:
+        if processed_path != path:
+            os.unlink(processed_path)
+
+    if not timeline:
+        raise Exception(f"No audio could be read from: {path}")
+
+    probabilities = prob_sum / total
+    best = int(np.argmax(probabilities))
+    votes = {c: sum(1 for e in timeline if e["prediction"] == c) for c in classes}
+    return {
+        "success": True,
+        "mode": mode,
+        "prediction": classes[best],
+        "confidence": float(probabilities[best]),
+        "probabilities": {c: float(p) for c, p in zip(classes, probabilities)},
+        "window_votes": votes,
+        "n_windows": len(timeline),
+        "window": window,
+        "hop": hop,
+        "timeline": timeline,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sliding-window prediction over a long recording")
+    parser.add_argument("audio_path")
+    parser.add_argument("--window", type=float, default=3.0, help="Window length in seconds")
+    parser.add_argument("--hop", type=float, default=1.5, help="Hop between windows in seconds")
+    parser.add_argument("--batch-size", type=int, default=32, help="Windows per model call")
+    parser.add_argument("--pitch-method", choices=PITCH_METHODS, default="pyin")
+    args = parser.parse_args()
+
+    try:
+        result = predict_long_file(load_models(), args.audio_path, window=args.window, hop=args.hop,
+                                   batch_size=args.batch_size, pitch_method=args.pitch_method)
+    except Exception as e:
+        print(json.dumps({"success": False, "error": str(e)}))
+        sys.exit(1)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+# tests/conftest.py
+"""
+Shared pytest setup: the modules live at the repository root.
+
+Run from the repository root with:
+    python -m pytest -q
+"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+os.environ.setdefault("VOICE_FEATURE_CACHE", "0")
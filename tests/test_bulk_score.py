@@ -0,0 +1,196 @@
+# tests/test_bulk_score.py
+"""bulk_score input formats, schema checks and the streamed POST /score output."""
+
+import http.client
+import io
+import json
+import os
+import threading
+from http.server import ThreadingHTTPServer
+
+import numpy as np
+import pytest
+
+from conftest import ROOT
+from bulk_score import BulkInputError, read_rows, score_stream
+from feature_extraction import FEATURE_ORDER
+from inference import load_models, predict_vector
+
+MODELS_DIR = os.path.join(ROOT, "models")
+DATA_PATH = os.path.join(ROOT, "data", "voice.csv")
+N_ROWS = 50
+
+needs_models = pytest.mark.skipif(
+    not os.path.exists(os.path.join(MODELS_DIR, "final_model.pkl")) or not os.path.exists(DATA_PATH),
+    reason="needs trained models (python train.py) and data/voice.csv")
+
+
+@pytest.fixture(scope="module")
+def frame():
+    pd = pytest.importorskip("pandas")
+    if not os.path.exists(DATA_PATH):
+        pytest.skip("needs data/voice.csv")
+    return pd.read_csv(DATA_PATH).head(N_ROWS)
+
+
+@pytest.fixture(scope="module")
+def rows(frame):
+    return frame[FEATURE_ORDER].to_numpy(dtype=np.float64)
+
+
+@pytest.fixture(scope="module")
+def models():
+    return load_models(MODELS_DIR, predictor="sklearn")
+
+
+def _csv(frame, columns=None):
+    return frame[columns or list(frame.columns)].to_csv(index=False).encode()
+
+
+def _npy(X):
+    buffer = io.BytesIO()
+    np.save(buffer, X)
+    return buffer.getvalue()
+
+
+def _read_all(source, fmt, chunk_rows=16):
+    return np.vstack(list(read_rows(source, fmt, chunk_rows)))
+
+
+# ----------------------------------------------------------------------------
+# Input formats
+# ----------------------------------------------------------------------------
+
+def test_csv_any_column_order(frame, rows):
+    # "label" is an extra non-feature column and is ignored
+    shuffled = list(reversed(frame.columns))
+    np.testing.assert_array_equal(_read_all(_csv(frame, shuffled), "csv"), rows)
+
+
+def test_npy(rows, tmp_path):
+    np.testing.assert_array_equal(_read_all(_npy(rows), "npy"), rows)
+    path = tmp_path / "rows.npy"
+    np.save(path, rows)
+    np.testing.assert_array_equal(_read_all(str(path), "npy"), rows)  # memory-mapped
+
+
+def test_json_lists_and_objects(frame, rows):
+    lists = json.dumps(rows.tolist()).encode()
+    objects = json.dumps({"rows": frame[FEATURE_ORDER].to_dict(orient="records")}).encode()
+    np.testing.assert_array_equal(_read_all(lists, "json"), rows)
+    np.testing.assert_array_equal(_read_all(objects, "json"), rows)
+
+
+# ----------------------------------------------------------------------------
+# Schema checks
+# ----------------------------------------------------------------------------
+
+def test_csv_missing_column(frame):
+    with pytest.raises(BulkInputError, match="Missing columns"):
+        _read_all(_csv(frame, [c for c in frame.columns if c != "meanfun"]), "csv")
+
+
+def test_json_object_missing_column(frame):
+    records = frame[FEATURE_ORDER].drop(columns=["IQR"]).to_dict(orient="records")
+    with pytest.raises(BulkInputError, match="missing columns"):
+        _read_all(json.dumps(records).encode(), "json")
+
+
+@pytest.mark.parametrize("width", [len(FEATURE_ORDER) - 1, len(FEATURE_ORDER) + 1])
+def test_wrong_number_of_columns(rows, width):
+    X = np.resize(rows, (len(rows), width))
+    with pytest.raises(BulkInputError):
+        _read_all(_npy(X), "npy")
+    with pytest.raises(BulkInputError):
+        _read_all(json.dumps(X.tolist()).encode(), "json")
+
+
+def test_non_finite_and_non_numeric(rows):
+    X = rows.copy()
+    X[3, 2] = np.nan
+    with pytest.raises(BulkInputError, match="Row 3"):
+        _read_all(_npy(X), "npy")
+    bad = rows.tolist()
+    bad[1][0] = "abc"
+    with pytest.raises(BulkInputError):
+        _read_all(json.dumps(bad).encode(), "json")
+
+
+# ----------------------------------------------------------------------------
+# Scored output
+# ----------------------------------------------------------------------------
+
+def _parse_csv(text, classes):
+    lines = text.splitlines()
+    assert lines[0] == "row,prediction,confidence," + ",".join(f"prob_{c}" for c in classes)
+    fields = [line.split(",") for line in lines[1:]]
+    return [int(f[0]) for f in fields], [f[1] for f in fields], np.array([[float(v) for v in f[3:]] for f in fields])
+
+
+@needs_models
+def test_score_stream_matches_predict_vector(models, frame, rows):
+    classes = [str(c) for c in models["label_encoder"].classes_]
+    _, _, labels, probabilities = predict_vector(models, rows)
+    text = "".join(score_stream(models, _csv(frame), "csv", chunk_rows=16))
+    index, predicted, probs = _parse_csv(text, classes)
+    assert index == list(range(N_ROWS))
+    assert predicted == [str(label) for label in labels]
+    np.testing.assert_allclose(probs, probabilities, atol=1e-6)
+
+    ndjson = "".join(score_stream(models, _npy(rows), "npy", output="ndjson", chunk_rows=7))
+    records = [json.loads(line) for line in ndjson.splitlines()]
+    assert [r["row"] for r in records] == list(range(N_ROWS))
+    assert [r["prediction"] for r in records] == predicted
+
+
+@needs_models
+def test_score_stream_raises_before_output(models, frame):
+    stream = score_stream(models, _csv(frame, [c for c in frame.columns if c != "sd"]), "csv")
+    with pytest.raises(BulkInputError):
+        next(stream)
+
+
+@pytest.fixture(scope="module")
+def server(models):
+    import api_server
+    api_server.MODELS = models
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), api_server.InferenceHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd.server_address
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _post(address, path, body, content_type):
+    conn = http.client.HTTPConnection(*address, timeout=30)
+    try:
+        conn.request("POST", path, body, {"Content-Type": content_type})
+        response = conn.getresponse()
+        return response.status, response.getheader("Content-Type"), response.read()
+    finally:
+        conn.close()
+
+
+@needs_models
+def test_score_endpoint_streams_csv(server, models, frame, rows):
+    classes = [str(c) for c in models["label_encoder"].classes_]
+    status, content_type, body = _post(server, "/score", _csv(frame), "text/csv")
+    assert status == 200 and content_type == "text/csv"
+    index, predicted, probs = _parse_csv(body.decode(), classes)
+    _, _, labels, probabilities = predict_vector(models, rows)
+    assert index == list(range(N_ROWS))
+    assert predicted == [str(label) for label in labels]
+    np.testing.assert_allclose(probs, probabilities, atol=1e-6)
+
+
+@needs_models
+def test_score_endpoint_ndjson_and_errors(server, rows):
+    status, content_type, body = _post(server, "/score?output=ndjson", _npy(rows), "application/x-npy")
+    assert status == 200 and content_type == "application/x-ndjson"
+    assert len(body.decode().splitlines()) == N_ROWS
+
+    status, _, body = _post(server, "/score", _npy(rows[:, :-1]), "application/x-npy")
+    assert status == 400 and not json.loads(body)["success"]
+    status, _, body = _post(server, "/score?mode=bogus", _npy(rows), "application/x-npy")
+    assert status == 400
@@ -0,0 +1,58 @@
+# tests/test_numpy_predictor.py
+"""NumpyPredictor must reproduce the sklearn pipeline's labels and probabilities."""
+
+import os
+
+import numpy as np
+import pytest
+
+from conftest import ROOT
+from inference import load_models, predict_vector
+
+MODELS_DIR = os.path.join(ROOT, "models")
+DATA_PATH = os.path.join(ROOT, "data", "voice.csv")
+
+pytestmark = pytest.mark.skipif(
+    not all(os.path.exists(os.path.join(MODELS_DIR, name))
+            for name in ("scaler.pkl", "pca.pkl", "final_model.pkl", "label_encoder.pkl"))
+    or not os.path.exists(DATA_PATH),
+    reason="needs trained models (python train.py) and data/voice.csv")
+
+
+@pytest.fixture(scope="module")
+def sklearn_models():
+    return load_models(MODELS_DIR, predictor="sklearn")
+
+
+@pytest.fixture(scope="module")
+def rows():
+    pd = pytest.importorskip("pandas")
+    return pd.read_csv(DATA_PATH).drop(columns=["label"]).to_numpy(dtype=np.float64)
+
+
+def _check_matches(expected, actual):
+    _, pca, labels, probabilities = expected
+    _, np_pca, np_labels, np_probabilities = actual
+    np.testing.assert_allclose(np_pca, pca, rtol=0, atol=1e-9)
+    np.testing.assert_allclose(np_probabilities, probabilities, rtol=0, atol=1e-9)
+    assert (np.asarray(np_labels) == np.asarray(labels)).all()
+
+
+def test_from_models_matches_sklearn(sklearn_models, rows):
+    from numpy_predictor import NumpyPredictor
+    predictor = NumpyPredictor.from_models(sklearn_models)
+    _check_matches(predict_vector(sklearn_models, rows), predictor.predict_vector(rows))
+
+
+def test_bundle_matches_sklearn(sklearn_models, rows):
+    if not os.path.exists(os.path.join(MODELS_DIR, "model_bundle.bin")):
+        pytest.skip("no model_bundle.bin")
+    numpy_models = load_models(MODELS_DIR, predictor="numpy")
+    assert "predictor" in numpy_models
+    _check_matches(predict_vector(sklearn_models, rows), predict_vector(numpy_models, rows))
+
+
+def test_single_row(sklearn_models, rows):
+    from numpy_predictor import NumpyPredictor
+    predictor = NumpyPredictor.from_models(sklearn_models)
+    _check_matches(predict_vector(sklearn_models, rows[:1]), predictor.predict_vector(rows[:1]))
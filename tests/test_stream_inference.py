@@ -0,0 +1,40 @@
+# tests/test_stream_inference.py
+"""iter_windows must place windows every hop seconds whatever the block size."""
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from stream_inference import iter_windows
+
+SR = 8000
+
+
+@pytest.fixture(scope="module")
+def recording(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("audio") / "long.wav")
+    # A ramp makes every sample distinct, so misplaced windows show up in the contents too
+    y = (np.arange(30 * SR) % 20000 / 20000.0 - 0.5).astype(np.float32)
+    sf.write(path, y, SR, subtype="FLOAT")
+    return path, y
+
+
+@pytest.mark.parametrize("block_size", [1000, 4096, 65536])
+@pytest.mark.parametrize("window, hop", [(1.0, 4.0), (3.0, 1.5), (2.0, 2.0), (0.5, 7.3)])
+def test_window_starts_and_contents(recording, block_size, window, hop):
+    path, y = recording
+    windows = list(iter_windows(path, sr=SR, window=window, hop=hop, block_size=block_size))
+    win, step = int(round(window * SR)), int(round(hop * SR))
+    full = [i * step for i in range((len(y) - win) // step + 1)]
+    assert [round(start * SR) for start, _ in windows[:len(full)]] == full
+    for start, chunk in windows[:len(full)]:
+        i = int(round(start * SR))
+        np.testing.assert_array_equal(chunk, y[i:i + win])
+    # At most one shorter tail window, and only over samples no full window covered
+    tail = windows[len(full):]
+    assert len(tail) <= 1
+    if tail:
+        start, chunk = tail[0]
+        i = int(round(start * SR))
+        assert i == full[-1] + step and len(chunk) < win
+        np.testing.assert_array_equal(chunk, y[i:])
@@ -0,0 +1,102 @@
+# tests/test_websocket_io.py
+"""WebSocket frame encoding and decoding round trips over in-memory streams."""
+
+import io
+import struct
+
+import pytest
+
+from websocket_io import (WebSocket, WebSocketClosed, accept_key, OP_BINARY, OP_CONTINUATION, OP_PING, OP_PONG,
+                          OP_TEXT, MESSAGE_TOO_BIG, NORMAL_CLOSURE, PROTOCOL_ERROR)
+
+
+def _pair(max_message=1 << 20):
+    """A masking client writing into a buffer and a server reading the same bytes."""
+    wire = io.BytesIO()
+    client = WebSocket(io.BytesIO(), wire, mask=True)
+    return wire, client, lambda: WebSocket(io.BytesIO(wire.getvalue()), io.BytesIO(), mask=False,
+                                           max_message=max_message)
+
+
+def _frame(opcode, payload, fin=True):
+    """An unmasked frame built by hand (payloads under 126 bytes)."""
+    return bytes([(0x80 if fin else 0) | opcode, len(payload)]) + payload
+
+
+def test_accept_key():
+    # Example from RFC 6455, section 1.3
+    assert accept_key("dGhlIHNhbXBsZSBub25jZQ==") == "s3pPLMBiTxaQ9kYGzzhZRbK+xOo="
+
+
+@pytest.mark.parametrize("size", [0, 5, 125, 126, 65535, 65536, 200000])
+def test_binary_round_trip(size):
+    wire, client, server = _pair()
+    data = bytes(range(256)) * (size // 256) + bytes(range(size % 256))
+    client.send_binary(data)
+    raw = wire.getvalue()
+    assert raw[0] == 0x80 | OP_BINARY
+    assert raw[1] & 0x80  # client frames are masked
+    assert server().receive() == (OP_BINARY, data)
+
+
+def test_text_round_trip_and_unmasked_server_frames():
+    out = io.BytesIO()
+    server = WebSocket(io.BytesIO(), out, mask=False)
+    server.send_text('{"type": "ready"}')
+    raw = out.getvalue()
+    assert raw[1] & 0x80 == 0
+    assert raw[2:] == b'{"type": "ready"}'
+    client = WebSocket(io.BytesIO(raw), io.BytesIO(), mask=True)
+    assert client.receive() == (OP_TEXT, b'{"type": "ready"}')
+
+
+def test_several_messages_in_order():
+    wire, client, server = _pair()
+    client.send_text("one")
+    client.send_binary(b"\x00\x01")
+    client.send_text("three")
+    ws = server()
+    assert [ws.receive() for _ in range(3)] == [(OP_TEXT, b"one"), (OP_BINARY, b"\x00\x01"), (OP_TEXT, b"three")]
+
+
+def test_fragmented_message_with_interleaved_ping():
+    raw = (_frame(OP_TEXT, b"hel", fin=False) + _frame(OP_PING, b"p")
+           + _frame(OP_CONTINUATION, b"lo ", fin=False) + _frame(OP_CONTINUATION, b"world"))
+    out = io.BytesIO()
+    ws = WebSocket(io.BytesIO(raw), out, mask=False)
+    assert ws.receive() == (OP_TEXT, b"hello world")
+    assert out.getvalue() == _frame(OP_PONG, b"p")
+
+
+def test_close_frame():
+    wire, client, server = _pair()
+    client.close(NORMAL_CLOSURE, "bye")
+    with pytest.raises(WebSocketClosed) as closed:
+        server().receive()
+    assert closed.value.code == NORMAL_CLOSURE
+    assert closed.value.reason == "bye"
+
+
+def test_unexpected_continuation_is_a_protocol_error():
+    out = io.BytesIO()
+    ws = WebSocket(io.BytesIO(_frame(OP_CONTINUATION, b"x")), out, mask=False)
+    with pytest.raises(WebSocketClosed) as closed:
+        ws.receive()
+    assert closed.value.code == PROTOCOL_ERROR
+    assert struct.unpack("!H", out.getvalue()[2:4])[0] == PROTOCOL_ERROR
+
+
+def test_message_too_big():
+    wire, client, server = _pair(max_message=1000)
+    client.send_binary(b"x" * 1001)
+    with pytest.raises(WebSocketClosed) as closed:
+        server().receive()
+    assert closed.value.code == MESSAGE_TOO_BIG
+
+
+def test_dropped_connection():
+    wire, client, server = _pair()
+    client.send_binary(b"x" * 300)
+    truncated = WebSocket(io.BytesIO(wire.getvalue()[:-10]), io.BytesIO(), mask=False)
+    with pytest.raises(WebSocketClosed):
+        truncated.receive()
@@ -1,8 +1,12 @@
 # train.py
 import os
-import pandas as pd
+import argparse
+import threading
+import time
+from contextlib import contextmanager
 import numpy as np
-from sklearn.model_selection import train_test_split, StratifiedKFold, cross_val_score
+from sklearn.base import clone
+from sklearn.model_selection import StratifiedKFold
 from sklearn.preprocessing import StandardScaler, LabelEncoder
 from sklearn.decomposition import PCA
 from sklearn.svm import SVC
@@ -10,10 +14,63 @@ from sklearn.ensemble import RandomForestClassifier
 from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import (classification_report, confusion_matrix, 
                              accuracy_score, f1_score, precision_score, recall_score)
-import seaborn as sns
-import matplotlib.pyplot as plt
 import joblib
+from joblib import Parallel, delayed
 from tabulate import tabulate  # for clean console tables
+from metrics_store import (compute_fingerprint, classification_metrics, cv_metrics, select_best_model,
+                           save_metrics, METRICS_PATH)
+from hyperparam_search import successive_halving_search, save_search, SEARCH_CONFIG_FILE
+from model_bundle import save_bundle, BUNDLE_PATH
+from fast_model import fit_fast_model, evaluate_fast_model, DEFAULT_COMPONENTS
+from dataset_cache import load_dataset, projection_key
+
+parser = argparse.ArgumentParser(description="Train and evaluate the voice gender models")
+parser.add_argument("--n-jobs", type=int, default=-1, help="Parallel model x fold jobs (-1 = all cores)")
+parser.add_argument("--no-plots", action="store_true", help="Skip confusion matrix PNGs")
+parser.add_argument("--search", action="store_true",
+                    help="Pick the model, its hyperparameters and the PCA variance by successive-halving search")
+parser.add_argument("--time-budget", type=float, default=120.0, help="Search time budget in seconds")
+parser.add_argument("--fast-components", type=int, default=DEFAULT_COMPONENTS,
+                    help="Landmarks of the fast approximate model (0 = don't fit one)")
+args = parser.parse_args()
+
+# ----------------------------
+# Stage timing
+# ----------------------------
+stage_times = []
+
+@contextmanager
+def stage(name):
+    start = time.perf_counter()
+    yield
+    stage_times.append([name, time.perf_counter() - start])
+
+def fit_and_score(model, X, y, train_idx, val_idx):
+    """One CV job: fit a fresh clone on the fold and return its macro F1."""
+    fold_model = clone(model).fit(X[train_idx], y[train_idx])
+    return f1_score(y[val_idx], fold_model.predict(X[val_idx]), average='macro')
+
+def fit_full(model, X, y):
+    """Fit a fresh clone on the whole training split (reused for test eval and saving)."""
+    return clone(model).fit(X, y)
+
+def plot_confusion_matrices(matrices, class_names, out_dir):
+    """Render confusion matrix PNGs; runs in a background thread off the critical path."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    for name, cm in matrices.items():
+        fig = plt.figure(figsize=(4,3))
+        sns.heatmap(cm, annot=True, fmt='d', xticklabels=class_names, yticklabels=class_names)
+        plt.xlabel("Predicted")
+        plt.ylabel("True")
+        plt.title(f"Confusion Matrix - {name}")
+        plt.tight_layout()
+        fig.savefig(os.path.join(out_dir, f"cm_{name.replace(' ', '_')}.png"))
+        plt.close(fig)
+
+train_start = time.perf_counter()
 
 # ----------------------------
 # 0. Paths
@@ -25,39 +82,61 @@ os.makedirs(MODELS_DIR, exist_ok=True)
 # ----------------------------
 # 1. Load dataset
 # ----------------------------
-df = pd.read_csv(DATA_PATH)
-print(f"✅ Dataset loaded: {df.shape[0]} samples, {df.shape[1]} features")
-
-# Target column = 'label' (male/female)
-X = df.drop(columns=['label'])
-y = df['label']
+# Memory-mapped columnar copy of the CSV, converted once per CSV version (dataset_cache.py)
+with stage("Load dataset"):
+    dataset = load_dataset(DATA_PATH)
+print(f"✅ Dataset loaded: {dataset.X.shape[0]} samples, {dataset.X.shape[1] + 1} features")
 
-# Encode labels (female=0, male=1)
+# Target column = 'label' (male/female), already encoded in sorted class order (female=0, male=1)
 le = LabelEncoder()
-y_enc = le.fit_transform(y)
+le.fit(dataset.classes)
 print("🔠 Label encoding:", dict(zip(le.classes_, le.transform(le.classes_))))
 
 # ----------------------------
 # 2. Train-test split (Stratified)
 # ----------------------------
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y_enc, test_size=0.2, random_state=42, stratify=y_enc
-)
+# Persisted with the dataset; same indices as train_test_split(test_size=0.2, random_state=42, stratify=y)
+with stage("Train-test split"):
+    split = dataset.split(test_size=0.2, random_state=42)
+X_train, X_test, y_train, y_test = split.arrays()
 print("📊 Train size:", X_train.shape, " Test size:", X_test.shape)
 
+# ----------------------------
+# 2b. Optional hyperparameter search (leak-free, on raw training features)
+# ----------------------------
+search_result = None
+pca_variance = 0.95
+if args.search:
+    print(f"\n🔎 Successive-halving search (budget {args.time_budget:.0f}s)...\n")
+    with stage("Hyperparameter search"):
+        search_result = successive_halving_search(X_train, y_train, time_budget=args.time_budget,
+                                                  n_jobs=args.n_jobs)
+    pca_variance = search_result["pca_variance"]
+    print(f"🏅 Search winner: {search_result['model']} {search_result['params']} "
+          f"(CV F1 = {search_result['cv_mean_f1']:.4f}, {search_result['elapsed_seconds']:.1f}s)")
+
 # ----------------------------
 # 3. Feature scaling + PCA
 # ----------------------------
-scaler = StandardScaler()
-X_train_scaled = scaler.fit_transform(X_train)
-X_test_scaled = scaler.transform(X_test)
-joblib.dump(scaler, os.path.join(MODELS_DIR, "scaler.pkl"))
+with stage("Scaling + PCA"):
+    scaler = StandardScaler()
+    X_train_scaled = scaler.fit_transform(X_train)
+    X_test_scaled = scaler.transform(X_test)
+    joblib.dump(scaler, os.path.join(MODELS_DIR, "scaler.pkl"))
+
+    # PCA to retain 95% variance (or the variance picked by the search)
+    pca = PCA(n_components=pca_variance, random_state=42)
+    X_train_pca = pca.fit_transform(X_train_scaled)
+    X_test_pca = pca.transform(X_test_scaled)
+    joblib.dump(pca, os.path.join(MODELS_DIR, "pca.pkl"))
 
-# PCA to retain 95% variance
-pca = PCA(n_components=0.95, random_state=42)
-X_train_pca = pca.fit_transform(X_train_scaled)
-X_test_pca = pca.transform(X_test_scaled)
-joblib.dump(pca, os.path.join(MODELS_DIR, "pca.pkl"))
+    # Store the projections for get_model_metrics.py; continue on the memory-mapped copies
+    projected = split.save_projections(
+        projection_key(os.path.join(MODELS_DIR, "scaler.pkl"), os.path.join(MODELS_DIR, "pca.pkl")),
+        X_train_scaled=X_train_scaled, X_test_scaled=X_test_scaled,
+        X_train_pca=X_train_pca, X_test_pca=X_test_pca
+    )
+    X_train_pca, X_test_pca = projected["X_train_pca"], projected["X_test_pca"]
 print(f"📉 PCA reduced features: {pca.n_components_} (explains {pca.explained_variance_ratio_.sum():.2f} variance)")
 
 # ----------------------------
@@ -70,16 +149,34 @@ models = {
     "SVM (RBF)": SVC(kernel='rbf', probability=True, random_state=42),
     "Random Forest": RandomForestClassifier(n_estimators=200, random_state=42)
 }
+if search_result is not None:
+    models = {search_result["model"]: search_result["classifier"]}
 
 # ----------------------------
-# 5. Stratified K-Fold Cross-validation
+# 5. Cross-validation + full fits, in parallel
 # ----------------------------
+# Every model x fold job and every full-training-set fit is independent, so
+# they all go into one parallel batch. The full fits are reused below for
+# test evaluation and for saving the winner - nothing is refit.
 cv = StratifiedKFold(n_splits=5, shuffle=True, random_state=42)
+folds = list(cv.split(X_train_pca, y_train))
 results = []
+cv_scores_by_model = {}
+
+print(f"\n🔍 Running 5-Fold Stratified Cross-Validation and full fits on PCA features ({args.n_jobs} jobs)...\n")
+with stage("Cross-validation + fits (parallel)"):
+    cv_jobs = [(name, model, train_idx, val_idx) for name, model in models.items() for train_idx, val_idx in folds]
+    outputs = Parallel(n_jobs=args.n_jobs)(
+        [delayed(fit_and_score)(model, X_train_pca, y_train, train_idx, val_idx)
+         for _, model, train_idx, val_idx in cv_jobs] +
+        [delayed(fit_full)(model, X_train_pca, y_train) for model in models.values()]
+    )
+    fold_scores, fitted_models = outputs[:len(cv_jobs)], outputs[len(cv_jobs):]
+    fitted_models = dict(zip(models.keys(), fitted_models))
 
-print("\n🔍 Running 5-Fold Stratified Cross-Validation on PCA features...\n")
-for name, model in models.items():
-    cv_scores = cross_val_score(model, X_train_pca, y_train, cv=cv, scoring='f1_macro')
+for name in models:
+    cv_scores = np.array([score for (job_name, *_), score in zip(cv_jobs, fold_scores) if job_name == name])
+    cv_scores_by_model[name] = cv_scores
     results.append({
         "Model": name,
         "CV Mean F1": np.mean(cv_scores),
@@ -88,38 +185,41 @@ for name, model in models.items():
     print(f"{name:<20} | Mean F1 = {np.mean(cv_scores):.4f} | Std = {np.std(cv_scores):.4f}")
 
 # ----------------------------
-# 6. Train & Evaluate on Test Data
+# 6. Evaluate on Test Data
 # ----------------------------
-print("\n📈 Training and evaluating models on test data...\n")
+print("\n📈 Evaluating models on test data...\n")
 detailed_results = []
+model_metrics = {}
+confusion_matrices = {}
 
-for name, model in models.items():
-    model.fit(X_train_pca, y_train)
-    y_pred = model.predict(X_test_pca)
-
-    acc = accuracy_score(y_test, y_pred)
-    f1 = f1_score(y_test, y_pred)
-    prec = precision_score(y_test, y_pred)
-    rec = recall_score(y_test, y_pred)
-
-    detailed_results.append([name, acc, f1, prec, rec])
-    print(f"\n🧠 {name}")
-    print("Accuracy :", round(acc, 4))
-    print("F1-score :", round(f1, 4))
-    print("Precision:", round(prec, 4))
-    print("Recall   :", round(rec, 4))
-    print(classification_report(y_test, y_pred, target_names=le.classes_))
-
-    # Plot confusion matrix
-    cm = confusion_matrix(y_test, y_pred)
-    plt.figure(figsize=(4,3))
-    sns.heatmap(cm, annot=True, fmt='d', xticklabels=le.classes_, yticklabels=le.classes_)
-    plt.xlabel("Predicted")
-    plt.ylabel("True")
-    plt.title(f"Confusion Matrix - {name}")
-    plt.tight_layout()
-    plt.savefig(os.path.join(MODELS_DIR, f"cm_{name.replace(' ', '_')}.png"))
-    plt.close()
+with stage("Test evaluation"):
+    for name, model in fitted_models.items():
+        y_pred = model.predict(X_test_pca)
+
+        model_metrics[name] = classification_metrics(y_test, y_pred)
+        model_metrics[name].update(cv_metrics(cv_scores_by_model[name]))
+        confusion_matrices[name] = confusion_matrix(y_test, y_pred)
+
+        acc = accuracy_score(y_test, y_pred)
+        f1 = f1_score(y_test, y_pred)
+        prec = precision_score(y_test, y_pred)
+        rec = recall_score(y_test, y_pred)
+
+        detailed_results.append([name, acc, f1, prec, rec])
+        print(f"\n🧠 {name}")
+        print("Accuracy :", round(acc, 4))
+        print("F1-score :", round(f1, 4))
+        print("Precision:", round(prec, 4))
+        print("Recall   :", round(rec, 4))
+        print(classification_report(y_test, y_pred, target_names=le.classes_))
+
+# Plot confusion matrices in the background while the winner is saved
+plot_thread = None
+if not args.no_plots:
+    plot_thread = threading.Thread(
+        target=plot_confusion_matrices, args=(confusion_matrices, le.classes_, MODELS_DIR)
+    )
+    plot_thread.start()
 
 # ----------------------------
 # 7. Compare models & choose best
@@ -127,16 +227,77 @@ for name, model in models.items():
 print("\n📊 Summary of Test Metrics:\n")
 print(tabulate(detailed_results, headers=["Model", "Accuracy", "F1", "Precision", "Recall"], floatfmt=".4f"))
 
-# Choose model with highest F1
-best_model_name = max(detailed_results, key=lambda x: x[1])[0]
-best_model = models[best_model_name]
-print(f"\n🏆 Best model based on F1-score: {best_model_name}")
+# Choose model with highest test accuracy (shared with get_model_metrics.py)
+best_model_name = select_best_model(model_metrics)
+best_model = fitted_models[best_model_name]
+print(f"\n🏆 Best model based on accuracy: {best_model_name}")
+
+# ----------------------------
+# 7b. Fast approximate model (opt-in at inference time)
+# ----------------------------
+fast_model = fast_report = None
+if args.fast_components > 0 and isinstance(best_model, SVC) and best_model.kernel == "rbf":
+    with stage("Fast approximate model"):
+        fast_model = fit_fast_model(best_model, X_train_pca, y_train, n_components=args.fast_components)
+        fast_report = evaluate_fast_model(best_model, fast_model, X_test_pca, y_test)
+    print(f"\n⚡ Fast mode: {fast_report['n_components']} Nystroem landmarks "
+          f"vs {fast_report['n_support_vectors']} support vectors\n")
+    print(tabulate([
+        ["Exact (NumPy)", fast_report["exact_accuracy"], fast_report["exact_f1"], fast_report["exact_ms_per_1k"]],
+        ["Exact (sklearn)", fast_report["exact_accuracy"], fast_report["exact_f1"], fast_report["sklearn_ms_per_1k"]],
+        ["Fast", fast_report["fast_accuracy"], fast_report["fast_f1"], fast_report["fast_ms_per_1k"]],
+        ["Delta", fast_report["accuracy_delta"], fast_report["f1_delta"], None],
+    ], headers=["Mode", "Accuracy", "F1", "ms / 1k rows"], floatfmt=".4f"))
+    print(f"Speedup: {fast_report['speedup']:.1f}x vs the NumPy exact path "
+          f"({fast_report['speedup_vs_sklearn']:.1f}x vs sklearn predict_proba)")
+
+# The best model is already fitted on the full training data; just save it
+with stage("Save models"):
+    joblib.dump(best_model, os.path.join(MODELS_DIR, "final_model.pkl"))
+    joblib.dump(le, os.path.join(MODELS_DIR, "label_encoder.pkl"))
+    # Single memory-mappable artifact for the services and the frontend JSON export
+    try:
+        save_bundle(scaler, pca, best_model, le, dataset.sha256, BUNDLE_PATH,
+                    fast=fast_model, fast_report=fast_report)
+        bundle_saved = True
+    except ValueError as e:
+        bundle_saved = False
+        if os.path.exists(BUNDLE_PATH):
+            os.unlink(BUNDLE_PATH)  # never leave a bundle that disagrees with the pickles
+        print(f"⚠️  Model bundle not written: {e}")
+    if search_result is not None:
+        save_search(search_result, MODELS_DIR)
+
+# ----------------------------
+# 8. Persist evaluation metrics
+# ----------------------------
+# Served by get_model_metrics.py until data/voice.csv or the model files change
+with stage("Save metrics"):
+    final_metrics = {k: v for k, v in model_metrics[best_model_name].items() if not k.startswith("cv_")}
+    final_metrics["label_classes"] = le.classes_.tolist()
+    all_metrics = {
+        "models": model_metrics,
+        "best_model": best_model_name,  # the model saved above
+        "label_classes": le.classes_.tolist()
+    }
+    save_metrics(all_metrics, final_metrics, compute_fingerprint(DATA_PATH, MODELS_DIR))
 
-# Retrain best model on full training data and save
-best_model.fit(X_train_pca, y_train)
-joblib.dump(best_model, os.path.join(MODELS_DIR, "final_model.pkl"))
-joblib.dump(le, os.path.join(MODELS_DIR, "label_encoder.pkl"))
+if plot_thread is not None:
+    with stage("Confusion matrix plots (background wait)"):
+        plot_thread.join()
+
+# ----------------------------
+# 9. Timing summary
+# ----------------------------
+stage_times.append(["Total", time.perf_counter() - train_start])
+print("\n⏱️  Stage timings:\n")
+print(tabulate(stage_times, headers=["Stage", "Seconds"], floatfmt=".2f"))
 
 print("\n✅ Training complete.")
-print(f"Model saved as: models/final_model.pkl")
+print("Model saved as: models/final_model.pkl")
 print(f"Scaler, PCA, Encoder saved in {MODELS_DIR}/")
+print(f"Evaluation metrics saved as: {METRICS_PATH}")
+if bundle_saved:
+    print(f"Model bundle saved as: {BUNDLE_PATH} (export JSON with: python numpy_predictor.py --export-json)")
+if search_result is not None:
+    print(f"Search config and log saved in {MODELS_DIR}/ ({SEARCH_CONFIG_FILE})")
@@ -0,0 +1,179 @@
+# websocket_io.py
+"""
+Minimal RFC 6455 WebSocket support on top of http.server / raw sockets.
+
+Just enough for api_server.py's /stream endpoint and the realtime_stream.py
+test client: the opening handshake, text/binary messages (with
+fragmentation), ping/pong and close. No extensions (permessage-deflate is
+never negotiated) and no subprotocols.
+"""
+
+import base64
+import hashlib
+import os
+import struct
+
+import numpy as np
+
+GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+OP_CONTINUATION, OP_TEXT, OP_BINARY, OP_CLOSE, OP_PING, OP_PONG = 0x0, 0x1, 0x2, 0x8, 0x9, 0xA
+# Close codes
+NORMAL_CLOSURE, PROTOCOL_ERROR, MESSAGE_TOO_BIG, INTERNAL_ERROR = 1000, 1002, 1009, 1011
+DEFAULT_MAX_MESSAGE = 1 << 20
+
+
+class WebSocketClosed(Exception):
+    """The peer closed the connection (or it dropped); .code holds the close code."""
+
+    def __init__(self, code=None, reason=""):
+        super().__init__(f"WebSocket closed ({code}) {reason}".strip())
+        self.code = code
+        self.reason = reason
+
+
+def accept_key(key):
+    return base64.b64encode(hashlib.sha1((key + GUID).encode()).digest()).decode()
+
+
+def is_upgrade_request(headers):
+    return (headers.get("Upgrade", "").lower() == "websocket"
+            and "upgrade" in headers.get("Connection", "").lower()
+            and headers.get("Sec-WebSocket-Key") is not None)
+
+
+def server_handshake(handler):
+    """Answer a BaseHTTPRequestHandler's upgrade request; returns a server-side WebSocket."""
+    handler.send_response(101, "Switching Protocols")
+    handler.send_header("Upgrade", "websocket")
+    handler.send_header("Connection", "Upgrade")
+    handler.send_header("Sec-WebSocket-Accept", accept_key(handler.headers["Sec-WebSocket-Key"]))
+    handler.end_headers()
+    handler.wfile.flush()
+    handler.close_connection = True
+    return WebSocket(handler.rfile, handler.wfile, mask=False)
+
+
+def client_connect(host, port, path):
+    """Open a client WebSocket to ws://host:port/path (no TLS)."""
+    import socket
+    sock = socket.create_connection((host, port))
+    key = base64.b64encode(os.urandom(16)).decode()
+    sock.sendall((f"GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\nUpgrade: websocket\r\n"
+                  f"Connection: Upgrade\r\nSec-WebSocket-Key: {key}\r\n"
+                  f"Sec-WebSocket-Version: 13\r\n\r\n").encode())
+    rfile = sock.makefile("rb")
+    status = rfile.readline().decode(errors="replace")
+    headers = {}
+    for line in iter(rfile.readline, b"\r\n"):
+        name, _, value = line.decode(errors="replace").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    if " 101 " not in status or headers.get("sec-websocket-accept") != accept_key(key):
+        sock.close()
+        raise ConnectionError(f"WebSocket handshake failed: {status.strip()}")
+    return WebSocket(rfile, sock.makefile("wb"), mask=True, sock=sock)
+
+
+class WebSocket:
+    """Message-level WebSocket over a pair of binary file objects."""
+
+    def __init__(self, rfile, wfile, mask, sock=None, max_message=DEFAULT_MAX_MESSAGE):
+        self.rfile = rfile
+        self.wfile = wfile
+        self.mask = mask  # clients must mask, servers must not
+        self.sock = sock
+        self.max_message = max_message
+        self.closed = False
+
+    def _read_exact(self, n):
+        data = self.rfile.read(n)
+        if len(data) < n:
+            raise WebSocketClosed(None, "connection dropped")
+        return data
+
+    def _read_frame(self):
+        b0, b1 = self._read_exact(2)
+        fin, opcode = b0 & 0x80, b0 & 0x0F
+        masked, length = b1 & 0x80, b1 & 0x7F
+        if length == 126:
+            length = struct.unpack("!H", self._read_exact(2))[0]
+        elif length == 127:
+            length = struct.unpack("!Q", self._read_exact(8))[0]
+        if length > self.max_message:
+            self.close(MESSAGE_TOO_BIG, "message too big")
+            raise WebSocketClosed(MESSAGE_TOO_BIG, "message too big")
+        mask_key = self._read_exact(4) if masked else None
+        payload = self._read_exact(length)
+        if mask_key:
+            payload = _apply_mask(payload, mask_key)
+        return bool(fin), opcode, payload
+
+    def _send_frame(self, opcode, payload):
+        header = bytearray([0x80 | opcode])
+        mask_bit = 0x80 if self.mask else 0
+        n = len(payload)
+        if n < 126:
+            header.append(mask_bit | n)
+        elif n < 1 << 16:
+            header += bytes([mask_bit | 126]) + struct.pack("!H", n)
+        else:
+            header += bytes([mask_bit | 127]) + struct.pack("!Q", n)
+        if self.mask:
+            mask_key = os.urandom(4)
+            header += mask_key
+            payload = _apply_mask(payload, mask_key)
+        self.wfile.write(bytes(header) + payload)
+        self.wfile.flush()
+
+    def receive(self):
+        """Next data message as (opcode, payload); answers pings, raises WebSocketClosed on close."""
+        opcode, parts, size = None, [], 0
+        while True:
+            fin, op, payload = self._read_frame()
+            if op == OP_PING:
+                self._send_frame(OP_PONG, payload)
+                continue
+            if op == OP_PONG:
+                continue
+            if op == OP_CLOSE:
+                code = struct.unpack("!H", payload[:2])[0] if len(payload) >= 2 else None
+                self.close(code or NORMAL_CLOSURE)
+                raise WebSocketClosed(code, payload[2:].decode(errors="replace"))
+            if op == OP_CONTINUATION:
+                if opcode is None:
+                    self.close(PROTOCOL_ERROR, "unexpected continuation")
+                    raise WebSocketClosed(PROTOCOL_ERROR, "unexpected continuation")
+            elif opcode is not None or op not in (OP_TEXT, OP_BINARY):
+                self.close(PROTOCOL_ERROR, "unexpected opcode")
+                raise WebSocketClosed(PROTOCOL_ERROR, "unexpected opcode")
+            else:
+                opcode = op
+            size += len(payload)
+            if size > self.max_message:
+                self.close(MESSAGE_TOO_BIG, "message too big")
+                raise WebSocketClosed(MESSAGE_TOO_BIG, "message too big")
+            parts.append(payload)
+            if fin:
+                return opcode, b"".join(parts)
+
+    def send_text(self, text):
+        self._send_frame(OP_TEXT, text.encode("utf-8"))
+
+    def send_binary(self, data):
+        self._send_frame(OP_BINARY, bytes(data))
+
+    def close(self, code=NORMAL_CLOSURE, reason=""):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self._send_frame(OP_CLOSE, struct.pack("!H", code) + reason.encode("utf-8")[:120])
+        except OSError:
+            pass
+        if self.sock is not None:
+            self.sock.close()
+
+
+def _apply_mask(payload, mask_key):
+    data = np.frombuffer(payload, dtype=np.uint8)
+    key = np.resize(np.frombuffer(mask_key, dtype=np.uint8), len(data))
+    return (data ^ key).tobytes()